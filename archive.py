@@ -0,0 +1,173 @@
+import datetime
+import os
+import sqlite3
+import sys
+
+from database_manager import get_db_manager, archive_path, archive_years
+from records import Sale, Receipt
+
+# Moves closed years of sales and goods receipts out of inventory.db into one SQLite file per
+# year under archive/, so the hot database stays small. stock_levels and the daily rollups are left
+# as they are (deleting history fires no triggers), so stock and reports still cover archived
+# years; individual archived rows are read back through DatabaseManager.archives_attached().
+# Invoice headers stay in the hot database.
+
+# table -> (record class, date column)
+ARCHIVED_TABLES = {
+    'sales': (Sale, 'sale_date'),
+    'goods_receipts': (Receipt, 'receipt_date'),
+}
+
+def set_incremental_vacuum(cursor, schema):
+    # auto_vacuum is chosen before a file's first table is created and is ignored inside a
+    # transaction, so this runs right after ATTACH. An archive created without it (before this
+    # was fixed) is converted once with VACUUM. Returns the resulting auto_vacuum mode.
+    cursor.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")
+    mode = cursor.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0]
+    if mode != 2:
+        cursor.execute(f"VACUUM {schema}")
+        mode = cursor.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0]
+    return mode
+
+def create_archive_tables(cursor, schema):
+    # Same columns as the hot tables, minus the foreign keys: products, parties and users stay
+    # in the hot database. Rows keep their original ids.
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.sales (
+            id INTEGER PRIMARY KEY,
+            sale_date TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            customer_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            unit_of_measurement TEXT NOT NULL,
+            rate_per_unit INTEGER NOT NULL,
+            total_rate INTEGER NOT NULL,
+            tax_amount INTEGER NOT NULL,
+            operator_id INTEGER NOT NULL,
+            invoice_id INTEGER
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.goods_receipts (
+            id INTEGER PRIMARY KEY,
+            receipt_date TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            supplier_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            unit_of_measurement TEXT NOT NULL,
+            rate_per_unit INTEGER NOT NULL,
+            total_rate INTEGER NOT NULL,
+            tax_amount INTEGER NOT NULL,
+            operator_id INTEGER NOT NULL
+        )
+    ''')
+    # The indexes the hot tables use for date ranges, per-product history and invoice lines
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_sales_date ON sales(sale_date)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_sales_product_date ON sales(product_id, sale_date)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_sales_invoice ON sales(invoice_id)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_receipts_date ON goods_receipts(receipt_date)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_receipts_product_date ON goods_receipts(product_id, receipt_date)")
+
+def archive_year(db_manager, year):
+    # Moves every sale and goods receipt dated in `year` into its archive file and returns
+    # {table: rows moved}, or None on failure. Only closed years (before the current one) can be
+    # archived. Done in two steps, each safe to repeat: the rows are first copied and committed
+    # to the archive, and only then deleted from the hot tables, so an interruption at any point
+    # leaves every row in at least one file and running it again finishes the job.
+    year = int(year)
+    if year >= datetime.date.today().year:
+        print(f"Cannot archive {year}: only closed years can be archived.")
+        return None
+    start, end = f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+    moved, empty = {}, False
+    try:
+        with db_manager.exclusive(): # Rebuilds on other threads must not see rows in both files
+            schema = db_manager.attach_archive(year, create=True)
+            try:
+                if set_incremental_vacuum(db_manager.cursor, schema) != 2:
+                    print(f"Archive {year} could not be switched to incremental auto_vacuum.")
+                with db_manager.transaction():
+                    create_archive_tables(db_manager.cursor, schema)
+                    for table, (record, date_column) in ARCHIVED_TABLES.items():
+                        columns = record.select_list()
+                        db_manager.cursor.execute(f'''
+                            INSERT OR IGNORE INTO {schema}.{table} ({columns})
+                            SELECT {columns} FROM main.{table} WHERE {date_column} >= ? AND {date_column} < ?
+                        ''', (start, end))
+                with db_manager.transaction():
+                    for table, (record, date_column) in ARCHIVED_TABLES.items():
+                        db_manager.cursor.execute(f'''
+                            DELETE FROM main.{table}
+                            WHERE {date_column} >= ? AND {date_column} < ? AND id IN (SELECT id FROM {schema}.{table})
+                        ''', (start, end))
+                        moved[table] = db_manager.cursor.rowcount
+                empty = not db_manager.cursor.execute(
+                    f"SELECT EXISTS (SELECT 1 FROM {schema}.sales) OR EXISTS (SELECT 1 FROM {schema}.goods_receipts)").fetchone()[0]
+            finally:
+                db_manager.detach_archive(schema)
+            if empty: # Nothing was dated in that year; leave no file to attach
+                os.remove(archive_path(db_manager.db_path, year))
+            db_manager.cursor.execute("PRAGMA incremental_vacuum").fetchall() # Hand the freed pages back to the file system
+    except sqlite3.Error as e:
+        print(f"Error archiving {year}: {e}")
+        return None
+    return moved
+
+def archive_before(db_manager, year):
+    # Archives every year before `year`, from the oldest row still in the hot tables onwards
+    oldest = db_manager.fetch_one('''
+        SELECT MIN(day) FROM (SELECT MIN(sale_date) AS day FROM sales UNION ALL SELECT MIN(receipt_date) FROM goods_receipts)
+    ''')
+    if not oldest or not oldest[0]:
+        return {}
+    results = {}
+    for archived_year in range(int(oldest[0][:4]), int(year)):
+        moved = archive_year(db_manager, archived_year)
+        if moved is None:
+            break
+        if any(moved.values()):
+            results[archived_year] = moved
+    return results
+
+def reclaim_space(db_manager):
+    # Returns free pages to the file system. A database created before auto_vacuum was part of
+    # the storage profile is converted once with a full VACUUM, which rewrites the whole file:
+    # run that with the application closed.
+    try:
+        with db_manager.exclusive():
+            if db_manager.cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 0:
+                db_manager.cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                db_manager.cursor.execute("VACUUM")
+            else:
+                db_manager.cursor.execute("PRAGMA incremental_vacuum").fetchall()
+        return True
+    except sqlite3.Error as e:
+        print(f"Error reclaiming space: {e}")
+        return False
+
+def archive_summary(db_path):
+    # (year, file size in bytes) of every archive file
+    return [(year, os.path.getsize(archive_path(db_path, year))) for year in archive_years(db_path)]
+
+if __name__ == '__main__':
+    # python archive.py list | archive <year> | archive-before <year> | vacuum
+    commands = ('list', 'archive', 'archive-before', 'vacuum')
+    if len(sys.argv) < 2 or sys.argv[1] not in commands or (sys.argv[1].startswith('archive') and len(sys.argv) < 3):
+        print("Usage: python archive.py list | archive <year> | archive-before <year> | vacuum")
+        sys.exit(1)
+    db = get_db_manager()
+    command = sys.argv[1]
+    if command == 'list':
+        for year, size in archive_summary(db.db_path):
+            print(f"{year}  {size / 1048576:8.1f} MB  {archive_path(db.db_path, year)}")
+        print(f"Hot database: {os.path.getsize(db.db_path) / 1048576:.1f} MB")
+    elif command == 'archive':
+        moved = archive_year(db, sys.argv[2])
+        if moved is None:
+            sys.exit(1)
+        print(f"Archived {moved['sales']} sales and {moved['goods_receipts']} goods receipts from {sys.argv[2]}.")
+    elif command == 'archive-before':
+        for year, moved in archive_before(db, sys.argv[2]).items():
+            print(f"Archived {moved['sales']} sales and {moved['goods_receipts']} goods receipts from {year}.")
+    elif command == 'vacuum':
+        print("Free space reclaimed." if reclaim_space(db) else "Could not reclaim free space.")
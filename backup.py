@@ -0,0 +1,184 @@
+import datetime
+import gzip
+import os
+import re
+import sqlite3
+import sys
+import time
+from urllib.request import pathname2url
+
+from database_manager import DATABASE_NAME, get_db_manager
+
+# Online backups made with the SQLite backup API while the application keeps running. The copy
+# is taken from a read transaction on a connection of its own: under WAL that pins one
+# consistent snapshot, so sales entry keeps committing on the shared connection and the backup
+# never has to restart because of it. Each backup is integrity-checked, gzip-compressed to
+# backups/<name>-<yyyymmdd-hhmmss>.db.gz and the oldest ones beyond BACKUP_KEEP are deleted.
+# Archive files (see archive.py) are not part of the backup.
+
+BACKUP_DIR_NAME = 'backups'
+BACKUP_PAGES_PER_STEP = 1024 # Pages copied per step, 4 MB with the default page size
+BACKUP_STEP_SLEEP = 0.005 # Seconds between steps, so the backup thread leaves disk and CPU to the app
+BACKUP_KEEP = 7 # Newest backups kept after each new one
+GZIP_LEVEL = 6
+COMPRESS_CHUNK_SIZE = 1 << 20
+
+class _Cancelled(Exception):
+    # Raised from the backup progress callback to stop a cancelled backup between steps
+    pass
+
+def backup_directory(db_path=DATABASE_NAME):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), BACKUP_DIR_NAME)
+
+def list_backups(db_path=DATABASE_NAME):
+    # (path, taken at, size in bytes) of every backup of db_path, newest first
+    directory = backup_directory(db_path)
+    pattern = re.compile(re.escape(os.path.splitext(os.path.basename(db_path))[0]) + r'-(\d{8}-\d{6})\.db\.gz')
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    backups = []
+    for match in filter(None, map(pattern.fullmatch, names)):
+        path = os.path.join(directory, match.group(0))
+        backups.append((path, datetime.datetime.strptime(match.group(1), '%Y%m%d-%H%M%S'), os.path.getsize(path)))
+    return sorted(backups, key=lambda backup: backup[1], reverse=True)
+
+def rotate_backups(db_path=DATABASE_NAME, keep=BACKUP_KEEP):
+    # Deletes all but the newest `keep` backups; returns the deleted paths
+    deleted = []
+    for path, _, _ in list_backups(db_path)[keep:]:
+        os.remove(path)
+        deleted.append(path)
+    return deleted
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def _check_integrity(path, cancelled=None):
+    # Full PRAGMA integrity_check of a database file; the check is interrupted once cancelled() is true
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        if cancelled is not None:
+            conn.set_progress_handler(cancelled, 100000) # A true return value interrupts the statement
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchall()
+        except sqlite3.OperationalError:
+            if cancelled is not None and cancelled():
+                raise _Cancelled()
+            raise
+        if result != [('ok',)]:
+            raise ValueError(f"Backup failed its integrity check: {result[0][0]}")
+        conn.execute("PRAGMA journal_mode = DELETE") # A standalone file, without -wal / -shm companions
+    finally:
+        conn.close()
+
+def create_backup(db_path=DATABASE_NAME, keep=BACKUP_KEEP, progress=None, cancelled=None):
+    # Backs up the database while it is in use and returns {'path', 'size', 'pages', 'seconds'},
+    # or None if cancelled. progress(stage, done, total) reports the 'copy' (pages) and
+    # 'compress' (bytes) stages; cancelled() is polled between steps. Nothing is left behind
+    # by a failed or cancelled backup.
+    started = time.perf_counter()
+    directory = backup_directory(db_path)
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.now()
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    path = os.path.join(directory, f"{stem}-{stamp:%Y%m%d-%H%M%S}.db.gz")
+    while os.path.exists(path): # Two backups within a second
+        stamp += datetime.timedelta(seconds=1)
+        path = os.path.join(directory, f"{stem}-{stamp:%Y%m%d-%H%M%S}.db.gz")
+    copy_path = f"{path[:-3]}.tmp"
+    compressed_path = f"{path}.tmp"
+
+    def step(status, remaining, total):
+        if cancelled is not None and cancelled():
+            raise _Cancelled()
+        if progress:
+            progress('copy', total - remaining, total)
+
+    try:
+        source = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True, isolation_level=None)
+        try:
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchall() # Starts the read transaction
+            target = sqlite3.connect(copy_path)
+            try:
+                source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=step, sleep=BACKUP_STEP_SLEEP)
+                pages = target.execute("PRAGMA page_count").fetchone()[0]
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+        _check_integrity(copy_path, cancelled)
+
+        total = os.path.getsize(copy_path)
+        done = 0
+        with open(copy_path, 'rb') as raw, gzip.open(compressed_path, 'wb', compresslevel=GZIP_LEVEL) as out:
+            while True:
+                if cancelled is not None and cancelled():
+                    raise _Cancelled()
+                chunk = raw.read(COMPRESS_CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+                done += len(chunk)
+                if progress:
+                    progress('compress', done, total)
+        os.replace(compressed_path, path)
+    except _Cancelled:
+        _remove(copy_path, compressed_path)
+        return None
+    except BaseException:
+        _remove(copy_path, compressed_path)
+        raise
+    os.remove(copy_path)
+    rotate_backups(db_path, keep)
+    return {'path': path, 'size': os.path.getsize(path), 'pages': pages, 'seconds': time.perf_counter() - started}
+
+def restore_backup(backup_path, db_manager, safety_backup=True, progress=None):
+    # Replaces the contents of db_manager's database with a backup, without closing the
+    # application. The backup is unpacked and checked first, then (with safety_backup) the
+    # current database is backed up, and finally copied over in one write transaction by
+    # DatabaseManager.restore_from(). progress(stage, done, total) reports 'unpack' (bytes),
+    # 'backup' and 'restore' (pages). Raises on failure, with the live database unchanged.
+    if progress is None:
+        progress = lambda stage, done, total: None
+    unpacked_path = os.path.join(backup_directory(db_manager.db_path), 'restore.tmp')
+    os.makedirs(os.path.dirname(unpacked_path), exist_ok=True)
+    try:
+        total = os.path.getsize(backup_path) # Measured in bytes read from the (compressed) file
+        with open(backup_path, 'rb') as raw, open(unpacked_path, 'wb') as out:
+            source = gzip.open(raw) if backup_path.endswith('.gz') else raw
+            while True:
+                chunk = source.read(COMPRESS_CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+                progress('unpack', raw.tell(), total)
+        _check_integrity(unpacked_path)
+        if safety_backup:
+            create_backup(db_manager.db_path, progress=lambda stage, done, total: stage == 'copy' and progress('backup', done, total))
+        db_manager.restore_from(unpacked_path, BACKUP_PAGES_PER_STEP,
+                                lambda status, remaining, total: progress('restore', total - remaining, total))
+    finally:
+        _remove(unpacked_path)
+
+if __name__ == '__main__':
+    # python backup.py [list | create | restore <backup file>]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'create'
+    if command == 'list':
+        for path, taken_at, size in list_backups():
+            print(f"{taken_at:%Y-%m-%d %H:%M:%S}  {size / 1048576:8.1f} MB  {path}")
+    elif command == 'create':
+        result = create_backup(progress=lambda stage, done, total: print(f"\r{stage}: {done}/{total}", end=''))
+        print(f"\nBackup written to {result['path']} ({result['size'] / 1048576:.1f} MB, {result['seconds']:.1f} s).")
+    elif command == 'restore' and len(sys.argv) > 2:
+        restore_backup(sys.argv[2], get_db_manager(),
+                       progress=lambda stage, done, total: print(f"\r{stage}: {done}/{total}", end=''))
+        print(f"\nRestored {sys.argv[2]}.")
+    else:
+        print("Usage: python backup.py [list | create | restore <backup file>]")
+        sys.exit(1)
@@ -0,0 +1,227 @@
+import os
+import sqlite3
+import threading
+from PySide6.QtWidgets import (QApplication, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QProgressBar,
+                               QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView, QMessageBox,
+                               QFileDialog, QProgressDialog)
+from PySide6.QtCore import Qt, QThread, Signal
+from database_manager import get_db_manager
+from backup import create_backup, restore_backup, list_backups, backup_directory
+
+STAGE_LABELS = {
+    'copy': "Copying database...",
+    'compress': "Compressing...",
+    'unpack': "Unpacking backup...",
+    'backup': "Backing up the current database first...",
+    'restore': "Restoring...",
+}
+_running_backups = set() # Keeps backup threads alive if the dialog is closed
+
+class BackupThread(QThread):
+    # Runs a backup on its own thread and read connection; the shared connection and the
+    # database worker are never touched, so sales entry carries on while it runs
+    progress = Signal(str, int, int) # stage, done, total
+    backup_finished = Signal(object) # create_backup() result, None if cancelled
+    backup_failed = Signal(str)
+
+    def __init__(self, db_path):
+        super().__init__()
+        self.db_path = db_path
+        self._cancel = threading.Event()
+        _running_backups.add(self)
+        self.finished.connect(lambda: _running_backups.discard(self))
+        QApplication.instance().aboutToQuit.connect(self.stop) # Leaves no half-written backup behind
+
+    def run(self):
+        try:
+            self.backup_finished.emit(create_backup(self.db_path, progress=self.progress.emit, cancelled=self._cancel.is_set))
+        except (OSError, ValueError, sqlite3.Error) as e:
+            self.backup_failed.emit(str(e))
+
+    def cancel(self):
+        self._cancel.set()
+
+    def stop(self):
+        self.cancel()
+        self.wait()
+
+class RestoreThread(QThread):
+    # Restores through the shared connection, holding its lock: other database calls wait for
+    # the restore, which then appears to them all at once
+    progress = Signal(str, int, int)
+    restore_finished = Signal()
+    restore_failed = Signal(str)
+
+    def __init__(self, backup_path):
+        super().__init__()
+        self.backup_path = backup_path
+
+    def run(self):
+        try:
+            restore_backup(self.backup_path, get_db_manager(), progress=self.progress.emit)
+            self.restore_finished.emit()
+        except (OSError, ValueError, EOFError, sqlite3.Error) as e:
+            self.restore_failed.emit(str(e))
+
+class BackupDialog(QDialog):
+    database_restored = Signal() # Open forms show data from before the restore until rebuilt
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.db_path = get_db_manager().db_path
+        self.backup_thread = None
+        self.restore_thread = None
+        self.init_ui()
+        self.load_backups()
+
+    def init_ui(self):
+        self.setWindowTitle("Backup and Restore")
+        self.resize(640, 400)
+        layout = QVBoxLayout(self)
+
+        layout.addWidget(QLabel(f"Backups in {backup_directory(self.db_path)}"))
+        self.backup_table = QTableWidget(0, 2)
+        self.backup_table.setHorizontalHeaderLabels(["Taken", "Size"])
+        self.backup_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.backup_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.backup_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.backup_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        layout.addWidget(self.backup_table)
+
+        self.status_label = QLabel("")
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.progress_bar)
+
+        buttons = QHBoxLayout()
+        self.backup_button = QPushButton("Back Up Now")
+        self.backup_button.clicked.connect(self.start_backup)
+        self.cancel_button = QPushButton("Cancel Backup")
+        self.cancel_button.clicked.connect(self.cancel_backup)
+        self.cancel_button.hide()
+        self.restore_button = QPushButton("Restore Selected...")
+        self.restore_button.clicked.connect(self.restore_selected)
+        self.restore_file_button = QPushButton("Restore From File...")
+        self.restore_file_button.clicked.connect(self.restore_from_file)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        for button in (self.backup_button, self.cancel_button, self.restore_button, self.restore_file_button):
+            buttons.addWidget(button)
+        buttons.addStretch()
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+
+    def load_backups(self):
+        backups = list_backups(self.db_path)
+        self.backup_table.setRowCount(len(backups))
+        for row, (path, taken_at, size) in enumerate(backups):
+            item = QTableWidgetItem(taken_at.strftime('%Y-%m-%d %H:%M:%S'))
+            item.setData(Qt.ItemDataRole.UserRole, path)
+            self.backup_table.setItem(row, 0, item)
+            size_item = QTableWidgetItem(f"{size / 1048576:.1f} MB")
+            size_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            self.backup_table.setItem(row, 1, size_item)
+        self.restore_button.setEnabled(bool(backups) and self.backup_thread is None)
+
+    def _set_running(self, running):
+        self.backup_button.setVisible(not running)
+        self.backup_button.setEnabled(not running)
+        self.cancel_button.setVisible(running)
+        self.cancel_button.setEnabled(True)
+        self.progress_bar.setVisible(running)
+        self.restore_button.setEnabled(not running and self.backup_table.rowCount() > 0)
+        self.restore_file_button.setEnabled(not running)
+
+    def _show_progress(self, stage, done, total):
+        self.status_label.setText(STAGE_LABELS.get(stage, stage))
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setValue(int(done * 1000 / total) if total else 0)
+
+    def start_backup(self):
+        self.backup_thread = BackupThread(self.db_path)
+        self.backup_thread.progress.connect(self._show_progress)
+        self.backup_thread.backup_finished.connect(self._backup_finished)
+        self.backup_thread.backup_failed.connect(self._backup_failed)
+        self._set_running(True)
+        self.status_label.setText(STAGE_LABELS['copy'])
+        self.progress_bar.setRange(0, 0)
+        self.backup_thread.start()
+
+    def cancel_backup(self):
+        if self.backup_thread is not None:
+            self.backup_thread.cancel()
+            self.cancel_button.setEnabled(False)
+            self.status_label.setText("Cancelling...")
+
+    def _backup_finished(self, result):
+        self.backup_thread = None
+        self._set_running(False)
+        if result is None:
+            self.status_label.setText("Backup cancelled.")
+        else:
+            self.status_label.setText(f"Backup written to {os.path.basename(result['path'])} "
+                                      f"({result['size'] / 1048576:.1f} MB in {result['seconds']:.1f} s) and checked.")
+        self.load_backups()
+
+    def _backup_failed(self, message):
+        self.backup_thread = None
+        self._set_running(False)
+        self.status_label.setText("")
+        QMessageBox.critical(self, "Backup Failed", message)
+
+    def restore_selected(self):
+        row = self.backup_table.currentRow()
+        if row < 0:
+            QMessageBox.warning(self, "Restore", "Please select a backup to restore.")
+            return
+        self.restore(self.backup_table.item(row, 0).data(Qt.ItemDataRole.UserRole))
+
+    def restore_from_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Restore Backup", backup_directory(self.db_path),
+                                              "Database backups (*.db.gz *.db)")
+        if path:
+            self.restore(path)
+
+    def restore(self, path):
+        reply = QMessageBox.warning(self, "Restore Backup",
+                                    f"Replace all current data with the backup {os.path.basename(path)}?\n\n"
+                                    "The current database is backed up first.",
+                                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                    QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        progress = QProgressDialog(STAGE_LABELS['unpack'], None, 0, 1000, self) # No cancel: the swap must complete
+        progress.setWindowTitle("Restoring Backup")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0)
+        self.restore_thread = RestoreThread(path)
+
+        def show_progress(stage, done, total):
+            progress.setLabelText(STAGE_LABELS.get(stage, stage))
+            progress.setValue(int(done * 1000 / total) if total else 0)
+
+        def restore_done(message=None):
+            progress.close()
+            self.restore_thread = None
+            self._set_running(False)
+            self.load_backups()
+            if message is None:
+                self.database_restored.emit()
+                QMessageBox.information(self, "Restore Backup", "The backup has been restored.")
+            else:
+                QMessageBox.critical(self, "Restore Failed", f"{message}\n\nThe database was not changed.")
+
+        self.restore_thread.progress.connect(show_progress)
+        self.restore_thread.restore_finished.connect(restore_done)
+        self.restore_thread.restore_failed.connect(restore_done)
+        self._set_running(True)
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+        self.backup_button.show()
+        self.restore_thread.start()
+        progress.show()
+
+    def reject(self):
+        if self.restore_thread is None: # A restore in progress has to finish first
+            super().reject()
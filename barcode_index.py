@@ -0,0 +1,54 @@
+from database_manager import get_db_manager
+
+# Layout of the compact product records held in the index
+INDEX_COLUMNS = ['id', 'sku_id', 'product_name', 'tax_percentage', 'price', 'default_unit']
+
+class BarcodeIndex:
+    # In-memory barcode -> product hash index for the scanner fast path. It is built with one
+    # scan of the products table on first use and rebuilt lazily once the database's product
+    # generation moves on (or after invalidate()).
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._index = None
+        self._generation = None
+
+    def lookup(self, barcode):
+        # Returns a tuple in INDEX_COLUMNS order, or None for an unknown barcode
+        self.refresh()
+        return self._index.get(barcode.strip())
+
+    def refresh(self):
+        # Rebuilds the index if products changed; may scan the table, so call it off the GUI thread
+        generation = self.db_manager.get_product_generation()
+        if self._index is None or generation != self._generation:
+            self._build()
+            self._generation = generation
+
+    def is_current(self):
+        # True when lookup_cached() can be trusted without touching the database. Commits by
+        # other connections are only noticed once a database call refreshes the generation.
+        return self._index is not None and self._generation == self.db_manager.product_generation
+
+    def lookup_cached(self, barcode):
+        return self._index.get(barcode.strip()) if self._index is not None else None
+
+    def invalidate(self):
+        self._index = None
+
+    def _build(self):
+        rows = self.db_manager.fetch_all(
+            f"SELECT barcode, {', '.join(INDEX_COLUMNS)} FROM products WHERE barcode IS NOT NULL AND barcode != ''")
+        self._index = {row[0]: row[1:] for row in rows}
+
+_shared_index = None
+
+def get_barcode_index():
+    global _shared_index
+    if _shared_index is None:
+        _shared_index = BarcodeIndex(get_db_manager())
+    return _shared_index
+
+def invalidate_barcode_index():
+    # Call after any change to the products table so the next scan sees it
+    if _shared_index is not None:
+        _shared_index.invalidate()
@@ -0,0 +1,140 @@
+import contextlib
+import datetime
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Repo root
+
+from database_manager import DatabaseManager
+from money import line_totals
+
+# Deterministic synthetic data for benchmarks: the same scale and seed always produce the same
+# rows, so timings from different runs compare like for like. Bump GENERATOR_VERSION whenever
+# the generated data changes, so stale scratch databases are rebuilt.
+GENERATOR_VERSION = 1
+
+SCALES = {
+    # name: (products, suppliers, customers, transactions split between sales and receipts)
+    'small': (10_000, 500, 500, 200_000),
+    'medium': (100_000, 5_000, 5_000, 1_000_000),
+    'full': (100_000, 5_000, 5_000, 10_000_000),
+}
+
+SCRATCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scratch')
+BATCH_ROWS = 50_000
+START_DATE = datetime.date(2024, 1, 1)
+DAYS = 730
+CATEGORIES = ['Beverages', 'Bakery', 'Dairy', 'Produce', 'Frozen', 'Household', 'Personal Care', 'Snacks']
+WORDS = ['organic', 'classic', 'family', 'premium', 'value', 'fresh', 'light', 'spicy', 'sweet', 'crunchy',
+         'juice', 'bread', 'cheese', 'apple', 'soap', 'chips', 'water', 'tea', 'coffee', 'yogurt']
+UNITS = ['Pcs', 'Kg', 'Liters', 'Box']
+TAX_RATES = [0.0, 5.0, 12.0, 18.0, 28.0]
+
+def scratch_db_path(scale, seed):
+    # Each scale/seed gets its own folder holding an inventory.db, so the app's default
+    # relative DATABASE_NAME resolves to it after a chdir
+    return os.path.join(SCRATCH_DIR, f"{scale}-{seed}", 'inventory.db')
+
+def _products(rng, count):
+    for number in range(1, count + 1):
+        name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {number}"
+        category = CATEGORIES[number % len(CATEGORIES)]
+        yield (f"89{number:011d}", f"SKU{number:07d}", category, f"{category} {number % 7}", name,
+               f"{name} {rng.choice(WORDS)} {rng.choice(WORDS)}", rng.choice(TAX_RATES),
+               rng.randint(50, 500_000), rng.choice(UNITS), None)
+
+def _transactions(rng, count, products, parties, operator_id):
+    # Rows in SALE_INSERT / GOODS_RECEIPT_INSERT order; money in cents like the real forms write
+    for _ in range(count):
+        product_id = rng.randint(1, products)
+        quantity = rng.randint(1, 20)
+        rate = rng.randint(50, 500_000)
+        tax_percentage = TAX_RATES[product_id % len(TAX_RATES)]
+        _, tax_amount, total = line_totals(quantity, rate, tax_percentage)
+        day = (START_DATE + datetime.timedelta(days=rng.randrange(DAYS))).isoformat()
+        yield (day, product_id, rng.randint(1, parties), quantity, UNITS[product_id % len(UNITS)],
+               rate, total, tax_amount, operator_id)
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def generate(db_path, scale='small', seed=42, progress=print):
+    # Writes a fresh database at db_path through the normal DatabaseManager bulk paths, so
+    # triggers (stock, rollups, FTS) maintain the derived tables exactly as in production.
+    products, suppliers, customers, transactions = SCALES[scale]
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = DatabaseManager(db_path)
+    operator_id = db.fetch_one("SELECT id FROM users ORDER BY id LIMIT 1")[0]
+
+    for batch in _batches(_products(rng, products), BATCH_ROWS):
+        db.upsert_products_bulk(batch)
+    progress(f"{products} products")
+    with db.transaction():
+        db.cursor.executemany("INSERT INTO suppliers (supplier_name, contact_person, phone, email, address) VALUES (?, ?, ?, ?, ?)",
+                              [(f"Supplier {n}", f"Contact {n}", f"555-{n:05d}", f"supplier{n}@example.com", f"{n} Market St")
+                               for n in range(1, suppliers + 1)])
+        db.cursor.executemany("INSERT INTO customers (customer_name, contact_person, phone, email, address) VALUES (?, ?, ?, ?, ?)",
+                              [(f"Customer {n}", f"Contact {n}", f"555-{n:05d}", f"customer{n}@example.com", f"{n} High St")
+                               for n in range(1, customers + 1)])
+    progress(f"{suppliers} suppliers, {customers} customers")
+
+    written = 0
+    receipts = transactions // 3 # Roughly one receipt line for every two sale lines
+    for insert, count, parties in ((db.add_goods_receipts_bulk, receipts, suppliers),
+                                   (db.add_sales_bulk, transactions - receipts, customers)):
+        for batch in _batches(_transactions(rng, count, products, parties, operator_id), BATCH_ROWS):
+            failures = insert(batch)
+            if failures:
+                raise RuntimeError(f"Generated rows were rejected: {failures[:3]}")
+            written += len(batch)
+            progress(f"{written}/{transactions} transactions ({time.perf_counter() - started:.0f} s)")
+
+    with db.transaction():
+        db.cursor.execute("CREATE TABLE IF NOT EXISTS benchmark_meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.cursor.executemany("INSERT OR REPLACE INTO benchmark_meta VALUES (?, ?)",
+                              [('generator_version', str(GENERATOR_VERSION)), ('scale', scale), ('seed', str(seed))])
+    db.cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.close_connection()
+    progress(f"Generated {scale} dataset in {time.perf_counter() - started:.1f} s: {db_path}")
+
+def is_current(db_path, scale, seed):
+    # True when db_path already holds this generator's data for scale and seed
+    if not os.path.exists(db_path):
+        return False
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM benchmark_meta").fetchall())
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return meta == {'generator_version': str(GENERATOR_VERSION), 'scale': scale, 'seed': str(seed)}
+
+def ensure_dataset(scale='small', seed=42, progress=print):
+    db_path = scratch_db_path(scale, seed)
+    if not is_current(db_path, scale, seed):
+        generate(db_path, scale, seed, progress)
+    return db_path
+
+if __name__ == '__main__':
+    # python benchmarks/datagen.py [small|medium|full] [seed]
+    scale = sys.argv[1] if len(sys.argv) > 1 else 'small'
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 42
+    generate(scratch_db_path(scale, seed), scale, seed)
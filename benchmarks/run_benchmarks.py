@@ -0,0 +1,268 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import re
+import sqlite3
+import statistics
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR)) # Repo root
+sys.path.insert(0, BENCHMARK_DIR)
+
+import datagen
+from records import Product, product_row
+
+# Times DatabaseManager operations, report queries and (when PySide6 is installed) the product
+# table, combo population and form construction against a generated dataset, and checks the
+# query plans of the hot queries. Results are written as JSON so two runs can be compared:
+#   python benchmarks/run_benchmarks.py --scale small --output before.json
+#   python benchmarks/run_benchmarks.py --scale small --output after.json --compare before.json
+# Exits with status 1 when a plan check fails.
+
+REPEAT = 20
+HOT_TABLES = {'products', 'sales', 'goods_receipts', 'daily_product_rollups', 'daily_party_rollups', 'daily_category_rollups', 'invoices', 'stock_levels'}
+FULL_SCAN = re.compile(r"^SCAN (\w+)( AS \w+)?$") # A table walk without an index
+SORT_STEP = "USE TEMP B-TREE FOR ORDER BY"       # Sorting every matching row before LIMIT applies
+
+class _Rollback(Exception):
+    pass
+
+def measure(name, func, repeat=REPEAT):
+    # Runs func `repeat` times after one warm-up call; times in milliseconds
+    func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    result = {'name': name, 'repeat': repeat, 'min_ms': min(samples), 'median_ms': statistics.median(samples),
+              'mean_ms': statistics.fmean(samples), 'max_ms': max(samples)}
+    print(f"{name:<44} median {result['median_ms']:9.3f} ms   min {result['min_ms']:9.3f} ms")
+    return result
+
+def rolled_back(db, func):
+    # Runs a write benchmark inside a transaction that is then undone, so repeated runs leave
+    # the generated dataset exactly as it was
+    def run():
+        try:
+            with db.transaction():
+                func()
+                raise _Rollback()
+        except _Rollback:
+            pass
+    return run
+
+def _deep_row(db, sort_column, fraction=0.5):
+    # A row from the middle of the catalog in sort order, to fetch the page after it
+    count = db.fetch_one("SELECT COUNT(*) FROM products")[0]
+    query = f"SELECT {Product.select_list()} FROM products ORDER BY {sort_column}, id LIMIT 1 OFFSET ?"
+    return db.fetch_one(query, (int(count * fraction),), row_factory=product_row)
+
+def database_cases(db):
+    # name -> callable; shared by the timings and the plan checks
+    middle_by_id = _deep_row(db, 'id')
+    middle_by_sku = _deep_row(db, 'sku_id')
+    middle_by_name = _deep_row(db, 'product_name')
+    product_id, barcode = middle_by_id.id, middle_by_id.barcode
+    customer_id = db.fetch_one("SELECT id FROM customers ORDER BY id LIMIT 1")[0]
+    operator_id = db.fetch_one("SELECT id FROM users ORDER BY id LIMIT 1")[0]
+    last_day = db.fetch_one("SELECT MAX(day) FROM daily_product_rollups")[0] or datagen.START_DATE.isoformat()
+    month_start = last_day[:8] + '01'
+    year_start = last_day[:4] + '-01-01'
+    invoice_lines = [(product_id + n, 2, 'Pcs', 1999, 18.0) for n in range(30)]
+    from reporting import period_report
+
+    def uncached(lookup):
+        def run():
+            db.product_cache.clear()
+            return lookup()
+        return run
+
+    return {
+        'products_page_first': lambda: db.get_products_page(),
+        'products_page_deep_by_id': lambda: db.get_products_page('id', after_row=middle_by_id),
+        'products_page_deep_by_sku': lambda: db.get_products_page('sku_id', after_row=middle_by_sku),
+        'products_page_deep_by_name': lambda: db.get_products_page('product_name', after_row=middle_by_name),
+        'products_page_search': lambda: db.get_products_page(search='organic juice'),
+        'search_products': lambda: db.search_products('premium cheese'),
+        'search_products_by_prefix': lambda: db.search_products_by_prefix('Fre'),
+        'product_by_id_uncached': uncached(lambda: db.get_product_by_id(product_id)),
+        'product_by_barcode_uncached': uncached(lambda: db.get_product_by_barcode(barcode)),
+        'stock_level': lambda: db.get_stock_level(product_id),
+        'all_customers': lambda: db.get_all_customers(),
+        'all_suppliers': lambda: db.get_all_suppliers(),
+        'report_sales_month_by_product': lambda: period_report(db, 'sale', 'month', 'product', month_start, last_day),
+        'report_sales_ytd_by_category': lambda: period_report(db, 'sale', 'month', 'category', year_start, last_day),
+        'report_receipts_day_by_party': lambda: period_report(db, 'receipt', 'day', 'party', month_start, last_day),
+        'report_sales_all_time_total': lambda: period_report(db, 'sale', 'year', 'total'),
+        'add_invoice_30_lines': rolled_back(db, lambda: db.add_invoice(last_day, customer_id, invoice_lines, operator_id)),
+    }
+
+# Cases whose queries must use an index. Each maps to plan steps that are expected for it;
+# any other full scan of a hot table, or a sort of every matching row, fails the check.
+# Sorting the product grid by an unindexed column (name, category, price...) sorts the whole
+# table, so those pages are timed but not checked.
+PLAN_CHECKS = {
+    'products_page_first': {'SCAN products'}, # Walks rowid order and stops at LIMIT
+    'products_page_deep_by_id': set(),
+    'products_page_deep_by_sku': set(),
+    'products_page_search': set(),
+    'search_products': {SORT_STEP}, # Ranking needs every match scored; FTS keeps the match set small
+    'search_products_by_prefix': {SORT_STEP}, # Orders the merged matches, at most two LIMITs of rows
+    'product_by_id_uncached': set(),
+    'product_by_barcode_uncached': set(),
+    'stock_level': set(),
+    'report_sales_month_by_product': {SORT_STEP}, # Sorts the grouped rows, not the raw rollups
+    'report_sales_ytd_by_category': {SORT_STEP},
+    'report_receipts_day_by_party': {SORT_STEP},
+    'add_invoice_30_lines': set(),
+}
+
+def _captured_statements(db, func):
+    statements = []
+    db.conn.set_trace_callback(statements.append) # Called with the SQL and its bound values expanded
+    try:
+        func()
+    finally:
+        db.conn.set_trace_callback(None)
+    return [sql for sql in statements if re.match(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", sql, re.IGNORECASE)]
+
+def plan_violations(db, func, allowed):
+    violations = []
+    for sql in _captured_statements(db, func):
+        try:
+            plan = [row[3] for row in db.conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        except sqlite3.Error as e:
+            violations.append({'sql': ' '.join(sql.split()), 'step': f"cannot explain: {e}"})
+            continue
+        for step in plan:
+            scan = FULL_SCAN.match(step)
+            bad = (scan and scan.group(1) in HOT_TABLES) or step.startswith(SORT_STEP)
+            if bad and not any(step.startswith(expected) for expected in allowed):
+                violations.append({'sql': ' '.join(sql.split()), 'step': step})
+    return violations
+
+def run_plan_checks(db, cases):
+    checks = []
+    for name, allowed in PLAN_CHECKS.items():
+        violations = plan_violations(db, cases[name], allowed)
+        checks.append({'name': name, 'passed': not violations, 'violations': violations})
+        print(f"plan {name:<39} {'ok' if not violations else 'FAILED'}")
+        for violation in violations:
+            print(f"    {violation['step']}\n        in: {violation['sql'][:200]}")
+    return checks
+
+def qt_benchmarks(repeat):
+    # Headless timings of the widgets that load data. Skipped when PySide6 is not installed.
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PySide6.QtCore import QEventLoop, QTimer
+        from PySide6.QtWidgets import QApplication
+    except ImportError:
+        print("PySide6 is not installed; skipping the Qt benchmarks.")
+        return []
+    import importlib
+    from db_worker import get_db_worker, stop_db_worker
+    from database_manager import get_db_manager
+    from main_app_window import FORMS
+    from product_table_model import ProductTableModel
+
+    app = QApplication.instance() or QApplication([])
+    worker = get_db_worker()
+    results = []
+
+    def wait_for(signal, timeout_ms=30000):
+        loop = QEventLoop()
+        signal.connect(loop.quit)
+        QTimer.singleShot(timeout_ms, loop.quit)
+        return loop
+
+    def first_product_page():
+        model = ProductTableModel(worker)
+        loop = wait_for(model.rowsInserted)
+        model.fetchMore()
+        loop.exec()
+
+    results.append(measure('qt_product_table_first_page', first_product_page, repeat))
+
+    from sales_form import SalesForm
+    sales_form = SalesForm(operator_id=1)
+    customers = get_db_manager().get_all_customers()
+    results.append(measure('qt_customer_combo_populate', lambda: sales_form.customers_loaded(customers), repeat))
+
+    for _, module_name, class_name in FORMS:
+        form_class = getattr(importlib.import_module(module_name), class_name)
+        def build(form_class=form_class):
+            form = form_class(operator_id=1)
+            app.processEvents()
+            form.deleteLater()
+        results.append(measure(f"qt_construct_{module_name}", build, max(1, repeat // 4)))
+
+    stop_db_worker()
+    app.processEvents()
+    return results
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {result['name']: result for result in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path} (median, new / old):")
+    for result in results:
+        old = baseline.get(result['name'])
+        if old is None:
+            continue
+        ratio = result['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        flag = '  slower' if ratio > 1.2 else ('  faster' if ratio < 0.8 else '')
+        print(f"{result['name']:<44} {old['median_ms']:9.3f} -> {result['median_ms']:9.3f} ms  x{ratio:5.2f}{flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GoodsTracker benchmark suite")
+    parser.add_argument('--scale', choices=sorted(datagen.SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--no-qt', action='store_true', help="Skip the headless Qt benchmarks")
+    args = parser.parse_args(argv)
+
+    db_path = datagen.ensure_dataset(args.scale, args.seed)
+    # The app opens DATABASE_NAME (and its image folders) relative to the working directory
+    os.chdir(os.path.dirname(db_path))
+    from database_manager import get_db_manager, close_shared_connection
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = get_db_manager()
+
+    cases = database_cases(db)
+    results = [measure(name, func, args.repeat) for name, func in cases.items()]
+    plan_checks = run_plan_checks(db, cases)
+    if not args.no_qt:
+        results.extend(qt_benchmarks(args.repeat))
+    with contextlib.redirect_stdout(io.StringIO()):
+        close_shared_connection()
+
+    report = {
+        'meta': {'scale': args.scale, 'seed': args.seed, 'generator_version': datagen.GENERATOR_VERSION,
+                 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                 'platform': platform.platform(), 'started': datetime.datetime.now().isoformat(timespec='seconds')},
+        'results': results,
+        'plan_checks': plan_checks,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    failed = [check['name'] for check in plan_checks if not check['passed']]
+    if failed:
+        print(f"Plan checks failed: {', '.join(failed)}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
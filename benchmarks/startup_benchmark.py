@@ -0,0 +1,44 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Repo root
+
+import database_manager
+from database_manager import DatabaseManager
+
+# Measures what constructing a DatabaseManager costs once a database file exists:
+#   fresh file     - every migration runs (first start on a new machine)
+#   per-file check - a new process opening a current file: one PRAGMA user_version read
+#   per-process    - another manager in the same process: no schema work at all
+
+MANAGERS = 200
+
+def _construct(db_path, forget_process_cache):
+    if forget_process_cache:
+        database_manager._initialized_files.clear() # Behave like a brand-new process
+    db = DatabaseManager(db_path)
+    db.close_connection()
+
+def _time(db_path, count, forget_process_cache):
+    with contextlib.redirect_stdout(io.StringIO()): # DatabaseManager prints on every connect
+        started = time.perf_counter()
+        for _ in range(count):
+            _construct(db_path, forget_process_cache)
+        return (time.perf_counter() - started) / count
+
+def main(count=MANAGERS):
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'benchmark.db')
+        fresh = _time(db_path, 1, True)
+        per_file = _time(db_path, count, True)
+        per_process = _time(db_path, count, False)
+    print(f"{'fresh file (all migrations)':<32} {fresh * 1000:8.2f} ms")
+    print(f"{'per-file marker check':<32} {per_file * 1000:8.2f} ms per manager ({count} managers)")
+    print(f"{'per-process fast path':<32} {per_process * 1000:8.2f} ms per manager ({count} managers)")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else MANAGERS)
\ No newline at end of file
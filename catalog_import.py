@@ -0,0 +1,188 @@
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from database_manager import get_db_manager
+from money import to_cents
+from image_store import ImageStore
+
+# Product fields in the order DatabaseManager.add_product() takes them
+PRODUCT_FIELDS = ['barcode', 'sku_id', 'category', 'subcategory', 'product_name',
+                  'description', 'tax_percentage', 'price', 'default_unit', 'image_path']
+
+BATCH_SIZE = 1000 # Records per validation chunk and per upsert transaction
+
+def iter_records(path):
+    # Yields (line_number, record_dict) one at a time so files larger than RAM can be read
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if extension in ('.jsonl', '.ndjson'):
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_number, {'_error': f"Invalid JSON: {e}"}
+                    continue
+                if not isinstance(record, dict):
+                    yield line_number, {'_error': "Expected a JSON object."}
+                    continue
+                # Keys are matched like CSV headers: stripped and lower-cased
+                yield line_number, {str(key).strip().lower(): value for key, value in record.items()}
+        else:
+            delimiter = '\t' if extension in ('.tsv', '.tab') else ','
+            reader = csv.reader(f, delimiter=delimiter)
+            header = next(reader, None)
+            if header is None:
+                return
+            header = [name.strip().lower() for name in header]
+            for row in reader:
+                if not any(cell.strip() for cell in row):
+                    continue
+                yield reader.line_num, dict(zip(header, row))
+
+def iter_chunks(records, size=BATCH_SIZE):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def validate_record(record):
+    # Returns (row_tuple, None) for a valid record or (None, reason) for a rejected one
+    if '_error' in record:
+        return None, record['_error']
+    values = {field: _text(record.get(field)) for field in PRODUCT_FIELDS}
+    if not values['sku_id']:
+        return None, "SKU ID is required."
+    if not values['product_name']:
+        return None, "Product Name is required."
+    try:
+        values['price'] = to_cents(values['price']) if values['price'] is not None else None # Stored in cents
+        values['tax_percentage'] = float(values['tax_percentage'] or 0.0)
+    except ValueError:
+        return None, "Price and Tax Percentage must be numbers."
+    if values['price'] is None or values['price'] < 0:
+        return None, "Price is required and cannot be negative."
+    if not 0 <= values['tax_percentage'] <= 100:
+        return None, "Tax Percentage must be between 0 and 100."
+    return tuple(values[field] for field in PRODUCT_FIELDS), None
+
+def validate_chunk(chunk):
+    # Runs in a worker process; everything passed in and out must be picklable
+    valid, rejected = [], []
+    for line_number, record in chunk:
+        row, reason = validate_record(record)
+        if row is None:
+            rejected.append((line_number, reason, record))
+        else:
+            valid.append((line_number, row))
+    return valid, rejected
+
+def _validated_chunks(path, batch_size, workers):
+    chunks = iter_chunks(iter_records(path), batch_size)
+    if workers == 0:
+        for chunk in chunks:
+            yield validate_chunk(chunk)
+        return
+    # Keep only a couple of chunks per worker in flight so memory stays bounded
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        max_pending = workers * 2
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(validate_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+IMAGE_FIELD = PRODUCT_FIELDS.index('image_path')
+
+def _store_images(valid, rejected, image_store, base_dir):
+    # Swaps each row's image_path for its copy in the image store. Relative paths are taken
+    # relative to the catalog file; rows whose image cannot be read are rejected.
+    sources = {}
+    for _, row in valid:
+        if row[IMAGE_FIELD] and not image_store.is_stored(row[IMAGE_FIELD]):
+            sources[row[IMAGE_FIELD]] = os.path.join(base_dir, row[IMAGE_FIELD])
+    if not sources:
+        return valid
+    stored = image_store.ingest_many(sources.values())
+    kept = []
+    for line_number, row in valid:
+        image_path = row[IMAGE_FIELD]
+        if image_path in sources:
+            result = stored[sources[image_path]]
+            if isinstance(result, OSError):
+                rejected.append((line_number, f"Image cannot be read: {result}", dict(zip(PRODUCT_FIELDS, row))))
+                continue
+            row = row[:IMAGE_FIELD] + (result,) + row[IMAGE_FIELD + 1:]
+        kept.append((line_number, row))
+    return kept
+
+def import_catalog(path, db_manager=None, batch_size=BATCH_SIZE, workers=None, progress=None, rejects_path=None,
+                   cancelled=None):
+    # Streams a CSV/TSV/JSON-lines catalog into the products table, upserting on SKU ID. A row
+    # whose barcode belongs to another SKU is rejected rather than merged into that product.
+    # workers=None uses one process per CPU, workers=0 validates in this process.
+    # progress(rows_read, imported, rejected) is called after every batch.
+    # Rejected rows are written to rejects_path (default: <path>.rejects.csv) as they are found.
+    # Images named in image_path are copied into the image store next to the database.
+    # Each batch is committed on its own, holding the connection lock only while it is written,
+    # so other threads' requests run between batches. cancelled() is polled between batches;
+    # batches already written stay, and stats['cancelled'] is then True.
+    db_manager = db_manager or get_db_manager()
+    image_store = ImageStore(db_manager)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if rejects_path is None:
+        rejects_path = path + '.rejects.csv'
+    stats = {'read': 0, 'imported': 0, 'rejected': 0, 'rejects_path': rejects_path, 'cancelled': False}
+
+    with open(rejects_path, 'w', encoding='utf-8', newline='') as rejects_file:
+        rejects = csv.writer(rejects_file)
+        rejects.writerow(['line', 'reason', 'record'])
+        for valid, rejected in _validated_chunks(path, batch_size, workers):
+            if cancelled is not None and cancelled():
+                stats['cancelled'] = True
+                break
+            valid = _store_images(valid, rejected, image_store, base_dir)
+            failures = db_manager.upsert_products_bulk(row for _, row in valid)
+            for index, reason in failures:
+                line_number, row = valid[index]
+                rejected.append((line_number, reason, dict(zip(PRODUCT_FIELDS, row))))
+            for line_number, reason, record in rejected:
+                rejects.writerow([line_number, reason, json.dumps(record)])
+
+            stats['read'] += len(valid) + len(rejected) - len(failures)
+            stats['imported'] += len(valid) - len(failures)
+            stats['rejected'] += len(rejected)
+            if progress:
+                progress(stats['read'], stats['imported'], stats['rejected'])
+
+    if stats['rejected'] == 0:
+        os.remove(rejects_path)
+        stats['rejects_path'] = None
+    return stats
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Usage: python catalog_import.py <catalog.csv|.tsv|.jsonl>")
+        sys.exit(1)
+    result = import_catalog(sys.argv[1], progress=lambda read, imported, rejected:
+                            print(f"Read {read}, imported {imported}, rejected {rejected}"))
+    print(result)
@@ -0,0 +1,199 @@
+import argparse
+import contextlib
+import datetime
+import os
+import sqlite3
+import sys
+
+# Headless entry point for batch jobs: python cli.py <command> ...
+# Nothing here imports PySide6, so it runs on a server without a display and starts in
+# milliseconds. Each command imports only the modules it needs, when it runs.
+
+def _open_db(args):
+    # DatabaseManager reports on standard output, which is kept for command output such as reports
+    from database_manager import DatabaseManager
+    with contextlib.redirect_stdout(sys.stderr):
+        return DatabaseManager(args.db)
+
+def _close_db(db):
+    with contextlib.redirect_stdout(sys.stderr):
+        db.close_connection()
+
+def _date(text):
+    # argparse type for yyyy-mm-dd arguments
+    try:
+        return datetime.date.fromisoformat(text).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a yyyy-mm-dd date: {text}")
+
+def _progress(message):
+    # One updating status line on a terminal, nothing when the output goes to a log file
+    if not sys.stderr.isatty():
+        return lambda *values: None
+    return lambda *values: print(f"\r{message.format(*values)}", end='', file=sys.stderr, flush=True)
+
+def _end_progress():
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+
+def import_command(args):
+    from catalog_import import import_catalog
+    db = _open_db(args)
+    stats = import_catalog(args.catalog, db_manager=db, workers=args.workers, rejects_path=args.rejects,
+                           progress=_progress("Read {}, imported {}, rejected {}"))
+    _end_progress()
+    print(f"Read {stats['read']} records: {stats['imported']} imported, {stats['rejected']} rejected.")
+    if stats['rejects_path']:
+        print(f"Rejected rows written to {stats['rejects_path']}")
+    _close_db(db)
+    return 1 if stats['rejected'] else 0
+
+def export_command(args):
+    from transaction_export import export_transactions
+    result = export_transactions(args.output, args.kind, start_date=args.start, end_date=args.end,
+                                 product_ids=args.product, rows_per_file=args.rows_per_file, resume=args.resume,
+                                 db_path=args.db, progress=_progress("{}/{} rows"))
+    _end_progress()
+    print(f"Exported {result['rows']} rows to {result['files']} file(s).")
+    return 0
+
+def report_command(args):
+    from reporting import period_report, REPORT_HEADERS
+    from money import format_money
+    db = _open_db(args)
+    rows = period_report(db, args.kind, args.period, args.group, args.start, args.end)
+    _close_db(db)
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        print("\t".join(REPORT_HEADERS), file=out)
+        for row in rows:
+            print("\t".join([str(value) for value in row[:4]] + [format_money(value) for value in row[4:]]), file=out)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+def backup_command(args):
+    from backup import create_backup, list_backups, restore_backup
+    if args.action == 'list':
+        for path, taken_at, size in list_backups(args.db):
+            print(f"{taken_at:%Y-%m-%d %H:%M:%S}  {size / 1048576:8.1f} MB  {path}")
+        return 0
+    if args.action == 'restore':
+        if not args.file:
+            print("backup restore needs the backup file to restore.", file=sys.stderr)
+            return 1
+        db = _open_db(args)
+        restore_backup(args.file, db, progress=_progress("{}: {}/{}"))
+        _end_progress()
+        _close_db(db)
+        print(f"Restored {args.file}.")
+        return 0
+    settings = {} if args.keep is None else {'keep': args.keep}
+    result = create_backup(args.db, progress=_progress("{}: {}/{}"), **settings)
+    _end_progress()
+    print(f"Backup written to {result['path']} ({result['size'] / 1048576:.1f} MB, {result['seconds']:.1f} s).")
+    return 0
+
+def rebuild_command(args):
+    db = _open_db(args)
+    ok = True
+    if args.table in ('stock', 'all'):
+        ok = db.rebuild_stock_levels() and ok
+    if args.table in ('rollups', 'all'):
+        ok = db.rebuild_daily_rollups() and ok
+    _close_db(db)
+    print("Derived tables rebuilt." if ok else "Rebuild failed.")
+    return 0 if ok else 1
+
+def integrity_command(args):
+    # SQLite's own check of the file, then the stock ledger against the transaction history
+    db = _open_db(args)
+    result = db.fetch_all(f"PRAGMA {'quick_check' if args.quick else 'integrity_check'}")
+    file_ok = result == [('ok',)]
+    if not file_ok:
+        for (problem,) in result or [("The integrity check could not run.",)]:
+            print(problem)
+    mismatches = db.verify_stock_levels()
+    if mismatches is None:
+        print("The stock check could not run.")
+    else:
+        for product_id, recorded, expected in mismatches:
+            print(f"Product {product_id}: ledger has {recorded}, history gives {expected}")
+    _close_db(db)
+    ok = file_ok and mismatches == []
+    print("Database and stock ledger are consistent." if ok else "Integrity check failed.")
+    return 0 if ok else 1
+
+def benchmark_command(args):
+    # Always without the Qt benchmarks: they need PySide6
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+    import run_benchmarks
+    return run_benchmarks.main(args.benchmark_options + ['--no-qt'])
+
+def build_parser():
+    from database_manager import DATABASE_NAME
+    from reporting import PARTIES, PERIODS, GROUPINGS
+    parser = argparse.ArgumentParser(prog='cli.py', description="GoodsTracker batch operations, without the GUI")
+    parser.add_argument('--db', default=DATABASE_NAME, help=f"Database file (default: {DATABASE_NAME})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('import', help="Import a product catalog (CSV, TSV or JSON lines)")
+    command.add_argument('catalog')
+    command.add_argument('--workers', type=int, help="Validation processes (default: one per CPU, 0: none)")
+    command.add_argument('--rejects', help="File for rejected rows (default: <catalog>.rejects.csv)")
+    command.set_defaults(handler=import_command)
+
+    command = commands.add_parser('export', help="Export sales or goods receipts to CSV or JSON lines")
+    command.add_argument('kind', choices=list(PARTIES))
+    command.add_argument('output', help="Output file; .jsonl for JSON lines, .gz to compress")
+    command.add_argument('--start', type=_date, help="First day, yyyy-mm-dd")
+    command.add_argument('--end', type=_date, help="Last day, yyyy-mm-dd")
+    command.add_argument('--product', type=int, action='append', help="Only this product id (repeatable)")
+    command.add_argument('--rows-per-file', type=int, help="Split into numbered part files of this many rows")
+    command.add_argument('--resume', action='store_true', help="Continue an interrupted split export")
+    command.set_defaults(handler=export_command)
+
+    command = commands.add_parser('report', help="Print a period report as tab-separated values")
+    command.add_argument('kind', choices=list(PARTIES))
+    command.add_argument('--period', choices=list(PERIODS), default='month')
+    command.add_argument('--group', choices=list(GROUPINGS), default='product')
+    command.add_argument('--start', type=_date, help="First day, yyyy-mm-dd")
+    command.add_argument('--end', type=_date, help="Last day, yyyy-mm-dd")
+    command.add_argument('--output', help="Write to this file instead of standard output")
+    command.set_defaults(handler=report_command)
+
+    command = commands.add_parser('backup', help="Create, list or restore online backups")
+    command.add_argument('action', nargs='?', choices=['create', 'list', 'restore'], default='create')
+    command.add_argument('file', nargs='?', help="Backup file to restore")
+    command.add_argument('--keep', type=int, help="Backups kept after creating one (default: BACKUP_KEEP in backup.py)")
+    command.set_defaults(handler=backup_command)
+
+    command = commands.add_parser('rebuild', help="Recompute derived tables from the transaction history")
+    command.add_argument('table', nargs='?', choices=['stock', 'rollups', 'all'], default='all')
+    command.set_defaults(handler=rebuild_command)
+
+    command = commands.add_parser('integrity', help="Check the database file and the stock ledger")
+    command.add_argument('--quick', action='store_true', help="PRAGMA quick_check instead of integrity_check")
+    command.set_defaults(handler=integrity_command)
+
+    # Any further options are passed on to benchmarks/run_benchmarks.py
+    command = commands.add_parser('benchmark', help="Run the benchmark suite (takes the options of benchmarks/run_benchmarks.py)")
+    command.set_defaults(handler=benchmark_command)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'benchmark':
+        args.benchmark_options = extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    try:
+        return args.handler(args)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
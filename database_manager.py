@@ -1,12 +1,177 @@
 import sqlite3
 import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import migrations
+from product_cache import ProductCache
+from money import calculate_totals_batch
+from query_stats import QueryStats, SLOW_QUERY_MS, STATS_FILE_NAME, trace_log
+from records import Product, Sale, Receipt, product_row, sale_row, receipt_row
 
 DATABASE_NAME = 'inventory.db'
+BULK_CHUNK_SIZE = 500 # Rows per executemany() call in the bulk insert methods
+PRODUCT_PAGE_SIZE = 200 # Rows per get_products_page() call
+PRODUCT_CACHE_SIZE = 50000 # Products kept in the read-through cache before LRU eviction
+DATA_VERSION_CHECK_INTERVAL = 1.0 # Seconds between checks for other connections' commits; cached products may lag them this long
+PICKER_MATCH_LIMIT = 50 # Matches returned per keystroke by search_products_by_prefix()
+SEARCH_RESULT_LIMIT = 100 # Default number of ranked results from search_products()
+STATEMENT_CACHE_SIZE = 256 # Prepared statements kept per connection; covers every product page sort/filter variant
+ARCHIVE_DIR_NAME = 'archive' # Per-year archive files (see archive.py) live in this folder next to the database
+MAX_ATTACHED_ARCHIVES = 9 # SQLite attaches at most 10 databases per connection by default; one is left spare
+
+# Columns of the Product records returned by get_all_products() and friends, in table column order
+PRODUCT_COLUMNS = list(Product.FIELDS)
+# Columns that may hold NULL; they sort as '' so keyset comparisons never see a NULL
+NULLABLE_PRODUCT_COLUMNS = {'barcode', 'category', 'subcategory', 'description', 'default_unit', 'image_path'}
+
+GOODS_RECEIPT_INSERT = '''
+    INSERT INTO goods_receipts (receipt_date, product_id, supplier_id, quantity, unit_of_measurement, rate_per_unit, total_rate, tax_amount, operator_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Insert-or-update keyed on SKU ID. A row whose barcode already belongs to a product with a
+# different SKU fails on the barcode's UNIQUE constraint instead of taking that product over
+# (its history stays with its own SKU). An image already on file is kept when the incoming row has none.
+PRODUCT_UPSERT = '''
+    INSERT INTO products (barcode, sku_id, category, subcategory, product_name, description, tax_percentage, price, default_unit, image_path)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(sku_id) DO UPDATE SET
+        barcode = excluded.barcode, category = excluded.category, subcategory = excluded.subcategory,
+        product_name = excluded.product_name, description = excluded.description,
+        tax_percentage = excluded.tax_percentage, price = excluded.price, default_unit = excluded.default_unit,
+        image_path = COALESCE(excluded.image_path, products.image_path)
+'''
+
+SALE_INSERT = '''
+    INSERT INTO sales (sale_date, product_id, customer_id, quantity, unit_of_measurement, rate_per_unit, total_rate, tax_amount, operator_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+INVOICE_INSERT = '''
+    INSERT INTO invoices (invoice_date, customer_id, line_count, sub_total, tax_amount, total_amount, operator_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+INVOICE_LINE_INSERT = '''
+    INSERT INTO sales (sale_date, product_id, customer_id, quantity, unit_of_measurement, rate_per_unit, total_rate, tax_amount, operator_id, invoice_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Derived-table contents from the hot tables plus the archive totals staged by _stage_archive_totals()
+STOCK_WITH_ARCHIVES = f'''
+    WITH combined (product_id, quantity) AS (
+        {migrations.STOCK_FROM_HISTORY}
+        UNION ALL
+        SELECT product_id, quantity FROM temp.archived_stock
+    )
+    SELECT product_id, SUM(quantity) FROM combined GROUP BY product_id
+'''
+
+def rollups_with_archives(table):
+    # The same for one of the rollup tables in migrations.SPLIT_ROLLUPS, staged as temp.archived_<table>
+    key = migrations.SPLIT_ROLLUPS[table][0]
+    columns = migrations.split_rollup_columns(table)
+    return f'''
+        WITH combined ({columns}) AS (
+            {migrations.split_rollups_from_history(table)}
+            UNION ALL
+            SELECT {columns} FROM temp.archived_{table}
+        )
+        SELECT day, kind, {key}, SUM(line_count), SUM(quantity), SUM(net_amount), SUM(tax_amount), SUM(total_amount)
+        FROM combined GROUP BY kind, day, {key}
+    '''
+
+# PRAGMA settings applied to every connection we open. WAL lets readers and the
+# writer proceed side by side; the rest trades a little durability/memory for speed.
+STORAGE_PROFILE = {
+    'auto_vacuum': 'INCREMENTAL', # Only takes effect on a new file; archive.py converts existing ones
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # Safe with WAL; only the last commits can be lost on power failure
+    'cache_size': -16000,     # Negative means KiB, so ~16 MB of page cache
+    'mmap_size': 268435456,   # 256 MB memory-mapped I/O
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,     # Milliseconds to wait on a locked database before failing
+}
+
+# Statement timing (see query_stats.py). The trace hook logs every statement with its values
+# at DEBUG level; progress_steps > 0 counts SQLite VM instructions per statement, in steps of
+# that size. Both cost more than the timing itself, so they are off unless switched on.
+INSTRUMENTATION = {
+    'enabled': True,
+    'slow_query_ms': SLOW_QUERY_MS,
+    'trace': False,
+    'progress_steps': 0,
+}
+
+_shared_manager = None # Process-wide DatabaseManager handed out by get_db_manager()
+_initialized_files = set() # (path, inode) of database files this process has already brought up to date
+
+def configure_storage(**settings):
+    # Adjust the storage profile; must be called before the shared connection is opened
+    unknown = set(settings) - set(STORAGE_PROFILE)
+    if unknown:
+        raise ValueError(f"Unknown storage settings: {', '.join(sorted(unknown))}")
+    if _shared_manager is not None:
+        raise RuntimeError("Storage profile must be configured before the shared connection is opened.")
+    STORAGE_PROFILE.update(settings)
+
+def configure_instrumentation(**settings):
+    # Unlike the storage profile this may change at any time; the shared connection picks it up at once
+    unknown = set(settings) - set(INSTRUMENTATION)
+    if unknown:
+        raise ValueError(f"Unknown instrumentation settings: {', '.join(sorted(unknown))}")
+    INSTRUMENTATION.update(settings)
+    if _shared_manager is not None:
+        _shared_manager._apply_instrumentation()
+
+def archive_path(db_path, year):
+    # inventory.db -> archive/inventory-2023.db
+    directory, name = os.path.split(os.path.abspath(db_path))
+    return os.path.join(directory, ARCHIVE_DIR_NAME, f"{os.path.splitext(name)[0]}-{int(year)}.db")
+
+def archive_years(db_path):
+    # Years that have an archive file, oldest first
+    if db_path in ('', ':memory:') or str(db_path).startswith('file:'):
+        return []
+    directory, name = os.path.split(os.path.abspath(db_path))
+    pattern = re.compile(re.escape(os.path.splitext(name)[0]) + r'-(\d{4})\.db')
+    try:
+        names = os.listdir(os.path.join(directory, ARCHIVE_DIR_NAME))
+    except OSError:
+        return []
+    return sorted(int(match.group(1)) for match in map(pattern.fullmatch, names) if match)
+
+def get_db_manager():
+    # All windows and forms share one connection instead of each opening their own
+    global _shared_manager
+    if _shared_manager is None:
+        _shared_manager = DatabaseManager()
+    return _shared_manager
+
+def close_shared_connection():
+    global _shared_manager
+    if _shared_manager is not None:
+        _shared_manager.save_query_stats()
+        _shared_manager.close_connection()
+        _shared_manager = None
 
 class DatabaseManager:
-    def __init__(self):
+    def __init__(self, db_path=DATABASE_NAME, storage_profile=None, product_cache_size=PRODUCT_CACHE_SIZE):
+        self.db_path = db_path
+        self.storage_profile = dict(STORAGE_PROFILE if storage_profile is None else storage_profile)
         self.conn = None
         self.cursor = None
+        self._transaction_depth = 0 # > 0 while inside transaction(); execute_query then defers the commit
+        self._lock = threading.RLock() # The connection is shared between the GUI and the database worker thread
+        self.product_cache = ProductCache(product_cache_size)
+        self.product_generation = 0 # Bumped on every product change; caches compare against it
+        self._data_version = None # Last PRAGMA data_version seen, to notice other connections' commits
+        self._data_version_checked = None # time.monotonic() of that check
+        self.query_stats = QueryStats()
         self._connect()
         if self.conn is None or self.cursor is None:
             raise Exception("Database connection failed. Cannot create tables.")
@@ -15,179 +180,174 @@ class DatabaseManager:
 
     def _connect(self):
         try:
-            self.conn = sqlite3.connect(DATABASE_NAME)
+            # Autocommit mode: transactions are opened explicitly by transaction().
+            # Cross-thread use is allowed because every statement runs under self._lock.
+            self.conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False,
+                                        cached_statements=STATEMENT_CACHE_SIZE)
             self.cursor = self.conn.cursor()
-            print(f"Connected to database: {DATABASE_NAME}")
+            self._record_cursors = {} # row factory -> cursor that builds those records
+            self._apply_storage_profile()
+            self._apply_instrumentation()
+            print(f"Connected to database: {self.db_path}")
         except sqlite3.Error as e:
             print(f"Database connection error: {e}")
             # Handle error appropriately, e.g., exit application
 
+    def _apply_storage_profile(self):
+        # PRAGMA values cannot be bound as parameters, so they are checked against the profile keys
+        for pragma, value in self.storage_profile.items():
+            if pragma not in STORAGE_PROFILE:
+                raise ValueError(f"Unknown storage setting: {pragma}")
+            self.cursor.execute(f"PRAGMA {pragma} = {value}")
+
+    def _apply_instrumentation(self):
+        stats = self.query_stats
+        stats.enabled = INSTRUMENTATION['enabled']
+        stats.slow_query_ms = INSTRUMENTATION['slow_query_ms']
+        stats.progress_steps = INSTRUMENTATION['progress_steps'] if stats.enabled else 0
+        if self.conn is None:
+            return
+        self.conn.set_trace_callback(trace_log.debug if INSTRUMENTATION['trace'] else None)
+        if stats.progress_steps > 0:
+            self.conn.set_progress_handler(stats.count_progress, stats.progress_steps)
+        else:
+            self.conn.set_progress_handler(None, 0)
+
+    def save_query_stats(self, path=None):
+        # Keeps this session's statistics for `python query_stats.py` after the app has closed
+        if not self.query_stats.enabled:
+            return False
+        if path is None:
+            path = os.path.join(os.path.dirname(os.path.abspath(self.db_path)), STATS_FILE_NAME)
+        try:
+            self.query_stats.save(path)
+            return True
+        except OSError as e:
+            print(f"Could not save query statistics: {e}")
+            return False
+
     def _create_tables(self):
+        # Schema and default users both come from migrations, so a file whose user_version is
+        # current needs no DDL at all. Once a file is known to be current, later managers in this
+        # process skip even the user_version read.
         if self.conn is None or self.cursor is None:
             print("Cannot create tables: Database connection or cursor is not available.")
             return
+        file_key = self._file_key()
+        if file_key is not None and file_key in _initialized_files:
+            return
         try:
-            # Users table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL, -- In a real app, hash this!
-                    role TEXT DEFAULT 'operator'
-                )
-            ''')
-
-            # Products table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    barcode TEXT UNIQUE,
-                    sku_id TEXT UNIQUE NOT NULL,
-                    category TEXT,
-                    subcategory TEXT,
-                    product_name TEXT NOT NULL,
-                    description TEXT,
-                    tax_percentage REAL NOT NULL DEFAULT 0.0,
-                    price REAL NOT NULL,
-                    default_unit TEXT,
-                    image_path TEXT
-                )
-            ''')
-
-            # Suppliers table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS suppliers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    supplier_name TEXT NOT NULL,
-                    contact_person TEXT,
-                    phone TEXT,
-                    email TEXT,
-                    address TEXT
-                )
-            ''')
-
-            # Customers table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS customers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer_name TEXT NOT NULL,
-                    contact_person TEXT,
-                    phone TEXT,
-                    email TEXT,
-                    address TEXT
-                )
-            ''')
-
-            # Goods Receipts table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS goods_receipts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    receipt_date TEXT NOT NULL,
-                    product_id INTEGER NOT NULL,
-                    supplier_id INTEGER NOT NULL,
-                    quantity REAL NOT NULL,
-                    unit_of_measurement TEXT NOT NULL,
-                    rate_per_unit REAL NOT NULL,
-                    total_rate REAL NOT NULL,
-                    tax_amount REAL NOT NULL,
-                    operator_id INTEGER NOT NULL,
-                    FOREIGN KEY(product_id) REFERENCES products(id),
-                    FOREIGN KEY(supplier_id) REFERENCES suppliers(id),
-                    FOREIGN KEY(operator_id) REFERENCES users(id)
-                )
-            ''')
-
-            # Sales table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS sales (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sale_date TEXT NOT NULL,
-                    product_id INTEGER NOT NULL,
-                    customer_id INTEGER NOT NULL,
-                    quantity REAL NOT NULL,
-                    unit_of_measurement TEXT NOT NULL,
-                    rate_per_unit REAL NOT NULL,
-                    total_rate REAL NOT NULL,
-                    tax_amount REAL NOT NULL,
-                    operator_id INTEGER NOT NULL,
-                    FOREIGN KEY(product_id) REFERENCES products(id),
-                    FOREIGN KEY(customer_id) REFERENCES customers(id),
-                    FOREIGN KEY(operator_id) REFERENCES users(id)
-                )
-            ''')
-            self.conn.commit()
-            print("Database tables checked/created successfully.")
-            self._add_default_users() # Add default users after table creation
-
+            version = migrations.migrate(self)
+            print(f"Database schema is at version {version}.")
+            if file_key is not None and version == migrations.SCHEMA_VERSION:
+                _initialized_files.add(file_key)
         except sqlite3.Error as e:
             print(f"Error creating tables: {e}")
 
-    def _add_default_users(self):
-        # Add default operator logins if they don't exist
-        users_to_add = [
-            ('operator1', 'pass123', 'operator'),
-            ('operator2', 'securepass', 'operator')
-        ]
-        for username, password, role in users_to_add:
-            try:
-                if self.cursor is not None:
-                    self.cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                                        (username, password, role))
-                    if self.conn is not None:
-                        self.conn.commit()
-                    print(f"Default user '{username}' added.")
-                else:
-                    print("Cannot add default user: Cursor is not available.")
-            except sqlite3.IntegrityError:
-                print(f"User '{username}' already exists.")
-            except sqlite3.Error as e:
-                print(f"Error adding default user '{username}': {e}")
+    def _file_key(self):
+        # Identifies the database file; the inode tells a deleted-and-recreated file apart.
+        # In-memory and temporary databases are new on every connection, so they get no key.
+        if self.db_path in ('', ':memory:') or str(self.db_path).startswith('file:'):
+            return None
+        try:
+            return os.path.realpath(self.db_path), os.stat(self.db_path).st_ino
+        except OSError:
+            return None
 
     def close_connection(self):
         if self.conn:
             self.conn.close()
             print("Database connection closed.")
 
+    @contextmanager
+    def transaction(self):
+        # Groups several writes into one commit. Nested blocks become savepoints, so an
+        # inner failure can be rolled back without losing the outer transaction's work.
+        # The connection lock is held throughout, so other threads never interleave with it.
+        if self.cursor is None:
+            raise sqlite3.OperationalError("Cursor is not available.")
+        with self._lock:
+            depth = self._transaction_depth
+            if depth == 0:
+                self.cursor.execute("BEGIN IMMEDIATE")
+            else:
+                self.cursor.execute(f"SAVEPOINT sp_{depth}")
+            self._transaction_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._transaction_depth -= 1
+                if depth == 0:
+                    self.conn.rollback()
+                    self._bump_product_generation() # Cached rows may have been read from the rolled-back writes
+                else:
+                    self.cursor.execute(f"ROLLBACK TO sp_{depth}")
+                    self.cursor.execute(f"RELEASE sp_{depth}")
+                raise
+            else:
+                self._transaction_depth -= 1
+                if depth == 0:
+                    with self.query_stats.timing("COMMIT"):
+                        self.conn.commit()
+                else:
+                    self.cursor.execute(f"RELEASE sp_{depth}")
+
     def execute_query(self, query, params=None):
         if self.cursor is None:
             print("Database query error: Cursor is not available.")
             return False
         try:
-            if params:
-                self.cursor.execute(query, params)
-            else:
-                self.cursor.execute(query)
-            if self.conn is not None:
-                self.conn.commit()
+            with self._lock, self.query_stats.timing(query):
+                if params:
+                    self.cursor.execute(query, params)
+                else:
+                    self.cursor.execute(query)
+                if self.conn is not None and self._transaction_depth == 0:
+                    self.conn.commit()
             return True
         except sqlite3.Error as e:
             print(f"Database query error: {e}")
             return False
 
-    def fetch_all(self, query, params=None):
+    def _cursor_for(self, row_factory):
+        # Shared cursor for plain tuples; one extra cursor per record type otherwise
+        if row_factory is None:
+            return self.cursor
+        cursor = self._record_cursors.get(row_factory)
+        if cursor is None:
+            cursor = self._record_cursors[row_factory] = self.conn.cursor()
+            cursor.row_factory = row_factory
+        return cursor
+
+    def fetch_all(self, query, params=None, row_factory=None):
+        # row_factory (e.g. records.product_row) turns each row into a record instead of a tuple
         try:
             if self.cursor is None:
                 print("Database fetch error: Cursor is not available.")
                 return []
-            if params:
-                self.cursor.execute(query, params)
-            else:
-                self.cursor.execute(query)
-            return self.cursor.fetchall()
+            with self._lock, self.query_stats.timing(query):
+                cursor = self._cursor_for(row_factory)
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                return cursor.fetchall()
         except sqlite3.Error as e:
             print(f"Database fetch error: {e}")
             return []
 
-    def fetch_one(self, query, params=None):
+    def fetch_one(self, query, params=None, row_factory=None):
         try:
             if self.cursor is None:
                 print("Database fetch error: Cursor is not available.")
                 return None
-            if params:
-                self.cursor.execute(query, params)
-            else:
-                self.cursor.execute(query)
-            return self.cursor.fetchone()
+            with self._lock, self.query_stats.timing(query):
+                cursor = self._cursor_for(row_factory)
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                return cursor.fetchone()
         except sqlite3.Error as e:
             print(f"Database fetch error: {e}")
             return None
@@ -201,24 +361,179 @@ class DatabaseManager:
             return {'id': user[0], 'username': user[1], 'role': user[2]}
         return None
 
+    # --- Product Cache ---
+
+    def get_product_generation(self):
+        # Current product generation. PRAGMA data_version changes when another connection
+        # commits, which may have touched products, so that also starts a new generation.
+        # Our own product writes bump the generation directly; data_version is only read once
+        # per DATA_VERSION_CHECK_INTERVAL, so cache hits in between never touch SQLite.
+        now = time.monotonic()
+        if self._data_version_checked is not None and now - self._data_version_checked < DATA_VERSION_CHECK_INTERVAL:
+            return self.product_generation
+        with self._lock:
+            row = self.fetch_one("PRAGMA data_version")
+            self._data_version_checked = now
+            if row is not None and row[0] != self._data_version:
+                if self._data_version is not None:
+                    self._bump_product_generation()
+                self._data_version = row[0]
+            return self.product_generation
+
+    def _bump_product_generation(self):
+        with self._lock:
+            self.product_generation += 1
+            self.product_cache.clear()
+
+    def cache_stats(self):
+        stats = self.product_cache.stats()
+        stats['generation'] = self.product_generation
+        return stats
+
+    # Money arguments and columns (price, rate_per_unit, total_rate, tax_amount) are integer cents;
+    # see money.py for conversion and rounding.
     def add_product(self, barcode, sku_id, category, subcategory, product_name, description, tax_percentage, price, default_unit, image_path):
         query = '''
             INSERT INTO products (barcode, sku_id, category, subcategory, product_name, description, tax_percentage, price, default_unit, image_path)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         '''
-        return self.execute_query(query, (barcode, sku_id, category, subcategory, product_name, description, tax_percentage, price, default_unit, image_path))
+        success = self.execute_query(query, (barcode, sku_id, category, subcategory, product_name, description, tax_percentage, price, default_unit, image_path))
+        self._bump_product_generation()
+        return success
+
+    # The product getters check the generation, read and fill the cache under the connection
+    # lock, so a read that started before a bump (e.g. restore_from()) cannot put its rows back
+    # into the cache after it. Cached Products are read-only; get_all_products() returns a new list.
 
     def get_all_products(self):
-        query = "SELECT id, barcode, sku_id, category, subcategory, product_name, description, tax_percentage, price, default_unit, image_path FROM products"
-        return self.fetch_all(query)
+        with self._lock:
+            self.get_product_generation()
+            if self.product_cache.all_rows is not None:
+                self.product_cache.hits += 1
+                return list(self.product_cache.all_rows)
+            self.product_cache.misses += 1
+            query = f"SELECT {Product.select_list()} FROM products"
+            products = self.fetch_all(query, row_factory=product_row)
+            if products is not None and len(products) <= self.product_cache.max_size:
+                for product in products:
+                    self.product_cache.put(product)
+                self.product_cache.all_rows = list(products)
+            return products
+
+    def get_products_page(self, sort_column='id', descending=False, after_row=None, limit=PRODUCT_PAGE_SIZE, search=None):
+        # Keyset pagination: returns the next `limit` products after `after_row` (the last row
+        # of the previous page) in (sort_column, id) order, so each page costs the same to fetch.
+        # `search` restricts the rows to full-text matches (see search_products()).
+        if sort_column not in PRODUCT_COLUMNS:
+            raise ValueError(f"Unknown product column: {sort_column}")
+        key = f"IFNULL({sort_column}, '')" if sort_column in NULLABLE_PRODUCT_COLUMNS else sort_column
+        direction, comparison = ('DESC', '<') if descending else ('ASC', '>')
+        conditions, params = [], []
+        if search:
+            match = self._fts_match_expression(search)
+            if match is None:
+                return []
+            conditions.append("id IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)")
+            params.append(match)
+        if after_row is not None:
+            last_value = getattr(after_row, sort_column)
+            if sort_column in NULLABLE_PRODUCT_COLUMNS and last_value is None:
+                last_value = ''
+            if sort_column == 'id':
+                conditions.append(f"id {comparison} ?")
+                params.append(last_value)
+            else:
+                conditions.append(f"({key}, id) {comparison} (?, ?)")
+                params.extend([last_value, after_row.id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order = f"id {direction}" if sort_column == 'id' else f"{key} {direction}, id {direction}"
+        query = f"SELECT {Product.select_list()} FROM products {where} ORDER BY {order} LIMIT ?"
+        return self.fetch_all(query, params + [limit], row_factory=product_row)
+
+    @staticmethod
+    def _fts_match_expression(text):
+        # Turns free text into an FTS5 query: every word must match, and the last one may be a prefix.
+        # Words are quoted so user input can never be parsed as FTS operators.
+        words = re.findall(r"\w+", text)
+        if not words:
+            return None
+        return ' '.join(f'"{word}"' for word in words[:-1]) + (' ' if len(words) > 1 else '') + f'"{words[-1]}"*'
+
+    def search_products(self, query, limit=SEARCH_RESULT_LIMIT):
+        # Ranked full-text search over name, description, category and subcategory.
+        # bm25 weights favour name matches over category and description matches.
+        match = self._fts_match_expression(query)
+        if match is None:
+            return []
+        sql = f'''
+            SELECT {Product.select_list('p')}
+            FROM products_fts JOIN products p ON p.id = products_fts.rowid
+            WHERE products_fts MATCH ?
+            ORDER BY bm25(products_fts, 10.0, 1.0, 3.0, 2.0)
+            LIMIT ?
+        '''
+        return self.fetch_all(sql, (match, limit), row_factory=product_row)
+
+    def search_products_by_prefix(self, prefix, limit=PICKER_MATCH_LIMIT):
+        # Up to `limit` (id, sku_id, product_name) rows whose SKU or name starts with `prefix`.
+        # Each half is capped on its own so a one-letter prefix never walks the whole index.
+        pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        query = '''
+            SELECT id, sku_id, product_name FROM (
+                SELECT id, sku_id, product_name FROM products
+                WHERE sku_id LIKE ? ESCAPE '\\' ORDER BY sku_id COLLATE NOCASE LIMIT ?)
+            UNION
+            SELECT id, sku_id, product_name FROM (
+                SELECT id, sku_id, product_name FROM products
+                WHERE product_name LIKE ? ESCAPE '\\' ORDER BY product_name COLLATE NOCASE LIMIT ?)
+            ORDER BY product_name COLLATE NOCASE
+            LIMIT ?
+        '''
+        return self.fetch_all(query, (pattern, limit, pattern, limit, limit))
 
     def get_product_by_id(self, product_id):
-        query = "SELECT * FROM products WHERE id = ?"
-        return self.fetch_one(query, (product_id,))
+        with self._lock:
+            self.get_product_generation()
+            product = self.product_cache.get(product_id)
+            if product is None:
+                query = f"SELECT {Product.select_list()} FROM products WHERE id = ?"
+                product = self._cache_product(self.fetch_one(query, (product_id,), row_factory=product_row))
+            return product
 
     def get_product_by_sku(self, sku_id):
-        query = "SELECT * FROM products WHERE sku_id = ?"
-        return self.fetch_one(query, (sku_id,))
+        with self._lock:
+            self.get_product_generation()
+            product = self.product_cache.get_by_sku(sku_id)
+            if product is None:
+                query = f"SELECT {Product.select_list()} FROM products WHERE sku_id = ?"
+                product = self._cache_product(self.fetch_one(query, (sku_id,), row_factory=product_row))
+            return product
+
+    def get_product_by_barcode(self, barcode):
+        with self._lock:
+            self.get_product_generation()
+            product = self.product_cache.get_by_barcode(barcode)
+            if product is None:
+                query = f"SELECT {Product.select_list()} FROM products WHERE barcode = ?"
+                product = self._cache_product(self.fetch_one(query, (barcode,), row_factory=product_row))
+            return product
+
+    def _cache_product(self, product):
+        if product is not None:
+            self.product_cache.put(product)
+        return product
+
+    def set_product_image_paths(self, updates):
+        # updates are (image_path, product_id) pairs, written in one transaction
+        try:
+            with self.transaction():
+                self.cursor.executemany("UPDATE products SET image_path = ? WHERE id = ?", updates)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error updating product images: {e}")
+            return False
+        finally:
+            self._bump_product_generation()
 
     def update_product(self, product_id, barcode, sku_id, category, subcategory, product_name, description, tax_percentage, price, default_unit, image_path):
         query = '''
@@ -227,11 +542,15 @@ class DatabaseManager:
                 description = ?, tax_percentage = ?, price = ?, default_unit = ?, image_path = ?
             WHERE id = ?
         '''
-        return self.execute_query(query, (barcode, sku_id, category, subcategory, product_name, description, tax_percentage, price, default_unit, image_path, product_id))
+        success = self.execute_query(query, (barcode, sku_id, category, subcategory, product_name, description, tax_percentage, price, default_unit, image_path, product_id))
+        self._bump_product_generation()
+        return success
 
     def delete_product(self, product_id):
         query = "DELETE FROM products WHERE id = ?"
-        return self.execute_query(query, (product_id,))
+        success = self.execute_query(query, (product_id,))
+        self._bump_product_generation()
+        return success
 
     def add_supplier(self, name, contact, phone, email, address):
         query = "INSERT INTO suppliers (supplier_name, contact_person, phone, email, address) VALUES (?, ?, ?, ?, ?)"
@@ -250,22 +569,327 @@ class DatabaseManager:
         return self.fetch_all(query)
 
     def add_goods_receipt(self, receipt_date, product_id, supplier_id, quantity, unit, rate_per_unit, total_rate, tax_amount, operator_id):
+        return self.execute_query(GOODS_RECEIPT_INSERT, (receipt_date, product_id, supplier_id, quantity, unit, rate_per_unit, total_rate, tax_amount, operator_id))
+
+    def add_sale(self, sale_date, product_id, customer_id, quantity, unit, rate_per_unit, total_rate, tax_amount, operator_id):
+        return self.execute_query(SALE_INSERT, (sale_date, product_id, customer_id, quantity, unit, rate_per_unit, total_rate, tax_amount, operator_id))
+
+    def get_goods_receipt(self, receipt_id):
+        receipt = self.fetch_one(f"SELECT {Receipt.select_list()} FROM goods_receipts WHERE id = ?", (receipt_id,),
+                                 row_factory=receipt_row)
+        if receipt is None:
+            receipt = self._find_archived('goods_receipts', Receipt, receipt_id)
+        return receipt
+
+    def get_sale(self, sale_id):
+        sale = self.fetch_one(f"SELECT {Sale.select_list()} FROM sales WHERE id = ?", (sale_id,), row_factory=sale_row)
+        if sale is None:
+            sale = self._find_archived('sales', Sale, sale_id)
+        return sale
+
+    def add_invoice(self, invoice_date, customer_id, lines, operator_id):
+        # lines are (product_id, quantity, unit, rate_per_unit, tax_percentage) with rates in cents.
+        # All lines are priced in one batch, then the header and every line are written in a single
+        # transaction. Returns the new invoice id, or None if nothing was written.
+        lines = [tuple(line) for line in lines]
+        if not lines:
+            return None
+        product_ids, quantities, units, rates, tax_percentages = zip(*lines)
+        sub_totals, tax_amounts, totals = calculate_totals_batch(quantities, rates, tax_percentages)
+        try:
+            with self.transaction():
+                self.cursor.execute(INVOICE_INSERT, (invoice_date, customer_id, len(lines), sum(sub_totals),
+                                                     sum(tax_amounts), sum(totals), operator_id))
+                invoice_id = self.cursor.lastrowid
+                self.cursor.executemany(INVOICE_LINE_INSERT, [
+                    (invoice_date, product_id, customer_id, quantity, unit, rate, total, tax_amount, operator_id, invoice_id)
+                    for product_id, quantity, unit, rate, total, tax_amount
+                    in zip(product_ids, quantities, units, rates, totals, tax_amounts)])
+            return invoice_id
+        except sqlite3.Error as e:
+            print(f"Error adding invoice: {e}")
+            return None
+
+    def get_invoice(self, invoice_id):
         query = '''
-            INSERT INTO goods_receipts (receipt_date, product_id, supplier_id, quantity, unit_of_measurement, rate_per_unit, total_rate, tax_amount, operator_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            SELECT id, invoice_date, customer_id, line_count, sub_total, tax_amount, total_amount, operator_id
+            FROM invoices WHERE id = ?
         '''
-        return self.execute_query(query, (receipt_date, product_id, supplier_id, quantity, unit, rate_per_unit, total_rate, tax_amount, operator_id))
+        return self.fetch_one(query, (invoice_id,))
 
-    def add_sale(self, sale_date, product_id, customer_id, quantity, unit, rate_per_unit, total_rate, tax_amount, operator_id):
+    def get_invoice_lines(self, invoice_id):
+        # Invoice headers always stay in the hot database; the lines of an archived invoice are
+        # read from the archive of its year
         query = '''
-            INSERT INTO sales (sale_date, product_id, customer_id, quantity, unit_of_measurement, rate_per_unit, total_rate, tax_amount, operator_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            SELECT s.id, s.product_id, p.product_name, s.quantity, s.unit_of_measurement, s.rate_per_unit, s.tax_amount, s.total_rate
+            FROM {sales} s LEFT JOIN products p ON p.id = s.product_id
+            WHERE s.invoice_id = ? ORDER BY s.id
         '''
-        return self.execute_query(query, (sale_date, product_id, customer_id, quantity, unit, rate_per_unit, total_rate, tax_amount, operator_id))
+        lines = self.fetch_all(query.format(sales='sales'), (invoice_id,))
+        if lines:
+            return lines
+        invoice = self.get_invoice(invoice_id)
+        if invoice is None or int(invoice[1][:4]) not in archive_years(self.db_path):
+            return lines
+        try:
+            with self.archives_attached(invoice[1], invoice[1]):
+                return self.fetch_all(query.format(sales='all_sales'), (invoice_id,))
+        except sqlite3.Error as e:
+            print(f"Error reading archived invoice lines: {e}")
+            return []
+
+    # --- Derived Tables ---
+
+    def get_stock_level(self, product_id):
+        # O(1) lookup in the trigger-maintained ledger; products never received or sold have 0 on hand
+        row = self.fetch_one("SELECT quantity FROM stock_levels WHERE product_id = ?", (product_id,))
+        return row[0] if row else 0.0
+
+    def rebuild_stock_levels(self):
+        # Recomputes the whole ledger from goods_receipts and sales, archived years included
+        try:
+            with self._lock:
+                self._stage_archive_totals('archived_stock', 'product_id, quantity', migrations.stock_from_history)
+                with self.transaction():
+                    self.cursor.execute("DELETE FROM stock_levels")
+                    self.cursor.execute(f"INSERT INTO stock_levels (product_id, quantity) {STOCK_WITH_ARCHIVES}")
+            return True
+        except sqlite3.Error as e:
+            print(f"Error rebuilding stock levels: {e}")
+            return False
+
+    def verify_stock_levels(self, tolerance=1e-6):
+        # Returns (product_id, recorded, expected) for every product whose ledger entry has drifted
+        try:
+            with self._lock:
+                self._stage_archive_totals('archived_stock', 'product_id, quantity', migrations.stock_from_history)
+        except sqlite3.Error as e:
+            print(f"Error reading archived stock: {e}")
+            return None
+        query = f'''
+            WITH history (product_id, total) AS ({STOCK_WITH_ARCHIVES})
+            SELECT product_id, recorded, expected FROM (
+                SELECT h.product_id, IFNULL(s.quantity, 0) AS recorded, h.total AS expected
+                FROM history h LEFT JOIN stock_levels s ON s.product_id = h.product_id
+                UNION ALL
+                SELECT s.product_id, s.quantity, 0 FROM stock_levels s
+                WHERE s.product_id NOT IN (SELECT product_id FROM history)
+            ) WHERE ABS(recorded - expected) > ?
+        '''
+        return self.fetch_all(query, (tolerance,))
+
+    def rebuild_daily_rollups(self):
+        # Recomputes the reporting rollups from sales and goods_receipts, archived years included
+        try:
+            with self._lock:
+                for table in migrations.SPLIT_ROLLUPS:
+                    self._stage_archive_totals(f'archived_{table}', migrations.split_rollup_columns(table),
+                                               lambda schema, table=table: migrations.split_rollups_from_history(table, schema))
+                with self.transaction():
+                    for table in migrations.SPLIT_ROLLUPS:
+                        self.cursor.execute(f"DELETE FROM {table}")
+                        self.cursor.execute(f"INSERT INTO {table} ({migrations.split_rollup_columns(table)}) {rollups_with_archives(table)}")
+                    # Archived years are already in the product rollups the categories are summed from
+                    self.cursor.execute("DELETE FROM daily_category_rollups")
+                    self.cursor.execute(f"INSERT INTO daily_category_rollups ({migrations.CATEGORY_ROLLUP_COLUMNS}) "
+                                        f"{migrations.CATEGORY_ROLLUPS_FROM_PRODUCT_ROLLUPS}")
+            return True
+        except sqlite3.Error as e:
+            print(f"Error rebuilding daily rollups: {e}")
+            return False
+
+    # --- Archives ---
+    # Closed years of sales and goods receipts can be moved into one file per year (see archive.py).
+    # stock_levels and the daily rollups keep their archived totals, so stock and reports need no
+    # archive; only queries over individual archived rows attach the files they need.
+
+    def attach_archive(self, year, create=False):
+        # Attaches the archive of `year` as schema archive_<year>; returns the schema name, or None
+        # if there is no archive for that year. Not allowed inside transaction().
+        path = archive_path(self.db_path, year)
+        if create:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        elif not os.path.exists(path):
+            return None
+        schema = f"archive_{int(year)}"
+        with self._lock:
+            self.cursor.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        return schema
+
+    def detach_archive(self, schema):
+        with self._lock:
+            self.cursor.execute(f"DETACH DATABASE {schema}")
+
+    @contextmanager
+    def exclusive(self):
+        # Keeps other threads off the shared connection across several transactions or ATTACHes
+        with self._lock:
+            yield self
+
+    @contextmanager
+    def archives_attached(self, start_date=None, end_date=None):
+        # For the duration of the block, the TEMP views all_sales and all_goods_receipts combine the
+        # hot tables with the archives of the years between the (inclusive) dates. The connection
+        # lock is held throughout, so other threads wait rather than see the views come and go.
+        # Yields the attached years.
+        first = int(start_date[:4]) if start_date else None
+        last = int(end_date[:4]) if end_date else None
+        years = [year for year in archive_years(self.db_path)
+                 if (first is None or year >= first) and (last is None or year <= last)]
+        if len(years) > MAX_ATTACHED_ARCHIVES:
+            raise ValueError(f"{len(years)} archive years are too many to query at once; narrow the date range.")
+        with self._lock:
+            if self._transaction_depth:
+                raise sqlite3.OperationalError("Archives cannot be attached inside a transaction.")
+            schemas = []
+            try:
+                for year in years:
+                    schemas.append(self.attach_archive(year))
+                for view, table, record in (('all_sales', 'sales', Sale), ('all_goods_receipts', 'goods_receipts', Receipt)):
+                    arms = [f"SELECT {record.select_list()} FROM {schema}.{table}" for schema in ['main'] + schemas]
+                    self.cursor.execute(f"CREATE TEMP VIEW {view} AS {' UNION ALL '.join(arms)}")
+                yield years
+            finally:
+                self.cursor.execute("DROP VIEW IF EXISTS temp.all_sales")
+                self.cursor.execute("DROP VIEW IF EXISTS temp.all_goods_receipts")
+                for schema in schemas:
+                    self.detach_archive(schema)
+
+    def _find_archived(self, table, record, row_id):
+        # By-id lookup of a row no longer in the hot table; archives are searched newest first,
+        # one attached at a time
+        try:
+            with self._lock:
+                if self._transaction_depth:
+                    return None
+                for year in reversed(archive_years(self.db_path)):
+                    schema = self.attach_archive(year)
+                    try:
+                        rows = self.cursor.execute(f"SELECT {record.select_list()} FROM {schema}.{table} WHERE id = ?",
+                                                   (row_id,)).fetchall()
+                    finally:
+                        self.detach_archive(schema)
+                    if rows:
+                        return record(*rows[0])
+        except sqlite3.Error as e:
+            print(f"Error reading archived {table}: {e}")
+        return None
+
+    def _stage_archive_totals(self, temp_table, columns, history):
+        # Fills a TEMP table with history(schema) of every archive, attaching one file at a time so
+        # any number of years fits under SQLite's limit on attached databases. Archives only hold
+        # closed years, so the staged totals stay valid while the hot tables are rebuilt.
+        self.cursor.execute(f"DROP TABLE IF EXISTS temp.{temp_table}")
+        self.cursor.execute(f"CREATE TEMP TABLE {temp_table} ({columns})")
+        for year in archive_years(self.db_path):
+            schema = self.attach_archive(year)
+            try:
+                self.cursor.execute(f"INSERT INTO temp.{temp_table} ({columns}) {history(schema)}")
+            finally:
+                self.detach_archive(schema)
+
+    # --- Backup ---
+
+    def restore_from(self, path, pages=-1, progress=None):
+        # Overwrites this database with the SQLite file at `path` (see backup.py) through the
+        # backup API. The copy is a single write transaction on the shared connection, so other
+        # connections see either the old or the restored database, never a mix. progress is
+        # passed on to Connection.backup(). Raises sqlite3.Error on failure.
+        with self._lock:
+            if self._transaction_depth:
+                raise sqlite3.OperationalError("Cannot restore inside a transaction.")
+            # A partly read SELECT keeps a read transaction open, under which the backup API refuses
+            # to write, so the cursors are closed and replaced
+            for cursor in [self.cursor, *self._record_cursors.values()]:
+                cursor.close()
+            self.cursor = self.conn.cursor()
+            self._record_cursors = {}
+            source = sqlite3.connect(path)
+            try:
+                source.backup(self.conn, pages=pages, progress=progress)
+            finally:
+                source.close()
+                self._bump_product_generation()
+            # The backup may predate later migrations
+            _initialized_files.discard(self._file_key())
+            self._create_tables()
+
+    # --- Bulk Operations ---
+    # Each row is a tuple in the same order as the arguments of the single-row method.
+    # The whole batch is written in one transaction; the return value is a list of
+    # (row_index, error_message) for the rows that were rejected (empty when all succeed).
+
+    def add_goods_receipts_bulk(self, receipts):
+        return self._insert_bulk(GOODS_RECEIPT_INSERT, receipts, 9)
+
+    def add_sales_bulk(self, sales):
+        return self._insert_bulk(SALE_INSERT, sales, 9)
+
+    def upsert_products_bulk(self, products):
+        # Rows follow add_product() argument order; existing products are updated in place
+        failures = self._insert_bulk(PRODUCT_UPSERT, products, 10)
+        self._bump_product_generation()
+        return [(index, "Barcode already belongs to a product with a different SKU ID."
+                 if reason == "UNIQUE constraint failed: products.barcode" else reason)
+                for index, reason in failures]
+
+    def _insert_bulk(self, query, rows, width):
+        rows = list(rows)
+        failures = []
+        try:
+            with self.transaction():
+                chunk = []
+                for index, row in enumerate(rows):
+                    row = tuple(row)
+                    if len(row) != width:
+                        failures.append((index, f"Expected {width} values, got {len(row)}."))
+                        continue
+                    chunk.append((index, row))
+                    if len(chunk) >= BULK_CHUNK_SIZE:
+                        failures.extend(self._insert_chunk(query, chunk))
+                        chunk = []
+                if chunk:
+                    failures.extend(self._insert_chunk(query, chunk))
+        except sqlite3.Error as e:
+            # The transaction itself failed (e.g. the database stayed locked), so nothing was written
+            print(f"Database bulk insert error: {e}")
+            return [(index, str(e)) for index in range(len(rows))]
+        return sorted(failures)
+
+    def _insert_chunk(self, query, chunk):
+        # Fast path: one executemany() for the whole chunk. If any row fails, undo the chunk
+        # and replay it row by row so only the offending rows are rejected.
+        try:
+            with self.transaction(), self.query_stats.timing(query):
+                self.cursor.executemany(query, [row for _, row in chunk])
+            return []
+        except sqlite3.Error:
+            pass
+        failures = []
+        for index, row in chunk:
+            try:
+                self.cursor.execute(query, row)
+            except sqlite3.Error as e:
+                failures.append((index, str(e)))
+        return failures
 
 # Example Usage (for testing the DB manager)
+# python database_manager.py [verify-stock | rebuild-stock]
 if __name__ == '__main__':
     db = DatabaseManager()
+    if len(sys.argv) > 1 and sys.argv[1] == 'verify-stock':
+        mismatches = db.verify_stock_levels()
+        if mismatches is None:
+            print("The stock check could not run.")
+            sys.exit(1)
+        for product_id, recorded, expected in mismatches:
+            print(f"Product {product_id}: ledger has {recorded}, history gives {expected}")
+        print(f"{len(mismatches)} stock level mismatches found.")
+        sys.exit(1 if mismatches else 0)
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild-stock':
+        rebuilt = db.rebuild_stock_levels()
+        print("Stock levels rebuilt." if rebuilt else "Stock level rebuild failed.")
+        sys.exit(0 if rebuilt else 1)
     # You can add test queries here to verify table creation and user insertion
     print("\nVerifying default users:")
     user1 = db.verify_user('operator1', 'pass123')
@@ -0,0 +1,107 @@
+import queue
+from PySide6.QtCore import Qt, QThread, Signal
+from database_manager import get_db_manager
+
+class DbRequest:
+    # Handle for a queued database call. cancel() skips it if it has not started yet and
+    # always suppresses its callbacks, so a stale result never reaches the UI.
+    __slots__ = ('func', 'args', 'kwargs', 'on_result', 'on_error', 'key', 'cancelled')
+
+    def __init__(self, func, args, kwargs, on_result, on_error, key):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_result = on_result
+        self.on_error = on_error
+        self.key = key
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class DatabaseWorker(QThread):
+    # Runs database calls one at a time on a dedicated thread and hands results back to the
+    # GUI thread through a queued signal. Being the only thread that writes, it also keeps
+    # writes serialized on the shared connection.
+    _request_done = Signal(object, object, object) # request, result, error
+
+    def __init__(self, db_manager, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self._queue = queue.Queue()
+        self._latest_by_key = {}
+        self._request_done.connect(self._deliver, Qt.ConnectionType.QueuedConnection)
+
+    def submit(self, func, *args, on_result=None, on_error=None, key=None, **kwargs):
+        # Queues func(db_manager, *args, **kwargs). A newer request with the same `key`
+        # cancels the older one, e.g. a search for "ab" supersedes the one for "a".
+        request = DbRequest(func, args, kwargs, on_result, on_error, key)
+        if key is not None:
+            previous = self._latest_by_key.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._latest_by_key[key] = request
+        if not self.isRunning():
+            self.start()
+        self._queue.put(request)
+        return request
+
+    def call(self, method_name, *args, on_result=None, on_error=None, key=None, **kwargs):
+        # Shorthand for running one DatabaseManager method in the background
+        return self.submit(lambda db, *a, **kw: getattr(db, method_name)(*a, **kw), *args,
+                           on_result=on_result, on_error=on_error, key=key, **kwargs)
+
+    def run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                break
+            if request.cancelled:
+                continue
+            try:
+                result, error = request.func(self.db_manager, *request.args, **request.kwargs), None
+            except Exception as e:
+                result, error = None, e
+            self._request_done.emit(request, result, error)
+
+    def _deliver(self, request, result, error):
+        if request.key is not None and self._latest_by_key.get(request.key) is request:
+            del self._latest_by_key[request.key]
+        if request.cancelled:
+            return
+        if error is not None:
+            if request.on_error:
+                request.on_error(error)
+            else:
+                print(f"Background database error: {error}")
+        elif request.on_result:
+            request.on_result(result)
+
+    def stop(self):
+        # Lets queued work finish, then ends the thread
+        if self.isRunning():
+            self._queue.put(None)
+            self.wait()
+
+def set_busy(widget, busy, *buttons):
+    # Busy cursor plus disabled action buttons while a background request is in flight
+    if busy:
+        widget.setCursor(Qt.CursorShape.BusyCursor)
+    else:
+        widget.unsetCursor()
+    for button in buttons:
+        button.setEnabled(not busy)
+
+_shared_worker = None
+
+def get_db_worker():
+    global _shared_worker
+    if _shared_worker is None:
+        _shared_worker = DatabaseWorker(get_db_manager())
+    return _shared_worker
+
+def stop_db_worker():
+    global _shared_worker
+    if _shared_worker is not None:
+        _shared_worker.stop()
+        _shared_worker = None
@@ -3,13 +3,18 @@ from PySide6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
                                QLineEdit, QPushButton, QLabel, QDoubleSpinBox,
                                QComboBox, QMessageBox, QDateEdit)
 from PySide6.QtCore import Qt, QDate
-from database_manager import DatabaseManager
+from db_worker import get_db_worker, set_busy
+from barcode_index import get_barcode_index
+from scan_input import ScanLineEdit
+from product_picker import ProductPicker, product_label
+from money import to_cents, from_cents, format_money, line_totals
 
 class GoodsReceivingForm(QWidget):
     def __init__(self, operator_id):
         super().__init__()
         self.operator_id = operator_id
-        self.db_manager = DatabaseManager()
+        self.db_worker = get_db_worker()
+        self.barcode_index = get_barcode_index()
         self.init_ui()
         self.load_initial_data()
 
@@ -25,11 +30,18 @@ class GoodsReceivingForm(QWidget):
         self.form_grid.addWidget(QLabel("Receipt Date:"))
         self.form_grid.addWidget(self.date_input)
 
-        self.product_combo = QComboBox()
-        self.product_combo.setPlaceholderText("Select Product")
-        self.product_combo.currentIndexChanged.connect(self.update_product_details)
+        self.scan_input = ScanLineEdit()
+        self.scan_input.barcode_scanned.connect(self.handle_barcode_scan)
+        self.form_grid.addWidget(QLabel("Scan Barcode:"))
+        self.form_grid.addWidget(self.scan_input)
+
+        self.scan_status_label = QLabel("")
+        self.form_grid.addWidget(self.scan_status_label)
+
+        self.product_picker = ProductPicker() # Type-ahead search instead of listing every product
+        self.product_picker.product_selected.connect(self.update_product_details)
         self.form_grid.addWidget(QLabel("Product:"))
-        self.form_grid.addWidget(self.product_combo)
+        self.form_grid.addWidget(self.product_picker)
 
         self.supplier_combo = QComboBox()
         self.supplier_combo.setPlaceholderText("Select Supplier")
@@ -80,56 +92,80 @@ class GoodsReceivingForm(QWidget):
         self.setLayout(self.main_layout)
 
     def load_initial_data(self):
-        products = self.db_manager.get_all_products()
-        self.product_combo.clear()
-        self.product_combo.addItem("Select Product", userData=None)
-        for product in products:
-            self.product_combo.addItem(f"{product[5]} (SKU: {product[2]})", userData=product[0]) # Display name (SKU), store ID
+        self.db_worker.call('get_all_suppliers', on_result=self.suppliers_loaded)
+        self.db_worker.submit(lambda db: self.barcode_index.refresh()) # Build the scan index off the GUI thread
 
-        suppliers = self.db_manager.get_all_suppliers()
+    def suppliers_loaded(self, suppliers):
         self.supplier_combo.clear()
         self.supplier_combo.addItem("Select Supplier", userData=None)
         for supplier in suppliers:
             self.supplier_combo.addItem(supplier[1], userData=supplier[0]) # Display name, store ID
 
-    def update_product_details(self):
-        selected_product_id = self.product_combo.currentData()
+    def update_product_details(self, selected_product_id):
         if selected_product_id:
-            product = self.db_manager.get_product_by_id(selected_product_id)
-            if product:
-                # product is a tuple: (id, barcode, sku_id, category, subcategory, product_name, description, tax_percentage, price, default_unit, image_path)
-                self.unit_of_measurement_input.setText(product[9]) # Default unit
-                self.rate_per_unit_input.setValue(product[8]) # Default price as initial rate
-                self.tax_percentage_display.setText(f"Tax: {product[7]:.2f}%")
-                self.current_product_tax_rate = product[7] # Store for calculation
-                self.calculate_totals()
+            # Runs in the background; picking another product cancels a lookup still in flight
+            self.db_worker.call('get_product_by_id', selected_product_id,
+                                key='receiving_product_details', on_result=self.product_details_loaded)
         else:
+            self.db_worker.submit(lambda db: None, key='receiving_product_details') # Cancels any pending lookup
             self.unit_of_measurement_input.clear()
             self.rate_per_unit_input.setValue(0.00)
             self.tax_percentage_display.setText("Tax: 0.00%")
             self.current_product_tax_rate = 0.00
             self.calculate_totals()
 
+    def product_details_loaded(self, product):
+        if product:
+            self.show_product_details(product.default_unit, product.price, product.tax_percentage)
+
+    def show_product_details(self, default_unit, price, tax_percentage):
+        self.unit_of_measurement_input.setText(default_unit or "") # Default unit
+        self.rate_per_unit_input.setValue(from_cents(price)) # Default price (cents) as initial rate
+        self.tax_percentage_display.setText(f"Tax: {tax_percentage:.2f}%")
+        self.current_product_tax_rate = tax_percentage # Store for calculation
+        self.calculate_totals()
+
+    def handle_barcode_scan(self, barcode):
+        # Scanner fast path: resolved from the in-memory barcode index, no database round trip.
+        # Only the first scan after a product change waits for the index to be rebuilt.
+        if self.barcode_index.is_current():
+            self.apply_scanned_product(barcode, self.barcode_index.lookup_cached(barcode))
+        else:
+            self.db_worker.submit(lambda db: self.barcode_index.lookup(barcode),
+                                  on_result=lambda product: self.apply_scanned_product(barcode, product))
+
+    def apply_scanned_product(self, barcode, product):
+        if product is None:
+            self.scan_status_label.setText(f"Unknown barcode: {barcode}")
+            QApplication.beep()
+            return
+        product_id, sku_id, product_name, tax_percentage, price, default_unit = product
+        if self.product_picker.current_product_id() == product_id:
+            self.quantity_input.setValue(self.quantity_input.value() + 1) # Repeat scans add one more
+        else:
+            # Details come from the index, so the picker does not notify update_product_details
+            self.product_picker.set_product(product_id, product_label(product_name, sku_id), notify=False)
+            self.quantity_input.setValue(1)
+            self.show_product_details(default_unit, price, tax_percentage)
+        self.scan_status_label.setText(f"Scanned: {product_name} (SKU: {sku_id})")
 
     def calculate_totals(self):
         quantity = self.quantity_input.value()
-        rate_per_unit = self.rate_per_unit_input.value()
+        rate_per_unit = to_cents(self.rate_per_unit_input.value())
         tax_percentage = getattr(self, 'current_product_tax_rate', 0.00) # Get the stored tax rate
 
-        sub_total = quantity * rate_per_unit
-        tax_amount = sub_total * (tax_percentage / 100)
-        total_rate = sub_total + tax_amount
+        sub_total, tax_amount, total_rate = line_totals(quantity, rate_per_unit, tax_percentage)
 
-        self.total_rate_label.setText(f"Total Rate: ${total_rate:.2f}")
-        self.tax_amount_label.setText(f"Tax Amount: ${tax_amount:.2f}")
+        self.total_rate_label.setText(f"Total Rate: {format_money(total_rate)}")
+        self.tax_amount_label.setText(f"Tax Amount: {format_money(tax_amount)}")
 
     def add_goods_receipt(self):
         receipt_date = self.date_input.date().toString(Qt.DateFormat.ISODate)
-        product_id = self.product_combo.currentData()
+        product_id = self.product_picker.current_product_id()
         supplier_id = self.supplier_combo.currentData()
         quantity = self.quantity_input.value()
         unit_of_measurement = self.unit_of_measurement_input.text().strip()
-        rate_per_unit = self.rate_per_unit_input.value()
+        rate_per_unit = to_cents(self.rate_per_unit_input.value())
 
         if not (product_id and supplier_id and quantity > 0 and unit_of_measurement and rate_per_unit > 0):
             QMessageBox.warning(self, "Input Error", "Please fill all required fields and ensure quantity/rate are positive.")
@@ -137,21 +173,29 @@ class GoodsReceivingForm(QWidget):
 
         # Recalculate to ensure accuracy
         tax_percentage = getattr(self, 'current_product_tax_rate', 0.00)
-        sub_total = quantity * rate_per_unit
-        tax_amount = sub_total * (tax_percentage / 100)
-        total_rate = sub_total + tax_amount
+        sub_total, tax_amount, total_rate = line_totals(quantity, rate_per_unit, tax_percentage) # Cents
 
-        if self.db_manager.add_goods_receipt(receipt_date, product_id, supplier_id, quantity,
-                                              unit_of_measurement, rate_per_unit, total_rate,
-                                              tax_amount, self.operator_id):
+        set_busy(self, True, self.add_receipt_button)
+        self.db_worker.call('add_goods_receipt', receipt_date, product_id, supplier_id, quantity,
+                            unit_of_measurement, rate_per_unit, total_rate,
+                            tax_amount, self.operator_id,
+                            on_result=self.goods_receipt_added, on_error=self.goods_receipt_failed)
+
+    def goods_receipt_added(self, success):
+        set_busy(self, False, self.add_receipt_button)
+        if success:
             QMessageBox.information(self, "Success", "Goods receipt added successfully!")
             self.clear_form()
         else:
             QMessageBox.critical(self, "Error", "Failed to add goods receipt.")
 
+    def goods_receipt_failed(self, error):
+        set_busy(self, False, self.add_receipt_button)
+        QMessageBox.critical(self, "Error", f"Failed to add goods receipt: {error}")
+
     def clear_form(self):
         self.date_input.setDate(QDate.currentDate())
-        self.product_combo.setCurrentIndex(0)
+        self.product_picker.clear_selection()
         self.supplier_combo.setCurrentIndex(0)
         self.quantity_input.setValue(0.00)
         self.unit_of_measurement_input.clear()
@@ -160,6 +204,8 @@ class GoodsReceivingForm(QWidget):
         self.tax_amount_label.setText("Tax Amount: $0.00")
         self.tax_percentage_display.setText("Tax: 0.00%")
         self.current_product_tax_rate = 0.00
+        self.scan_status_label.setText("")
+        self.scan_input.setFocus()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import shutil
+import sys
+
+from database_manager import get_db_manager
+
+STORE_DIR_NAME = 'images' # Created next to the database file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class ImageStore:
+    # Content-addressed copies of product images. Each distinct file is stored once, as
+    # images/<hash[:2]>/<sha256><ext> next to the database, and products.image_path holds that
+    # relative path, so moving the data folder keeps images working. The images table counts
+    # how many products use each file; triggers on products keep the count current.
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.base_dir = os.path.dirname(os.path.abspath(db_manager.db_path))
+        self.root = os.path.join(self.base_dir, STORE_DIR_NAME)
+
+    def is_stored(self, image_path):
+        return bool(image_path) and image_path.replace('\\', '/').startswith(STORE_DIR_NAME + '/')
+
+    def resolve(self, image_path):
+        # Absolute path for display; paths from before the store are returned unchanged
+        if self.is_stored(image_path):
+            return os.path.join(self.base_dir, *image_path.split('/'))
+        return image_path or ""
+
+    def ingest(self, source_path):
+        # Copies a file into the store (unless identical content is already there) and returns
+        # the relative path to save in products.image_path. Raises OSError if it cannot be read.
+        return self.ingest_many([source_path])[source_path]
+
+    def ingest_many(self, source_paths):
+        # Bulk form for catalog imports. Files whose path, size and mtime match an earlier
+        # ingest are not read again. Returns {source_path: stored path, or an OSError}.
+        results = {}
+        for source_path in dict.fromkeys(source_paths):
+            try:
+                results[source_path] = self._ingest_one(source_path)
+            except OSError as e:
+                results[source_path] = e
+        return results
+
+    def _ingest_one(self, source_path):
+        if self.is_stored(source_path):
+            if not os.path.exists(self.resolve(source_path)):
+                raise FileNotFoundError(f"Image not found in store: {source_path}")
+            return source_path
+        source_path = os.path.abspath(source_path)
+        stat = os.stat(source_path)
+        known = self.db_manager.fetch_one(
+            "SELECT hash FROM image_sources WHERE source_path = ? AND mtime_ns = ? AND size = ?",
+            (source_path, stat.st_mtime_ns, stat.st_size))
+        digest = known[0] if known else self._hash_file(source_path)
+        extension = os.path.splitext(source_path)[1].lower()
+        existing = self.db_manager.fetch_one("SELECT path FROM images WHERE hash = ?", (digest,))
+        # Same bytes under another name or extension are still the one stored file
+        stored_path = existing[0] if existing else f"{STORE_DIR_NAME}/{digest[:2]}/{digest}{extension}"
+        if not os.path.exists(self.resolve(stored_path)):
+            self._copy_into_store(source_path, self.resolve(stored_path))
+        with self.db_manager.transaction():
+            self.db_manager.cursor.execute(
+                "INSERT INTO images (hash, path, size) VALUES (?, ?, ?) ON CONFLICT(hash) DO NOTHING",
+                (digest, stored_path, stat.st_size))
+            self.db_manager.cursor.execute(
+                "INSERT OR REPLACE INTO image_sources (source_path, mtime_ns, size, hash) VALUES (?, ?, ?, ?)",
+                (source_path, stat.st_mtime_ns, stat.st_size, digest))
+        return stored_path
+
+    def _hash_file(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _copy_into_store(self, source_path, destination):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        temporary = f"{destination}.{os.getpid()}.tmp"
+        shutil.copyfile(source_path, temporary)
+        os.replace(temporary, destination) # Readers never see a partial file
+
+    def ingest_existing(self):
+        # Moves products whose image_path still points outside the store into it. Returns the
+        # number of products updated; unreadable files are reported and left as they are.
+        rows = self.db_manager.fetch_all(
+            "SELECT id, image_path FROM products WHERE image_path IS NOT NULL AND image_path != ''")
+        rows = [(product_id, path) for product_id, path in rows if not self.is_stored(path)]
+        stored = self.ingest_many(path for _, path in rows)
+        updates = []
+        for product_id, path in rows:
+            if isinstance(stored[path], OSError):
+                print(f"Product {product_id}: cannot read image {path}: {stored[path]}")
+            else:
+                updates.append((stored[path], product_id))
+        return len(updates) if self.db_manager.set_product_image_paths(updates) else 0
+
+    def collect_garbage(self):
+        # Deletes stored files no product references any more. Kept separate from
+        # delete_product so a rolled-back delete can never lose a file. An upload that has not
+        # been saved with a product yet is unreferenced too, so run this while nobody is editing.
+        rows = self.db_manager.fetch_all("SELECT hash, path FROM images WHERE ref_count <= 0")
+        for digest, path in rows:
+            try:
+                os.remove(self.resolve(path))
+            except FileNotFoundError:
+                pass
+        with self.db_manager.transaction():
+            self.db_manager.cursor.executemany("DELETE FROM images WHERE hash = ? AND ref_count <= 0",
+                                               [(digest,) for digest, _ in rows])
+            self.db_manager.cursor.execute(
+                "DELETE FROM image_sources WHERE hash NOT IN (SELECT hash FROM images)")
+        return len(rows)
+
+    def stats(self):
+        count, total_size, references = self.db_manager.fetch_one(
+            "SELECT COUNT(*), IFNULL(SUM(size), 0), IFNULL(SUM(ref_count), 0) FROM images")
+        return {'files': count, 'bytes': total_size, 'references': references}
+
+_shared_store = None
+
+def get_image_store():
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = ImageStore(get_db_manager())
+    return _shared_store
+
+if __name__ == '__main__':
+    # python image_store.py ingest-existing | gc | stats
+    store = get_image_store()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    if command == 'ingest-existing':
+        print(f"{store.ingest_existing()} products moved into the image store.")
+    elif command == 'gc':
+        print(f"{store.collect_garbage()} unreferenced images removed.")
+    elif command == 'stats':
+        print(store.stats())
+    else:
+        print("Usage: python image_store.py [ingest-existing|gc|stats]")
+        sys.exit(1)
@@ -1,14 +1,15 @@
 import sys
 from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLineEdit, QPushButton, QLabel, QMessageBox
 from PySide6.QtCore import Qt, Signal
-from database_manager import DatabaseManager
+from db_worker import get_db_worker, set_busy
+import startup_timing
 
 class LoginWindow(QWidget):
     login_successful = Signal(dict) # Signal to emit user info on successful login
 
     def __init__(self):
         super().__init__()
-        self.db_manager = DatabaseManager()
+        self.db_worker = get_db_worker()
         self.init_ui()
 
     def init_ui(self):
@@ -45,8 +46,14 @@ class LoginWindow(QWidget):
             self.error_label.setText("Please enter both username and password.")
             return
 
-        user_info = self.db_manager.verify_user(username, password)
+        self.error_label.setText("")
+        startup_timing.mark("waiting for credentials") # User time; the "login" phase starts here
+        set_busy(self, True, self.login_button)
+        self.db_worker.call('verify_user', username, password, on_result=self.login_finished,
+                            on_error=self.login_failed)
 
+    def login_finished(self, user_info):
+        set_busy(self, False, self.login_button)
         if user_info:
             print(f"Login successful for user: {user_info['username']}")
             self.login_successful.emit(user_info) # Emit signal
@@ -55,6 +62,10 @@ class LoginWindow(QWidget):
             self.error_label.setText("Invalid username or password.")
             QMessageBox.warning(self, "Login Failed", "Invalid username or password.")
 
+    def login_failed(self, error):
+        set_busy(self, False, self.login_button)
+        self.error_label.setText(f"Login failed: {error}")
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     login_window = LoginWindow()
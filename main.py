@@ -1,57 +1,49 @@
+import startup_timing # First, so its clock starts with the process
 import sys
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from login_window import LoginWindow
-from main_app_window import MainAppWindow
-from database_manager import DatabaseManager # Import to ensure DB initialization happens
+from database_manager import get_db_manager, close_shared_connection # Import to ensure DB initialization happens
+from db_worker import stop_db_worker
 
-# Import your actual form classes
-from product_master_form import ProductMasterForm
-from goods_receiving_form import GoodsReceivingForm
-from sales_form import SalesForm
+# Forms are imported by MainAppWindow when first shown, not here
+startup_timing.mark("imports")
 
 class App(QApplication):
     def __init__(self, sys_argv):
         super().__init__(sys_argv)
-        self.db_manager = DatabaseManager() # Initialize DB Manager
+        startup_timing.mark("QApplication created")
+        self.db_manager = get_db_manager() # Opens the shared connection every window reuses
+        startup_timing.mark("database opened")
+        self.aboutToQuit.connect(stop_db_worker) # Let queued writes finish before the connection closes
+        self.aboutToQuit.connect(close_shared_connection)
         self.login_window = LoginWindow()
         self.login_window.login_successful.connect(self.show_main_window)
         self.main_app_window = None # Will be created after login
         self.login_window.show()
+        startup_timing.mark("login window shown")
 
     def show_main_window(self, user_info):
+        startup_timing.mark("login") # From submitting the credentials to their check returning
+        from main_app_window import MainAppWindow # Not needed until someone logs in
         self.main_app_window = MainAppWindow(user_info)
-        # Now, replace placeholder forms with actual instances
-        if hasattr(self.main_app_window, 'product_master_form'):
-            self.main_app_window.stacked_widget.removeWidget(self.main_app_window.product_master_form)
-        if hasattr(self.main_app_window, 'goods_receiving_form'):
-            self.main_app_window.stacked_widget.removeWidget(self.main_app_window.goods_receiving_form)
-        if hasattr(self.main_app_window, 'sales_form'):
-            self.main_app_window.stacked_widget.removeWidget(self.main_app_window.sales_form)
-
-        product_master_form = ProductMasterForm(user_info['id'])
-        self.main_app_window.stacked_widget.addWidget(product_master_form)
-
-        goods_receiving_form = GoodsReceivingForm(user_info['id'])
-        self.main_app_window.stacked_widget.addWidget(goods_receiving_form)
-
-        sales_form = SalesForm(user_info['id'])
-        self.main_app_window.stacked_widget.addWidget(sales_form)
-
-        # Set initial view to Product Master (or any default)
-        self.main_app_window.stacked_widget.setCurrentWidget(product_master_form)
-
+        self.main_app_window.show_form('product_master_form') # Default view; other forms are built on first use
         self.main_app_window.logout_requested.connect(self.handle_logout)
         self.main_app_window.show()
+        startup_timing.mark("main window shown")
+        startup_timing.print_phases()
 
     def handle_logout(self):
         if self.main_app_window:
             self.main_app_window.close()
             self.main_app_window = None
+        startup_timing.reset() # The next login is timed on its own
         self.login_window = LoginWindow() # Recreate login window
         self.login_window.login_successful.connect(self.show_main_window)
         self.login_window.show()
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support() # Catalog import validates in worker processes, also in frozen builds
     app = App(sys.argv)
     sys.exit(app.exec())
     
\ No newline at end of file
@@ -6,7 +6,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # Forms are imported by name in MainAppWindow.show_form(), which the analysis cannot follow
+    hiddenimports=['product_master_form', 'goods_receiving_form', 'sales_form', 'reports_view'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
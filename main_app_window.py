@@ -1,13 +1,22 @@
 import sys
-from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QPushButton, QLabel, QStackedWidget, QToolBar, QMessageBox
+import importlib
+from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QStackedWidget, QMessageBox,
+                               QDialog, QPlainTextEdit, QDialogButtonBox)
 from PySide6.QtCore import Qt, Signal
-from PySide6.QtGui import QAction
-
-# Import your form classes (will be created in subsequent steps)
-# from goods_receiving_form import GoodsReceivingForm
-# from sales_form import SalesForm
-# from product_master_form import ProductMasterForm
-# from database_manager import DatabaseManager # Import if needed for logout/session management
+from PySide6.QtGui import QAction, QFontDatabase
+import startup_timing
+from database_manager import get_db_manager
+from query_stats import format_report
+
+# Toolbar entries in order: (action text, module, form class). A form's module is imported and
+# the form built the first time its action is triggered, then kept for the rest of the session.
+# Modules imported this way are invisible to PyInstaller, so each one is listed in main.spec's hiddenimports.
+FORMS = [
+    ("Product Master", 'product_master_form', 'ProductMasterForm'),
+    ("Goods Receiving", 'goods_receiving_form', 'GoodsReceivingForm'),
+    ("Sales", 'sales_form', 'SalesForm'),
+    ("Reports", 'reports_view', 'ReportsView'),
+]
 
 class MainAppWindow(QMainWindow):
     logout_requested = Signal() # Signal to handle logout
@@ -17,6 +26,7 @@ class MainAppWindow(QMainWindow):
         self.user_info = user_info
         self.setWindowTitle(f"Inventory Management System - Logged in as {user_info['username']}")
         self.setGeometry(100, 100, 1000, 700)
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose) # Free this session's forms on logout
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -25,57 +35,86 @@ class MainAppWindow(QMainWindow):
         self.stacked_widget = QStackedWidget()
         self.main_layout.addWidget(self.stacked_widget)
 
+        self.forms = {} # Module name -> form instance, for forms built so far
+
         self._create_toolbar()
-        self._setup_forms()
 
     def _create_toolbar(self):
         toolbar = self.addToolBar("Main Toolbar")
         toolbar.setMovable(False) # Prevent toolbar from being moved
 
-        # Product Master Action
-        self.product_master_action = QAction("Product Master", self)
-        self.product_master_action.triggered.connect(lambda: self.stacked_widget.setCurrentIndex(0))
-        toolbar.addAction(self.product_master_action)
+        # One action per form
+        self.form_actions = []
+        for text, module_name, class_name in FORMS:
+            action = QAction(text, self)
+            action.triggered.connect(lambda checked=False, module_name=module_name: self.show_form(module_name))
+            toolbar.addAction(action)
+            self.form_actions.append(action)
 
-        # Goods Receiving Action
-        self.goods_receiving_action = QAction("Goods Receiving", self)
-        self.goods_receiving_action.triggered.connect(lambda: self.stacked_widget.setCurrentIndex(1))
-        toolbar.addAction(self.goods_receiving_action)
+        toolbar.addSeparator()
 
-        # Sales Action
-        self.sales_action = QAction("Sales", self)
-        self.sales_action.triggered.connect(lambda: self.stacked_widget.setCurrentIndex(2))
-        toolbar.addAction(self.sales_action)
+        self.query_stats_action = QAction("Query Stats", self)
+        self.query_stats_action.triggered.connect(self.show_query_stats)
+        toolbar.addAction(self.query_stats_action)
 
-        toolbar.addSeparator()
+        self.backup_action = QAction("Backup", self)
+        self.backup_action.triggered.connect(self.show_backups)
+        toolbar.addAction(self.backup_action)
 
         # Logout Action
         self.logout_action = QAction("Logout", self)
         self.logout_action.triggered.connect(self._request_logout)
         toolbar.addAction(self.logout_action)
 
-    def _setup_forms(self):
-        # Placeholder forms for now
-        # You will replace these with actual instances of your form classes
-        self.product_master_form = QLabel("Product Master Form Content Here")
-        self.product_master_form.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.stacked_widget.addWidget(self.product_master_form)
-
-        self.goods_receiving_form = QLabel("Goods Receiving Form Content Here")
-        self.goods_receiving_form.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.stacked_widget.addWidget(self.goods_receiving_form)
-
-        self.sales_form = QLabel("Sales Form Content Here")
-        self.sales_form.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.stacked_widget.addWidget(self.sales_form)
-
-        # Example of how you would initialize real forms:
-        # self.product_master_form = ProductMasterForm(self.user_info['id'])
-        # self.stacked_widget.addWidget(self.product_master_form)
-        # self.goods_receiving_form = GoodsReceivingForm(self.user_info['id'])
-        # self.stacked_widget.addWidget(self.goods_receiving_form)
-        # self.sales_form = SalesForm(self.user_info['id'])
-        # self.stacked_widget.addWidget(self.sales_form)
+    def show_form(self, module_name):
+        form = self.forms.get(module_name)
+        if form is None:
+            text, _, class_name = next(entry for entry in FORMS if entry[1] == module_name)
+            with startup_timing.timed(f"{text} form created"):
+                form_class = getattr(importlib.import_module(module_name), class_name) # Deferred import
+                form = form_class(self.user_info['id'])
+            self.forms[module_name] = form
+            self.stacked_widget.addWidget(form)
+        self.stacked_widget.setCurrentWidget(form)
+        return form
+
+    def show_query_stats(self):
+        # Timings of this session's database statements, slowest in total first
+        query_stats = get_db_manager().query_stats
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Query Statistics")
+        dialog.resize(900, 500)
+        layout = QVBoxLayout(dialog)
+        report = QPlainTextEdit(format_report(query_stats.snapshot()))
+        report.setReadOnly(True)
+        report.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        report.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        layout.addWidget(report)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Reset | QDialogButtonBox.StandardButton.Close)
+        buttons.rejected.connect(dialog.reject)
+        def reset():
+            query_stats.reset()
+            report.setPlainText(format_report(query_stats.snapshot()))
+        buttons.button(QDialogButtonBox.StandardButton.Reset).clicked.connect(reset)
+        layout.addWidget(buttons)
+        dialog.exec()
+
+    def show_backups(self):
+        from backup_view import BackupDialog # Deferred import, like the forms
+        dialog = BackupDialog(self)
+        dialog.database_restored.connect(self._reload_forms)
+        dialog.exec()
+
+    def _reload_forms(self):
+        # After a restore every open form holds data that no longer exists; they are rebuilt
+        # from the restored database on next use
+        current = next((module_name for module_name, form in self.forms.items()
+                        if form is self.stacked_widget.currentWidget()), FORMS[0][1])
+        for form in self.forms.values():
+            self.stacked_widget.removeWidget(form)
+            form.deleteLater()
+        self.forms = {}
+        self.show_form(current)
 
     def _request_logout(self):
         reply = QMessageBox.question(self, "Logout", "Are you sure you want to log out?",
@@ -90,5 +129,6 @@ if __name__ == '__main__':
     # Simulate a successful login for testing
     dummy_user = {'id': 1, 'username': 'test_operator', 'role': 'operator'}
     main_window = MainAppWindow(dummy_user)
+    main_window.show_form(FORMS[0][1])
     main_window.show()
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,658 @@
+# Versioned schema upgrades. PRAGMA user_version records how many migrations a database
+# file has applied; each one runs in its own transaction together with the version bump,
+# so an interrupted upgrade resumes cleanly on the next start.
+
+def _create_base_tables(cursor):
+    # Version 1: the original tables. IF NOT EXISTS lets files created before versioning upgrade in place.
+
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL, -- In a real app, hash this!
+            role TEXT DEFAULT 'operator'
+        )
+    ''')
+
+    # Products table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            barcode TEXT UNIQUE,
+            sku_id TEXT UNIQUE NOT NULL,
+            category TEXT,
+            subcategory TEXT,
+            product_name TEXT NOT NULL,
+            description TEXT,
+            tax_percentage REAL NOT NULL DEFAULT 0.0,
+            price REAL NOT NULL,
+            default_unit TEXT,
+            image_path TEXT
+        )
+    ''')
+
+    # Suppliers table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS suppliers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            supplier_name TEXT NOT NULL,
+            contact_person TEXT,
+            phone TEXT,
+            email TEXT,
+            address TEXT
+        )
+    ''')
+
+    # Customers table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_name TEXT NOT NULL,
+            contact_person TEXT,
+            phone TEXT,
+            email TEXT,
+            address TEXT
+        )
+    ''')
+
+    # Goods Receipts table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS goods_receipts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            receipt_date TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            supplier_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            unit_of_measurement TEXT NOT NULL,
+            rate_per_unit REAL NOT NULL,
+            total_rate REAL NOT NULL,
+            tax_amount REAL NOT NULL,
+            operator_id INTEGER NOT NULL,
+            FOREIGN KEY(product_id) REFERENCES products(id),
+            FOREIGN KEY(supplier_id) REFERENCES suppliers(id),
+            FOREIGN KEY(operator_id) REFERENCES users(id)
+        )
+    ''')
+
+    # Sales table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_date TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            customer_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            unit_of_measurement TEXT NOT NULL,
+            rate_per_unit REAL NOT NULL,
+            total_rate REAL NOT NULL,
+            tax_amount REAL NOT NULL,
+            operator_id INTEGER NOT NULL,
+            FOREIGN KEY(product_id) REFERENCES products(id),
+            FOREIGN KEY(customer_id) REFERENCES customers(id),
+            FOREIGN KEY(operator_id) REFERENCES users(id)
+        )
+    ''')
+
+def _add_transaction_indexes(cursor):
+    # Version 2: indexes for per-product, per-party and per-date lookups on the transaction tables
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_product_date ON sales(product_id, sale_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_customer_date ON sales(customer_id, sale_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(sale_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipts_product_date ON goods_receipts(product_id, receipt_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipts_supplier_date ON goods_receipts(supplier_id, receipt_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipts_date ON goods_receipts(receipt_date)")
+
+# Current stock per product recomputed from the full transaction history
+def stock_from_history(schema='main'):
+    # Stock per product from the transaction tables of one database: the main file or an
+    # attached archive (see archive.py)
+    return f'''
+        SELECT product_id, SUM(quantity) FROM (
+            SELECT product_id, quantity FROM {schema}.goods_receipts
+            UNION ALL
+            SELECT product_id, -quantity FROM {schema}.sales
+        ) GROUP BY product_id
+    '''
+
+STOCK_FROM_HISTORY = stock_from_history()
+
+def _add_stock_levels(cursor):
+    # Version 3: running stock-on-hand per product, kept current by triggers in the same
+    # transaction as every receipt or sale. Transaction rows are append-only (nothing deletes
+    # them), so only inserts and corrections via UPDATE need to adjust the ledger.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_levels (
+            product_id INTEGER PRIMARY KEY,
+            quantity REAL NOT NULL DEFAULT 0,
+            FOREIGN KEY(product_id) REFERENCES products(id)
+        )
+    ''')
+    for table, sign in (('goods_receipts', '+'), ('sales', '-')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_stock_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO stock_levels (product_id, quantity) VALUES (NEW.product_id, {sign}NEW.quantity)
+                ON CONFLICT(product_id) DO UPDATE SET quantity = quantity + excluded.quantity;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_stock_update AFTER UPDATE OF product_id, quantity ON {table}
+            BEGIN
+                UPDATE stock_levels SET quantity = quantity - ({sign}OLD.quantity) WHERE product_id = OLD.product_id;
+                INSERT INTO stock_levels (product_id, quantity) VALUES (NEW.product_id, {sign}NEW.quantity)
+                ON CONFLICT(product_id) DO UPDATE SET quantity = quantity + excluded.quantity;
+            END
+        ''')
+    cursor.execute("DELETE FROM stock_levels")
+    cursor.execute(f"INSERT INTO stock_levels (product_id, quantity) {STOCK_FROM_HISTORY}")
+
+def _add_product_search_indexes(cursor):
+    # Version 4: case-insensitive indexes so prefix searches (LIKE 'abc%') on SKU and name are range scans
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_sku_nocase ON products(sku_id COLLATE NOCASE)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_name_nocase ON products(product_name COLLATE NOCASE)")
+
+FTS_COLUMNS = ['product_name', 'description', 'category', 'subcategory']
+
+def _add_product_fts(cursor):
+    # Version 5: FTS5 index over the searchable product text, stored as an external-content
+    # table (no second copy of the text) and kept in sync with products by triggers
+    columns = ', '.join(FTS_COLUMNS)
+    new_values = ', '.join(f"NEW.{column}" for column in FTS_COLUMNS)
+    old_values = ', '.join(f"OLD.{column}" for column in FTS_COLUMNS)
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            {columns}, content='products', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_insert AFTER INSERT ON products
+        BEGIN
+            INSERT INTO products_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_delete AFTER DELETE ON products
+        BEGIN
+            INSERT INTO products_fts (products_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_update AFTER UPDATE OF {columns} ON products
+        BEGIN
+            INSERT INTO products_fts (products_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO products_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END
+    ''')
+    cursor.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+# Per-day totals recomputed from the full transaction history. Dates may carry a time part,
+# so the day is the first ten characters of the ISO date.
+def rollups_from_history(schema='main'):
+    # daily_rollups rows (in ROLLUP_COLUMNS order) from the transaction tables of one database
+    return f'''
+        SELECT substr(sale_date, 1, 10), 'sale', product_id, customer_id, COUNT(*), SUM(quantity),
+               SUM(total_rate - tax_amount), SUM(tax_amount), SUM(total_rate)
+        FROM {schema}.sales GROUP BY 1, 3, 4
+        UNION ALL
+        SELECT substr(receipt_date, 1, 10), 'receipt', product_id, supplier_id, COUNT(*), SUM(quantity),
+               SUM(total_rate - tax_amount), SUM(tax_amount), SUM(total_rate)
+        FROM {schema}.goods_receipts GROUP BY 1, 3, 4
+    '''
+
+ROLLUPS_FROM_HISTORY = rollups_from_history()
+
+ROLLUP_COLUMNS = 'day, kind, product_id, party_id, line_count, quantity, net_amount, tax_amount, total_amount'
+
+def _add_daily_rollups(cursor):
+    # Version 6: pre-aggregated per-day totals for reporting, one row per day, kind ('sale' or
+    # 'receipt'), product and party (customer or supplier). Triggers keep it current in the same
+    # transaction as each insert or correction; like stock_levels, it relies on append-only history.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            party_id INTEGER NOT NULL,
+            line_count INTEGER NOT NULL DEFAULT 0,
+            quantity REAL NOT NULL DEFAULT 0,
+            net_amount REAL NOT NULL DEFAULT 0,
+            tax_amount REAL NOT NULL DEFAULT 0,
+            total_amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, day, product_id, party_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rollups_product ON daily_rollups(kind, product_id, day)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rollups_party ON daily_rollups(kind, party_id, day)")
+    for table, kind, date_column, party_column in (('sales', 'sale', 'sale_date', 'customer_id'),
+                                                    ('goods_receipts', 'receipt', 'receipt_date', 'supplier_id')):
+        apply_new = f'''
+            INSERT INTO daily_rollups ({ROLLUP_COLUMNS})
+            VALUES (substr(NEW.{date_column}, 1, 10), '{kind}', NEW.product_id, NEW.{party_column}, 1, NEW.quantity,
+                    NEW.total_rate - NEW.tax_amount, NEW.tax_amount, NEW.total_rate)
+            ON CONFLICT(kind, day, product_id, party_id) DO UPDATE SET
+                line_count = line_count + 1, quantity = quantity + excluded.quantity,
+                net_amount = net_amount + excluded.net_amount, tax_amount = tax_amount + excluded.tax_amount,
+                total_amount = total_amount + excluded.total_amount;
+        '''
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_insert AFTER INSERT ON {table}
+            BEGIN
+                {apply_new}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_update
+            AFTER UPDATE OF {date_column}, product_id, {party_column}, quantity, total_rate, tax_amount ON {table}
+            BEGIN
+                UPDATE daily_rollups SET
+                    line_count = line_count - 1, quantity = quantity - OLD.quantity,
+                    net_amount = net_amount - (OLD.total_rate - OLD.tax_amount),
+                    tax_amount = tax_amount - OLD.tax_amount, total_amount = total_amount - OLD.total_rate
+                WHERE kind = '{kind}' AND day = substr(OLD.{date_column}, 1, 10)
+                  AND product_id = OLD.product_id AND party_id = OLD.{party_column};
+                {apply_new}
+            END
+        ''')
+    cursor.execute("DELETE FROM daily_rollups")
+    cursor.execute(f"INSERT INTO daily_rollups ({ROLLUP_COLUMNS}) {ROLLUPS_FROM_HISTORY}")
+
+# Tables rebuilt by version 7, with money columns declared INTEGER (cents). Column order
+# matches the original tables so positional row access keeps working.
+CENTS_TABLES = {
+    'products': ("""
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        barcode TEXT UNIQUE,
+        sku_id TEXT UNIQUE NOT NULL,
+        category TEXT,
+        subcategory TEXT,
+        product_name TEXT NOT NULL,
+        description TEXT,
+        tax_percentage REAL NOT NULL DEFAULT 0.0,
+        price INTEGER NOT NULL,
+        default_unit TEXT,
+        image_path TEXT
+    """, ['price']),
+    'goods_receipts': ("""
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        receipt_date TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        supplier_id INTEGER NOT NULL,
+        quantity REAL NOT NULL,
+        unit_of_measurement TEXT NOT NULL,
+        rate_per_unit INTEGER NOT NULL,
+        total_rate INTEGER NOT NULL,
+        tax_amount INTEGER NOT NULL,
+        operator_id INTEGER NOT NULL,
+        FOREIGN KEY(product_id) REFERENCES products(id),
+        FOREIGN KEY(supplier_id) REFERENCES suppliers(id),
+        FOREIGN KEY(operator_id) REFERENCES users(id)
+    """, ['rate_per_unit', 'total_rate', 'tax_amount']),
+    'sales': ("""
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sale_date TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        customer_id INTEGER NOT NULL,
+        quantity REAL NOT NULL,
+        unit_of_measurement TEXT NOT NULL,
+        rate_per_unit INTEGER NOT NULL,
+        total_rate INTEGER NOT NULL,
+        tax_amount INTEGER NOT NULL,
+        operator_id INTEGER NOT NULL,
+        FOREIGN KEY(product_id) REFERENCES products(id),
+        FOREIGN KEY(customer_id) REFERENCES customers(id),
+        FOREIGN KEY(operator_id) REFERENCES users(id)
+    """, ['rate_per_unit', 'total_rate', 'tax_amount']),
+}
+
+def _store_money_as_cents(cursor):
+    # Version 7: money columns become integer cents. SQLite cannot change a column type in
+    # place, so each table is copied into a new one and swapped in; dropping the old tables
+    # also drops their indexes and triggers, which the earlier migrations then recreate.
+    for table, (columns, money_columns) in CENTS_TABLES.items():
+        names = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+        values = [f"CAST(ROUND({name} * 100) AS INTEGER)" if name in money_columns else name for name in names]
+        sequence = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        cursor.execute(f"CREATE TABLE {table}_cents ({columns})")
+        cursor.execute(f"INSERT INTO {table}_cents ({', '.join(names)}) SELECT {', '.join(values)} FROM {table}")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_cents RENAME TO {table}")
+        if sequence: # Keep AUTOINCREMENT from reusing ids of rows deleted before the rebuild
+            cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+
+    # The rollups hold sums of money columns, so they are recreated with INTEGER amounts too
+    cursor.execute("DROP TABLE IF EXISTS daily_rollups")
+    cursor.execute('''
+        CREATE TABLE daily_rollups (
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            party_id INTEGER NOT NULL,
+            line_count INTEGER NOT NULL DEFAULT 0,
+            quantity REAL NOT NULL DEFAULT 0,
+            net_amount INTEGER NOT NULL DEFAULT 0,
+            tax_amount INTEGER NOT NULL DEFAULT 0,
+            total_amount INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, day, product_id, party_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # All idempotent: they recreate the dropped indexes and triggers and reseed stock_levels,
+    # products_fts and daily_rollups from the converted rows
+    _add_transaction_indexes(cursor)
+    _add_stock_levels(cursor)
+    _add_product_search_indexes(cursor)
+    _add_product_fts(cursor)
+    _add_daily_rollups(cursor)
+
+def _add_invoices(cursor):
+    # Version 8: invoice headers for multi-line sales. Each line stays a row in sales (so stock
+    # and rollup triggers see it as before) and points at its header through sales.invoice_id;
+    # single sales recorded without an invoice keep invoice_id NULL.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS invoices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_date TEXT NOT NULL,
+            customer_id INTEGER NOT NULL,
+            line_count INTEGER NOT NULL,
+            sub_total INTEGER NOT NULL,
+            tax_amount INTEGER NOT NULL,
+            total_amount INTEGER NOT NULL,
+            operator_id INTEGER NOT NULL,
+            FOREIGN KEY(customer_id) REFERENCES customers(id),
+            FOREIGN KEY(operator_id) REFERENCES users(id)
+        )
+    ''')
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(sales)")]
+    if 'invoice_id' not in columns:
+        cursor.execute("ALTER TABLE sales ADD COLUMN invoice_id INTEGER REFERENCES invoices(id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_invoice ON sales(invoice_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_customer_date ON invoices(customer_id, invoice_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(invoice_date)")
+
+def _seed_default_users(cursor):
+    # Version 9: default operator logins, previously re-inserted on every start. Running once
+    # per file means a deleted default login stays deleted.
+    cursor.executemany("INSERT OR IGNORE INTO users (username, password, role) VALUES (?, ?, ?)", [
+        ('operator1', 'pass123', 'operator'),
+        ('operator2', 'securepass', 'operator'),
+    ])
+
+def _add_image_store(cursor):
+    # Version 10: bookkeeping for the content-addressed image store (see image_store.py).
+    # images.ref_count is the number of products whose image_path points at the file; the
+    # triggers below keep it current. image_sources remembers which hash an ingested file had,
+    # so re-importing an unchanged file does not read it again.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS images (
+            hash TEXT PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            size INTEGER NOT NULL,
+            ref_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS image_sources (
+            source_path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            hash TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_products_image_insert AFTER INSERT ON products
+        WHEN NEW.image_path IS NOT NULL
+        BEGIN
+            UPDATE images SET ref_count = ref_count + 1 WHERE path = NEW.image_path;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_products_image_update AFTER UPDATE OF image_path ON products
+        WHEN NEW.image_path IS NOT OLD.image_path
+        BEGIN
+            UPDATE images SET ref_count = ref_count - 1 WHERE path = OLD.image_path;
+            UPDATE images SET ref_count = ref_count + 1 WHERE path = NEW.image_path;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_products_image_delete AFTER DELETE ON products
+        WHEN OLD.image_path IS NOT NULL
+        BEGIN
+            UPDATE images SET ref_count = ref_count - 1 WHERE path = OLD.image_path;
+        END
+    ''')
+
+# Version 11 rollups: table -> (key column, its source column in sales, in goods_receipts).
+# Keying daily_rollups on product and party together made it nearly as large as the
+# transactions themselves; one key per table gives far fewer rows per day.
+SPLIT_ROLLUPS = {
+    'daily_product_rollups': ('product_id', 'product_id', 'product_id'),
+    'daily_party_rollups': ('party_id', 'customer_id', 'supplier_id'),
+}
+
+def split_rollup_columns(table):
+    return f"day, kind, {SPLIT_ROLLUPS[table][0]}, line_count, quantity, net_amount, tax_amount, total_amount"
+
+def split_rollups_from_history(table, schema='main'):
+    # Rows of one of the SPLIT_ROLLUPS tables (in split_rollup_columns() order) from the
+    # transaction tables of one database: the main file or an attached archive
+    _, sale_column, receipt_column = SPLIT_ROLLUPS[table]
+    return f'''
+        SELECT substr(sale_date, 1, 10), 'sale', {sale_column}, COUNT(*), SUM(quantity),
+               SUM(total_rate - tax_amount), SUM(tax_amount), SUM(total_rate)
+        FROM {schema}.sales GROUP BY 1, 3
+        UNION ALL
+        SELECT substr(receipt_date, 1, 10), 'receipt', {receipt_column}, COUNT(*), SUM(quantity),
+               SUM(total_rate - tax_amount), SUM(tax_amount), SUM(total_rate)
+        FROM {schema}.goods_receipts GROUP BY 1, 3
+    '''
+
+def _split_daily_rollups(cursor):
+    # Version 11: daily_rollups becomes daily_product_rollups (product and category reports,
+    # totals) and daily_party_rollups (customer / supplier reports), each with its own triggers.
+    # They are filled from daily_rollups rather than the history, which no longer holds
+    # archived years (see archive.py).
+    for table, (key, _, _) in SPLIT_ROLLUPS.items():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                day TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                {key} INTEGER NOT NULL,
+                line_count INTEGER NOT NULL DEFAULT 0,
+                quantity REAL NOT NULL DEFAULT 0,
+                net_amount INTEGER NOT NULL DEFAULT 0,
+                tax_amount INTEGER NOT NULL DEFAULT 0,
+                total_amount INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (kind, day, {key})
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{key} ON {table}(kind, {key}, day)")
+        cursor.execute(f'''
+            INSERT INTO {table} ({split_rollup_columns(table)})
+            SELECT day, kind, {key}, SUM(line_count), SUM(quantity), SUM(net_amount), SUM(tax_amount), SUM(total_amount)
+            FROM daily_rollups GROUP BY kind, day, {key}
+        ''')
+
+    for source, kind, date_column in (('sales', 'sale', 'sale_date'), ('goods_receipts', 'receipt', 'receipt_date')):
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{source}_rollup_insert")
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{source}_rollup_update")
+        for table, (key, sale_column, receipt_column) in SPLIT_ROLLUPS.items():
+            column = sale_column if source == 'sales' else receipt_column
+            apply_new = f'''
+                INSERT INTO {table} ({split_rollup_columns(table)})
+                VALUES (substr(NEW.{date_column}, 1, 10), '{kind}', NEW.{column}, 1, NEW.quantity,
+                        NEW.total_rate - NEW.tax_amount, NEW.tax_amount, NEW.total_rate)
+                ON CONFLICT(kind, day, {key}) DO UPDATE SET
+                    line_count = line_count + 1, quantity = quantity + excluded.quantity,
+                    net_amount = net_amount + excluded.net_amount, tax_amount = tax_amount + excluded.tax_amount,
+                    total_amount = total_amount + excluded.total_amount;
+            '''
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{source}_{table}_insert AFTER INSERT ON {source}
+                BEGIN
+                    {apply_new}
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{source}_{table}_update
+                AFTER UPDATE OF {date_column}, {column}, quantity, total_rate, tax_amount ON {source}
+                BEGIN
+                    UPDATE {table} SET
+                        line_count = line_count - 1, quantity = quantity - OLD.quantity,
+                        net_amount = net_amount - (OLD.total_rate - OLD.tax_amount),
+                        tax_amount = tax_amount - OLD.tax_amount, total_amount = total_amount - OLD.total_rate
+                    WHERE kind = '{kind}' AND day = substr(OLD.{date_column}, 1, 10) AND {key} = OLD.{column};
+                    {apply_new}
+                END
+            ''')
+    cursor.execute("DROP TABLE daily_rollups")
+
+# Version 12: totals per category and day for the category report, which would otherwise join
+# and regroup nearly every row of daily_product_rollups. A product counts under its current
+# category, as in a join against products, so triggers on products move its totals when its
+# category changes, when it is deleted ('(Uncategorized)', as for any unknown product) and when
+# an id with earlier history is inserted again.
+UNCATEGORIZED = '(Uncategorized)'
+CATEGORY_ROLLUP_COLUMNS = 'day, kind, category, line_count, quantity, net_amount, tax_amount, total_amount'
+
+def category_label(category):
+    return f"IFNULL(NULLIF({category}, ''), '{UNCATEGORIZED}')"
+
+def _product_category(product_id):
+    # Current category label of a product; products that no longer exist are uncategorized
+    return f"IFNULL((SELECT {category_label('category')} FROM products WHERE id = {product_id}), '{UNCATEGORIZED}')"
+
+CATEGORY_ROLLUPS_FROM_PRODUCT_ROLLUPS = f'''
+    SELECT r.day, r.kind, {category_label('p.category')}, SUM(r.line_count), SUM(r.quantity),
+           SUM(r.net_amount), SUM(r.tax_amount), SUM(r.total_amount)
+    FROM daily_product_rollups r LEFT JOIN products p ON p.id = r.product_id
+    GROUP BY r.kind, r.day, 3
+'''
+
+_ADD_TO_CATEGORY_ROLLUP = f'''
+    ON CONFLICT(kind, day, category) DO UPDATE SET
+        line_count = line_count + excluded.line_count, quantity = quantity + excluded.quantity,
+        net_amount = net_amount + excluded.net_amount, tax_amount = tax_amount + excluded.tax_amount,
+        total_amount = total_amount + excluded.total_amount;
+'''
+
+def _move_category_totals(product_id, from_label, to_label):
+    # Moves a product's whole history from one category row to another: subtracted as negative
+    # amounts from the first and added to the second
+    moves = []
+    for label, sign in ((from_label, '-'), (to_label, '')):
+        moves.append(f'''
+            INSERT INTO daily_category_rollups ({CATEGORY_ROLLUP_COLUMNS})
+            SELECT day, kind, {label}, {sign}line_count, {sign}quantity, {sign}net_amount, {sign}tax_amount, {sign}total_amount
+            FROM daily_product_rollups WHERE product_id = {product_id} AND 1
+            {_ADD_TO_CATEGORY_ROLLUP}
+        ''')
+    return ''.join(moves)
+
+def _add_category_rollups(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_category_rollups (
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            category TEXT NOT NULL,
+            line_count INTEGER NOT NULL DEFAULT 0,
+            quantity REAL NOT NULL DEFAULT 0,
+            net_amount INTEGER NOT NULL DEFAULT 0,
+            tax_amount INTEGER NOT NULL DEFAULT 0,
+            total_amount INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, day, category)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute(f"INSERT INTO daily_category_rollups ({CATEGORY_ROLLUP_COLUMNS}) {CATEGORY_ROLLUPS_FROM_PRODUCT_ROLLUPS}")
+
+    for source, kind, date_column in (('sales', 'sale', 'sale_date'), ('goods_receipts', 'receipt', 'receipt_date')):
+        apply_new = f'''
+            INSERT INTO daily_category_rollups ({CATEGORY_ROLLUP_COLUMNS})
+            VALUES (substr(NEW.{date_column}, 1, 10), '{kind}', {_product_category('NEW.product_id')}, 1, NEW.quantity,
+                    NEW.total_rate - NEW.tax_amount, NEW.tax_amount, NEW.total_rate)
+            {_ADD_TO_CATEGORY_ROLLUP}
+        '''
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{source}_daily_category_rollups_insert AFTER INSERT ON {source}
+            BEGIN
+                {apply_new}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{source}_daily_category_rollups_update
+            AFTER UPDATE OF {date_column}, product_id, quantity, total_rate, tax_amount ON {source}
+            BEGIN
+                UPDATE daily_category_rollups SET
+                    line_count = line_count - 1, quantity = quantity - OLD.quantity,
+                    net_amount = net_amount - (OLD.total_rate - OLD.tax_amount),
+                    tax_amount = tax_amount - OLD.tax_amount, total_amount = total_amount - OLD.total_rate
+                WHERE kind = '{kind}' AND day = substr(OLD.{date_column}, 1, 10)
+                  AND category = {_product_category('OLD.product_id')};
+                {apply_new}
+            END
+        ''')
+
+    old_label, new_label = category_label('OLD.category'), category_label('NEW.category')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_products_category_rollups_update AFTER UPDATE OF category ON products
+        WHEN {old_label} IS NOT {new_label}
+        BEGIN
+            {_move_category_totals('NEW.id', old_label, new_label)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_products_category_rollups_delete AFTER DELETE ON products
+        WHEN {old_label} IS NOT '{UNCATEGORIZED}'
+        BEGIN
+            {_move_category_totals('OLD.id', old_label, f"'{UNCATEGORIZED}'")}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_products_category_rollups_insert AFTER INSERT ON products
+        WHEN {new_label} IS NOT '{UNCATEGORIZED}'
+        BEGIN
+            {_move_category_totals('NEW.id', f"'{UNCATEGORIZED}'", new_label)}
+        END
+    ''')
+
+# Append new migrations to the end; never reorder or edit ones that have shipped
+MIGRATIONS = [
+    _create_base_tables,
+    _add_transaction_indexes,
+    _add_stock_levels,
+    _add_product_search_indexes,
+    _add_product_fts,
+    _add_daily_rollups,
+    _store_money_as_cents,
+    _add_invoices,
+    _seed_default_users,
+    _add_image_store,
+    _split_daily_rollups,
+    _add_category_rollups,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(cursor):
+    return cursor.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(db_manager):
+    # Brings the database up to SCHEMA_VERSION and returns the resulting version.
+    # A current database costs a single PRAGMA read and no DDL.
+    version = get_schema_version(db_manager.cursor)
+    if version > SCHEMA_VERSION:
+        print(f"Database schema version {version} is newer than this application ({SCHEMA_VERSION}).")
+        return version
+    while version < SCHEMA_VERSION:
+        with db_manager.transaction():
+            # Re-read under the write lock: another process may have migrated while we waited
+            current = get_schema_version(db_manager.cursor)
+            if current != version:
+                version = current
+                continue
+            MIGRATIONS[version](db_manager.cursor)
+            version += 1
+            db_manager.cursor.execute(f"PRAGMA user_version = {version}")
+        print(f"Applied database migration {version}: {MIGRATIONS[version - 1].__name__}")
+    return version
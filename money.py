@@ -0,0 +1,88 @@
+import math
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+_numpy = None # Loaded on the first batch call; False once known to be missing
+
+# Amounts are stored and added up as integer cents. Floats only appear at the edges: values
+# typed into spin boxes or read from import files, converted once by to_cents().
+CENTS_PER_UNIT = 100
+QUANTITY_SCALE = 1000 # Quantities are priced to three decimals (grams, millilitres)
+TAX_SCALE = 10000     # Tax percentages are applied in basis points: 12.5% -> 1250
+SCALE_EPSILON = 1e-6  # Absorbs binary float error such as 1.0005 * 1000 == 1000.4999...
+
+# Rounding rules, applied per line: the subtotal is rounded to the cent, then tax on that
+# rounded subtotal is rounded to the cent, both half away from zero. total = subtotal + tax,
+# so the stored parts always add up exactly.
+
+def to_cents(amount):
+    # Major-unit amount (float, int, str or Decimal) -> int cents, half away from zero
+    try:
+        value = Decimal(str(amount).strip())
+    except InvalidOperation:
+        raise ValueError(f"Not a money amount: {amount!r}")
+    if not value.is_finite():
+        raise ValueError(f"Not a money amount: {amount!r}")
+    return int((value * CENTS_PER_UNIT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_cents(cents):
+    # For widgets such as QDoubleSpinBox that take a float
+    return cents / CENTS_PER_UNIT
+
+def format_decimal(cents):
+    # Plain "1234.50" for files read by other programs, such as exports
+    sign = "-" if cents < 0 else ""
+    units, remainder = divmod(abs(int(cents)), CENTS_PER_UNIT)
+    return f"{sign}{units}.{remainder:02d}"
+
+def format_money(cents):
+    sign = "-" if cents < 0 else ""
+    units, remainder = divmod(abs(int(cents)), CENTS_PER_UNIT)
+    return f"{sign}${units}.{remainder:02d}"
+
+def _scaled(value, scale):
+    # Fixed-point integer for value * scale, half away from zero
+    return int(math.copysign(math.floor(abs(value) * scale + 0.5 + SCALE_EPSILON), value))
+
+def _div_round(numerator, denominator):
+    # Integer division rounded half away from zero
+    magnitude = (abs(numerator) * 2 + denominator) // (2 * denominator)
+    return -magnitude if numerator < 0 else magnitude
+
+def line_totals(quantity, rate_cents, tax_percentage):
+    # Returns (sub_total, tax_amount, total) in cents for one line
+    sub_total = _div_round(_scaled(quantity, QUANTITY_SCALE) * rate_cents, QUANTITY_SCALE)
+    tax_amount = _div_round(sub_total * _scaled(tax_percentage, TAX_SCALE // 100), TAX_SCALE)
+    return sub_total, tax_amount, sub_total + tax_amount
+
+def _load_numpy():
+    # NumPy is optional and takes ~0.1 s to import, so start-up does not pay for it
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError: # calculate_totals_batch falls back to plain Python
+            _numpy = False
+    return _numpy or None
+
+def _div_round_array(np, numerator, denominator):
+    magnitude = (np.abs(numerator) * 2 + denominator) // (2 * denominator)
+    return np.where(numerator < 0, -magnitude, magnitude)
+
+def _scaled_array(np, values, scale):
+    values = np.asarray(values, dtype=np.float64)
+    return np.copysign(np.floor(np.abs(values) * scale + 0.5 + SCALE_EPSILON), values).astype(np.int64)
+
+def calculate_totals_batch(quantities, rates_cents, tax_percentages):
+    # line_totals() for many lines at once, e.g. re-pricing an invoice or re-taxing an import.
+    # Returns three lists of int cents (sub_totals, tax_amounts, totals); NumPy does the
+    # arithmetic when installed and gives exactly the same results as the plain Python path.
+    np = _load_numpy()
+    if np is None:
+        lines = [line_totals(*line) for line in zip(quantities, rates_cents, tax_percentages)]
+        return tuple(list(column) for column in zip(*lines)) if lines else ([], [], [])
+    rates = np.asarray(rates_cents, dtype=np.int64)
+    sub_totals = _div_round_array(np, _scaled_array(np, quantities, QUANTITY_SCALE) * rates, QUANTITY_SCALE)
+    tax_amounts = _div_round_array(np, sub_totals * _scaled_array(np, tax_percentages, TAX_SCALE // 100), TAX_SCALE)
+    # tolist() hands back Python ints, which sqlite3 accepts as parameters
+    return sub_totals.tolist(), tax_amounts.tolist(), (sub_totals + tax_amounts).tolist()
@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+class ProductCache:
+    # Bounded LRU of Product records keyed by id, with SKU and barcode lookups pointing at the
+    # same entries. DatabaseManager clears it whenever the product generation changes.
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._rows = OrderedDict() # id -> Product, least recently used first
+        self._ids_by_sku = {}
+        self._ids_by_barcode = {}
+        self.all_rows = None # Full catalog list, kept only while it fits within max_size
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get(self, product_id):
+        row = self._rows.get(product_id)
+        if row is None:
+            self.misses += 1
+            return None
+        self._rows.move_to_end(product_id)
+        self.hits += 1
+        return row
+
+    def get_by_sku(self, sku_id):
+        product_id = self._ids_by_sku.get(sku_id)
+        return self.get(product_id) if product_id is not None else self._miss()
+
+    def get_by_barcode(self, barcode):
+        product_id = self._ids_by_barcode.get(barcode)
+        return self.get(product_id) if product_id is not None else self._miss()
+
+    def _miss(self):
+        self.misses += 1
+        return None
+
+    def put(self, product):
+        product_id = product.id
+        if product_id in self._rows:
+            self._forget(self._rows.pop(product_id))
+        self._rows[product_id] = product
+        self._ids_by_sku[product.sku_id] = product_id
+        if product.barcode:
+            self._ids_by_barcode[product.barcode] = product_id
+        while len(self._rows) > self.max_size:
+            _, evicted = self._rows.popitem(last=False)
+            self._forget(evicted)
+            self.all_rows = None
+
+    def _forget(self, product):
+        if self._ids_by_sku.get(product.sku_id) == product.id:
+            del self._ids_by_sku[product.sku_id]
+        if product.barcode and self._ids_by_barcode.get(product.barcode) == product.id:
+            del self._ids_by_barcode[product.barcode]
+
+    def clear(self):
+        self._rows.clear()
+        self._ids_by_sku.clear()
+        self._ids_by_barcode.clear()
+        self.all_rows = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._rows), 'max_size': self.max_size,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
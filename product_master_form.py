@@ -1,18 +1,65 @@
 import sys
+import csv
+import sqlite3
+import threading
 from PySide6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
                                QLineEdit, QPushButton, QLabel, QDoubleSpinBox,
                                QTextEdit, QComboBox, QFileDialog, QTableView,
-                               QHeaderView, QMessageBox, QAbstractItemView)
-from PySide6.QtGui import QPixmap, QStandardItemModel, QStandardItem
-from PySide6.QtCore import Qt, Signal
+                               QHeaderView, QMessageBox, QAbstractItemView, QProgressDialog)
+from PySide6.QtGui import QPixmap
+from PySide6.QtCore import Qt, Signal, QTimer, QThread
 import os
-from database_manager import DatabaseManager
+from db_worker import get_db_worker, set_busy
+from database_manager import get_db_manager
+from product_table_model import ProductTableModel
+from barcode_index import invalidate_barcode_index
+from product_picker import ProductPicker
+from money import to_cents, from_cents
+from thumbnail_cache import get_thumbnail_loader
+from image_store import get_image_store
+
+PREFETCH_ROWS = 2 # Thumbnails warmed on each side of the selected row
+_running_imports = set() # Keeps import threads alive if the form is closed, e.g. on logout
+
+class ImportThread(QThread):
+    # Runs a catalog import on its own thread rather than the database worker, which would
+    # otherwise queue logins, searches and sales behind it. Batches are written through the
+    # shared connection one transaction at a time, so other requests get the lock in between.
+    progress = Signal(int, int, int) # rows read, imported, rejected
+    import_finished = Signal(object) # import_catalog() stats
+    import_failed = Signal(str)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._cancel = threading.Event()
+        _running_imports.add(self)
+        self.finished.connect(lambda: _running_imports.discard(self))
+        QApplication.instance().aboutToQuit.connect(self.stop) # Stops after the batch being written
+
+    def run(self):
+        from catalog_import import import_catalog # Deferred: only needed when someone imports
+        try:
+            self.import_finished.emit(import_catalog(self.path, db_manager=get_db_manager(),
+                                                     progress=self.progress.emit, cancelled=self._cancel.is_set))
+        except (OSError, ValueError, csv.Error, sqlite3.Error) as e:
+            self.import_failed.emit(str(e))
+
+    def cancel(self):
+        self._cancel.set()
+
+    def stop(self):
+        self.cancel()
+        self.wait()
 
 class ProductMasterForm(QWidget):
     def __init__(self, operator_id):
         super().__init__()
         self.operator_id = operator_id
-        self.db_manager = DatabaseManager()
+        self.db_worker = get_db_worker()
+        self.thumbnails = get_thumbnail_loader()
+        self.thumbnails.thumbnail_ready.connect(self.thumbnail_loaded)
+        self.image_store = get_image_store()
         self.current_product_id = None # To track which product is being edited
         self.init_ui()
         self.load_products()
@@ -112,12 +159,38 @@ class ProductMasterForm(QWidget):
         self.clear_button.clicked.connect(self.clear_form)
         self.buttons_layout.addWidget(self.clear_button)
 
+        self.import_button = QPushButton("Import Catalog")
+        self.import_button.clicked.connect(self.import_catalog)
+        self.buttons_layout.addWidget(self.import_button)
+
         self.main_layout.addLayout(self.buttons_layout)
 
+        # Quick lookup sharing the same search model as the receiving and sales forms
+        self.find_layout = QHBoxLayout()
+        self.find_layout.addWidget(QLabel("Find Product:"))
+        self.find_picker = ProductPicker()
+        self.find_picker.product_selected.connect(self.load_found_product)
+        self.find_layout.addWidget(self.find_picker)
+        self.main_layout.addLayout(self.find_layout)
+
+        # Full-text filter over the product table, applied shortly after typing stops
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter by name, description, category or subcategory")
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(150)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.filter_input.textChanged.connect(self.filter_timer.start)
+        self.find_layout.addWidget(QLabel("Filter:"))
+        self.find_layout.addWidget(self.filter_input)
+
         # Product Table
         self.product_table = QTableView()
-        self.product_model = QStandardItemModel()
+        self.product_model = ProductTableModel(self.db_worker, parent=self)
         self.product_table.setModel(self.product_model)
+        self.product_table.setSortingEnabled(True) # Sorting is pushed down to SQL by the model
+        self.product_table.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+        self.product_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch) # Stretch columns
         self.product_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.product_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         self.product_table.clicked.connect(self.load_product_into_form)
@@ -127,10 +200,37 @@ class ProductMasterForm(QWidget):
     def upload_image(self):
         file_name, _ = QFileDialog.getOpenFileName(self, "Select Product Image", "", "Image Files (*.png *.jpg *.jpeg *.gif)")
         if file_name:
-            self.image_path = file_name
-            pixmap = QPixmap(self.image_path)
-            self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
-            self.image_label.setText("") # Clear "No Image Selected"
+            # Copied into the image store on the worker (identical files are stored once); the
+            # product keeps the store path, which is saved with Add/Update Product
+            self.upload_image_button.setEnabled(False)
+            self.db_worker.submit(lambda db: self.image_store.ingest(file_name),
+                                  on_result=self.image_uploaded, on_error=self.image_upload_failed)
+
+    def image_uploaded(self, image_path):
+        self.upload_image_button.setEnabled(True)
+        self.image_path = image_path
+        self.show_image()
+
+    def image_upload_failed(self, error):
+        self.upload_image_button.setEnabled(True)
+        QMessageBox.critical(self, "Error", f"Failed to store image: {error}")
+
+    def show_image(self):
+        # Thumbnails are decoded and scaled off the GUI thread; a cached one shows immediately
+        full_path = self.image_store.resolve(self.image_path)
+        pixmap = self.thumbnails.request(full_path) if full_path else None
+        if pixmap is not None:
+            self.image_label.setPixmap(pixmap)
+            self.image_label.setText("")
+        else:
+            self.image_label.setPixmap(QPixmap())
+            self.image_label.setText("Loading image..." if full_path and os.path.exists(full_path)
+                                     else "No Image Selected")
+
+    def thumbnail_loaded(self, path, pixmap):
+        if path == self.image_store.resolve(self.image_path): # Ignore thumbnails for rows the user has already left
+            self.image_label.setPixmap(pixmap)
+            self.image_label.setText("")
 
     def clear_form(self):
         self.barcode_input.clear()
@@ -158,7 +258,7 @@ class ProductMasterForm(QWidget):
         category = self.category_input.text().strip()
         subcategory = self.subcategory_input.text().strip()
         description = self.description_input.toPlainText().strip()
-        price = self.price_input.value()
+        price = to_cents(self.price_input.value())
         tax_percentage = self.tax_percentage_input.value()
         default_unit = self.default_unit_input.text().strip()
 
@@ -166,54 +266,112 @@ class ProductMasterForm(QWidget):
             QMessageBox.warning(self, "Input Error", "SKU ID and Product Name are required.")
             return
 
-        if self.db_manager.add_product(barcode, sku_id, category, subcategory, product_name,
-                                       description, tax_percentage, price, default_unit, self.image_path):
+        self.set_busy(True)
+        self.db_worker.call('add_product', barcode, sku_id, category, subcategory, product_name,
+                            description, tax_percentage, price, default_unit, self.image_path,
+                            on_result=self.product_added, on_error=self.request_failed)
+
+    def product_added(self, success):
+        self.set_busy(False)
+        if success:
+            invalidate_barcode_index()
             QMessageBox.information(self, "Success", "Product added successfully!")
             self.clear_form()
             self.load_products()
         else:
             QMessageBox.critical(self, "Error", "Failed to add product. SKU ID or Barcode might already exist.")
 
+    def set_busy(self, busy):
+        set_busy(self, busy, self.import_button)
+        editing = self.current_product_id is not None
+        self.add_button.setEnabled(not busy and not editing)
+        self.update_button.setEnabled(not busy and editing)
+        self.delete_button.setEnabled(not busy and editing)
+
+    def request_failed(self, error):
+        self.set_busy(False)
+        QMessageBox.critical(self, "Error", f"Database error: {error}")
+
+    def import_catalog(self):
+        file_name, _ = QFileDialog.getOpenFileName(self, "Select Product Catalog", "",
+                                                   "Catalog Files (*.csv *.tsv *.jsonl *.ndjson)")
+        if not file_name:
+            return
+
+        self.import_thread = ImportThread(file_name)
+        self.progress_dialog = QProgressDialog("Importing catalog...", "Cancel", 0, 0, self)
+        self.progress_dialog.setWindowTitle("Import Catalog")
+        self.progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progress_dialog.canceled.disconnect() # Keep the dialog open until the current batch is written
+        self.progress_dialog.canceled.connect(self.cancel_import)
+        self.import_thread.progress.connect(lambda read, imported, rejected: self.progress_dialog.setLabelText(
+            f"Read {read} rows: {imported} imported, {rejected} rejected"))
+        self.import_thread.import_finished.connect(self.import_finished)
+        self.import_thread.import_failed.connect(self.import_failed)
+        self.set_busy(True)
+        self.import_thread.start()
+        self.progress_dialog.show()
+
+    def cancel_import(self):
+        self.import_thread.cancel()
+        self.progress_dialog.setLabelText("Cancelling after the current batch...")
+
+    def import_failed(self, error):
+        self.progress_dialog.close()
+        self.set_busy(False)
+        QMessageBox.critical(self, "Error", f"Failed to read catalog: {error}")
+
+    def import_finished(self, result):
+        self.progress_dialog.close()
+        self.set_busy(False)
+        invalidate_barcode_index()
+
+        message = f"Imported {result['imported']} of {result['read']} rows."
+        if result['cancelled']:
+            message = f"Import cancelled. {message}"
+        if result['rejected']:
+            message += f"\n{result['rejected']} rows were rejected; see {result['rejects_path']}."
+        QMessageBox.information(self, "Import Complete", message)
+        self.load_products()
+
     def load_products(self):
-        products = self.db_manager.get_all_products()
-        self.product_model.clear()
-        headers = ["ID", "Barcode", "SKU ID", "Category", "Subcategory", "Product Name",
-                   "Description", "Tax %", "Price", "Default Unit", "Image Path"]
-        self.product_model.setHorizontalHeaderLabels(headers)
-
-        for row_idx, product in enumerate(products):
-            for col_idx, data in enumerate(product):
-                item = QStandardItem(str(data))
-                item.setEditable(False) # Make cells non-editable directly in the table
-                self.product_model.setItem(row_idx, col_idx, item)
+        # The model fetches the first page lazily once the view asks for rows
+        self.product_model.reload()
 
-        self.product_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch) # Stretch columns
+    def apply_filter(self):
+        self.product_model.set_search(self.filter_input.text())
 
     def load_product_into_form(self, index):
-        row = index.row()
-        product_data = []
-        for col in range(self.product_model.columnCount()):
-            product_data.append(self.product_model.item(row, col).text())
-
-        self.current_product_id = int(product_data[0]) # ID is the first column
-        self.barcode_input.setText(product_data[1])
-        self.sku_id_input.setText(product_data[2])
-        self.category_input.setText(product_data[3])
-        self.subcategory_input.setText(product_data[4])
-        self.product_name_input.setText(product_data[5])
-        self.description_input.setText(product_data[6])
-        self.tax_percentage_input.setValue(float(product_data[7]))
-        self.price_input.setValue(float(product_data[8]))
-        self.default_unit_input.setText(product_data[9])
-        self.image_path = product_data[10] # Image path is the last column
-
-        if self.image_path and os.path.exists(self.image_path):
-            pixmap = QPixmap(self.image_path)
-            self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
-            self.image_label.setText("")
-        else:
-            self.image_label.setText("No Image Selected")
-            self.image_label.setPixmap(QPixmap())
+        self.show_product_in_form(self.product_model.product_at(index.row()))
+        # Warm the thumbnails of neighbouring rows so stepping through the table stays smooth
+        rows = range(max(0, index.row() - PREFETCH_ROWS), min(self.product_model.rowCount(), index.row() + PREFETCH_ROWS + 1))
+        self.thumbnails.prefetch(self.image_store.resolve(self.product_model.product_at(row).image_path)
+                                 for row in rows if row != index.row())
+
+    def load_found_product(self, product_id):
+        if product_id is None:
+            return
+        self.db_worker.call('get_product_by_id', product_id, key='product_master_find',
+                            on_result=self.found_product_loaded)
+
+    def found_product_loaded(self, product):
+        if product:
+            self.product_table.clearSelection()
+            self.show_product_in_form(product)
+
+    def show_product_in_form(self, product):
+        self.current_product_id = product.id
+        self.barcode_input.setText(product.barcode or "")
+        self.sku_id_input.setText(product.sku_id)
+        self.category_input.setText(product.category or "")
+        self.subcategory_input.setText(product.subcategory or "")
+        self.product_name_input.setText(product.product_name)
+        self.description_input.setText(product.description or "")
+        self.tax_percentage_input.setValue(float(product.tax_percentage))
+        self.price_input.setValue(from_cents(product.price)) # Stored in cents
+        self.default_unit_input.setText(product.default_unit or "")
+        self.image_path = product.image_path or ""
+        self.show_image()
 
         self.add_button.setEnabled(False)
         self.update_button.setEnabled(True)
@@ -230,7 +388,7 @@ class ProductMasterForm(QWidget):
         category = self.category_input.text().strip()
         subcategory = self.subcategory_input.text().strip()
         description = self.description_input.toPlainText().strip()
-        price = self.price_input.value()
+        price = to_cents(self.price_input.value())
         tax_percentage = self.tax_percentage_input.value()
         default_unit = self.default_unit_input.text().strip()
 
@@ -238,11 +396,20 @@ class ProductMasterForm(QWidget):
             QMessageBox.warning(self, "Input Error", "SKU ID and Product Name are required.")
             return
 
-        if self.db_manager.update_product(self.current_product_id, barcode, sku_id, category, subcategory,
-                                          product_name, description, tax_percentage, price, default_unit, self.image_path):
+        product_id = self.current_product_id
+        self.set_busy(True)
+        self.db_worker.call('update_product', product_id, barcode, sku_id, category, subcategory,
+                            product_name, description, tax_percentage, price, default_unit, self.image_path,
+                            on_result=lambda success: self.product_updated(product_id, success),
+                            on_error=self.request_failed)
+
+    def product_updated(self, product_id, success):
+        self.set_busy(False)
+        if success:
+            invalidate_barcode_index()
             QMessageBox.information(self, "Success", "Product updated successfully!")
+            self.product_model.refresh_product(product_id)
             self.clear_form()
-            self.load_products()
         else:
             QMessageBox.critical(self, "Error", "Failed to update product. SKU ID or Barcode might already exist.")
 
@@ -254,12 +421,21 @@ class ProductMasterForm(QWidget):
         reply = QMessageBox.question(self, "Confirm Delete", "Are you sure you want to delete this product?",
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
-            if self.db_manager.delete_product(self.current_product_id):
-                QMessageBox.information(self, "Success", "Product deleted successfully!")
-                self.clear_form()
-                self.load_products()
-            else:
-                QMessageBox.critical(self, "Error", "Failed to delete product.")
+            product_id = self.current_product_id
+            self.set_busy(True)
+            self.db_worker.call('delete_product', product_id,
+                                on_result=lambda success: self.product_deleted(product_id, success),
+                                on_error=self.request_failed)
+
+    def product_deleted(self, product_id, success):
+        self.set_busy(False)
+        if success:
+            invalidate_barcode_index()
+            QMessageBox.information(self, "Success", "Product deleted successfully!")
+            self.product_model.remove_product(product_id)
+            self.clear_form()
+        else:
+            QMessageBox.critical(self, "Error", "Failed to delete product.")
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,119 @@
+from PySide6.QtWidgets import QLineEdit, QCompleter
+from PySide6.QtCore import Qt, Signal, QAbstractListModel, QModelIndex
+from database_manager import PICKER_MATCH_LIMIT
+from db_worker import get_db_worker
+
+def product_label(product_name, sku_id):
+    return f"{product_name} (SKU: {sku_id})"
+
+class ProductSearchModel(QAbstractListModel):
+    # Completion model holding only the top matches for the latest prefix, re-queried from
+    # SQLite on each keystroke by the database worker. One instance is shared by every ProductPicker.
+    matches_updated = Signal()
+
+    def __init__(self, db_worker, limit=PICKER_MATCH_LIMIT, parent=None):
+        super().__init__(parent)
+        self.db_worker = db_worker
+        self.limit = limit
+        self._matches = [] # (id, sku_id, product_name)
+        self._pending = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._matches)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        product_id, sku_id, product_name = self._matches[index.row()]
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return product_label(product_name, sku_id)
+        if role == Qt.ItemDataRole.UserRole:
+            return product_id
+        return None
+
+    def set_prefix(self, prefix):
+        # Queries in the background; a newer keystroke cancels the still-pending older query
+        prefix = prefix.strip()
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        if not prefix:
+            self._set_matches([])
+            return
+        self._pending = self.db_worker.call('search_products_by_prefix', prefix, self.limit,
+                                            key='product_prefix_search', on_result=self._set_matches)
+
+    def _set_matches(self, matches):
+        self._pending = None
+        self.beginResetModel()
+        self._matches = matches
+        self.endResetModel()
+        self.matches_updated.emit()
+
+    def first_match(self):
+        return self._matches[0] if self._matches else None
+
+_shared_model = None
+
+def get_product_search_model():
+    global _shared_model
+    if _shared_model is None:
+        _shared_model = ProductSearchModel(get_db_worker())
+    return _shared_model
+
+class ProductPicker(QLineEdit):
+    # Type-ahead product selector: shows matching products as the user types and emits
+    # product_selected(product_id) once one is picked, or product_selected(None) when cleared.
+    product_selected = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setPlaceholderText("Type SKU or product name")
+        self.search_model = get_product_search_model()
+        self._product_id = None
+
+        self.completer = QCompleter(self.search_model, self)
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion) # SQL already filtered
+        self.completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.completer.activated[QModelIndex].connect(self._match_activated)
+        self.setCompleter(self.completer)
+
+        self.search_model.matches_updated.connect(self._show_matches)
+        self.textEdited.connect(self._text_edited)
+        self.returnPressed.connect(self._accept_first_match)
+
+    def current_product_id(self):
+        return self._product_id
+
+    def set_product(self, product_id, label, notify=True):
+        self.setText(label)
+        self._product_id = product_id
+        if notify:
+            self.product_selected.emit(product_id)
+
+    def clear_selection(self):
+        self.clear()
+        if self._product_id is not None:
+            self._product_id = None
+            self.product_selected.emit(None)
+
+    def _text_edited(self, text):
+        if self._product_id is not None: # Editing the text drops the previous pick
+            self._product_id = None
+            self.product_selected.emit(None)
+        self.search_model.set_prefix(text)
+
+    def _show_matches(self):
+        # The model is shared, so only the picker being typed in opens its popup
+        if self.hasFocus() and self._product_id is None and self.search_model.rowCount():
+            self.completer.complete()
+
+    def _match_activated(self, index):
+        self.set_product(index.data(Qt.ItemDataRole.UserRole), index.data(Qt.ItemDataRole.DisplayRole))
+
+    def _accept_first_match(self):
+        if self._product_id is None:
+            match = self.search_model.first_match()
+            if match is not None:
+                product_id, sku_id, product_name = match
+                self.set_product(product_id, product_label(product_name, sku_id))
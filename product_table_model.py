@@ -0,0 +1,113 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from database_manager import PRODUCT_COLUMNS, PRODUCT_PAGE_SIZE
+from money import format_money
+
+PRICE_COLUMN = PRODUCT_COLUMNS.index('price')
+
+class ProductTableModel(QAbstractTableModel):
+    # Table model that pulls products from SQLite one page at a time as the view scrolls,
+    # instead of building a QStandardItem for every cell of the catalog up front. Pages are
+    # fetched on the database worker thread and appended when they arrive.
+    HEADERS = ["ID", "Barcode", "SKU ID", "Category", "Subcategory", "Product Name",
+               "Description", "Tax %", "Price", "Default Unit", "Image Path"]
+
+    def __init__(self, db_worker, page_size=PRODUCT_PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.db_worker = db_worker
+        self.page_size = page_size
+        self.sort_column = 'id'
+        self.descending = False
+        self.search = None # Full-text filter applied to every page, None shows all products
+        self._rows = [] # Product records fetched so far, in display order
+        self._exhausted = False
+        self._pending = None # In-flight page request, at most one at a time
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(PRODUCT_COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = getattr(self._rows[index.row()], PRODUCT_COLUMNS[index.column()])
+        if index.column() == PRICE_COLUMN:
+            return format_money(value) # Stored in cents
+        return "" if value is None else str(value)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and self._pending is None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted or self._pending is not None:
+            return
+        after_row = self._rows[-1] if self._rows else None
+        self._pending = self.db_worker.call('get_products_page', self.sort_column, self.descending, after_row,
+                                            self.page_size, self.search, on_result=self._page_loaded)
+
+    def _page_loaded(self, page):
+        self._pending = None
+        if len(page) < self.page_size:
+            self._exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+            self._rows.extend(page)
+            self.endInsertRows()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        # Sorting is done by SQLite: restart paging with the new ORDER BY
+        self.sort_column = PRODUCT_COLUMNS[column]
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.reload()
+
+    def set_search(self, text):
+        self.search = text.strip() or None
+        self.reload()
+
+    def reload(self):
+        if self._pending is not None: # Results for the old sort/filter are no longer wanted
+            self._pending.cancel()
+            self._pending = None
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self.endResetModel()
+
+    def product_at(self, row):
+        return self._rows[row]
+
+    def _row_of(self, product_id):
+        for row, product in enumerate(self._rows):
+            if product.id == product_id:
+                return row
+        return None
+
+    def refresh_product(self, product_id):
+        # Re-reads a single edited product and repaints only its row
+        if self._row_of(product_id) is not None:
+            self.db_worker.call('get_product_by_id', product_id,
+                                on_result=lambda product: self._product_loaded(product_id, product))
+
+    def _product_loaded(self, product_id, product):
+        row = self._row_of(product_id)
+        if row is None:
+            return
+        if product is None:
+            self.remove_product(product_id)
+            return
+        self._rows[row] = product
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(PRODUCT_COLUMNS) - 1))
+
+    def remove_product(self, product_id):
+        row = self._row_of(product_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self.endRemoveRows()
@@ -0,0 +1,155 @@
+import bisect
+import json
+import logging
+import re
+import sys
+import time
+from functools import lru_cache
+
+SLOW_QUERY_MS = 200 # Statements at least this slow are logged to the slow-query log
+HISTOGRAM_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000) # Upper bucket edges; the last bucket is open
+STATS_FILE_NAME = 'query_stats.json' # Written next to the database when the app closes
+REPORT_LIMIT = 25 # Statements shown by format_report()
+
+# Slow statements are logged as warnings, so they reach stderr even if the app configures no
+# logging. The trace hook logs every statement at DEBUG level to the child logger.
+slow_query_log = logging.getLogger('goodstracker.sql')
+trace_log = logging.getLogger('goodstracker.sql.trace')
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b[xX]'[0-9a-fA-F]*'|(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    # One key per statement shape: whitespace collapsed, literals and parameter lists turned
+    # into '?', so "id IN (1, 2)" and "id IN (3, 4, 5)" are counted together.
+    # Cached, since the same few hundred SQL strings are executed over and over.
+    sql = ' '.join(sql.split())
+    sql = _LITERAL.sub('?', sql)
+    return _VALUE_LIST.sub('(?, ...)', sql)
+
+def _bucket_labels():
+    labels = [f"<={bound:g}ms" for bound in HISTOGRAM_BOUNDS_MS]
+    return labels + [f">{HISTOGRAM_BOUNDS_MS[-1]:g}ms"]
+
+class _StatementTimer:
+    __slots__ = ('stats', 'sql', 'started')
+
+    def __init__(self, stats, sql):
+        self.stats = stats
+        self.sql = sql
+
+    def __enter__(self):
+        self.stats.progress_ticks = 0
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stats.record(self.sql, time.perf_counter() - self.started, exc_type is not None)
+        return False
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+_NO_TIMER = _NoTimer()
+
+class QueryStats:
+    # Call counts, error counts and a latency histogram per normalized statement. One instance
+    # belongs to each DatabaseManager and is only written under the manager's lock, so
+    # recording takes no lock of its own and one progress_ticks counter serves every statement.
+    # Entries are kept per SQL string and merged by normalized shape when read.
+    def __init__(self, enabled=True, slow_query_ms=SLOW_QUERY_MS, progress_steps=0):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.progress_steps = progress_steps # VM instructions per progress tick, 0 when the hook is off
+        self.progress_ticks = 0
+        self.started = time.time()
+        self._entries = {} # SQL -> [calls, errors, total_ms, max_ms, vm_steps, histogram counts]
+
+    def timing(self, sql):
+        # with stats.timing(sql): cursor.execute(sql) -- records the block as one call of sql
+        return _StatementTimer(self, sql) if self.enabled else _NO_TIMER
+
+    def count_progress(self):
+        # sqlite3 progress handler; returning 0 lets the statement continue
+        self.progress_ticks += 1
+        return 0
+
+    def record(self, sql, seconds, failed=False):
+        milliseconds = seconds * 1000
+        entry = self._entries.get(sql)
+        if entry is None:
+            entry = self._entries[sql] = [0, 0, 0.0, 0.0, 0, [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)]
+        entry[0] += 1
+        entry[2] += milliseconds
+        entry[5][bisect.bisect_left(HISTOGRAM_BOUNDS_MS, milliseconds)] += 1
+        if failed:
+            entry[1] += 1
+        if self.progress_ticks:
+            entry[4] += self.progress_ticks * self.progress_steps
+        if milliseconds > entry[3]:
+            entry[3] = milliseconds
+        if milliseconds >= self.slow_query_ms:
+            slow_query_log.warning("Slow query (%.1f ms): %s", milliseconds, normalize_sql(sql))
+
+    def reset(self):
+        self._entries = {} # Rebinding, so a statement being recorded meanwhile cannot fail
+        self.started = time.time()
+
+    def snapshot(self):
+        # Plain dict (JSON-serializable) of everything recorded so far. May run on another
+        # thread than the recording; list() copies the entries in one step under the GIL.
+        labels = _bucket_labels()
+        merged = {}
+        for sql, (calls, errors, total, longest, vm_steps, histogram) in list(self._entries.items()):
+            key = normalize_sql(sql)
+            if key in merged:
+                entry = merged[key]
+                merged[key] = (entry[0] + calls, entry[1] + errors, entry[2] + total, max(entry[3], longest),
+                               entry[4] + vm_steps, [a + b for a, b in zip(entry[5], histogram)])
+            else:
+                merged[key] = (calls, errors, total, longest, vm_steps, list(histogram))
+        statements = []
+        for sql, (calls, errors, total, longest, vm_steps, histogram) in merged.items():
+            statements.append({'sql': sql, 'calls': calls, 'errors': errors, 'total_ms': round(total, 3),
+                               'mean_ms': round(total / calls, 3), 'max_ms': round(longest, 3), 'vm_steps': vm_steps,
+                               'histogram': dict(zip(labels, histogram))})
+        statements.sort(key=lambda statement: statement['total_ms'], reverse=True)
+        return {'since': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+                'slow_query_ms': self.slow_query_ms, 'statements': statements}
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+def format_report(snapshot, limit=REPORT_LIMIT):
+    # Text table of the statements with the most total time, for the UI and the command line
+    statements = snapshot['statements']
+    lines = [f"Query statistics since {snapshot['since']} ({len(statements)} statements, "
+             f"slow-query threshold {snapshot['slow_query_ms']:g} ms)", ""]
+    lines.append(f"{'calls':>8} {'errors':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'vm steps':>11}  statement")
+    for statement in statements[:limit]:
+        lines.append(f"{statement['calls']:>8} {statement['errors']:>6} {statement['total_ms']:>10.1f} "
+                     f"{statement['mean_ms']:>9.3f} {statement['max_ms']:>9.1f} {statement['vm_steps'] or '':>11}  "
+                     f"{statement['sql'][:160]}")
+        spread = '  '.join(f"{label} {count}" for label, count in statement['histogram'].items() if count)
+        lines.append(f"{'':>59}{spread}")
+    if len(statements) > limit:
+        lines.append(f"... {len(statements) - limit} more")
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    # python query_stats.py [query_stats.json] -- prints the statistics saved by the last session
+    path = sys.argv[1] if len(sys.argv) > 1 else STATS_FILE_NAME
+    try:
+        with open(path, encoding='utf-8') as f:
+            print(format_report(json.load(f)))
+    except FileNotFoundError:
+        print(f"No query statistics at {path}; they are written when the application closes.")
+        sys.exit(1)
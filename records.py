@@ -0,0 +1,108 @@
+# Row objects for the main tables. Each class names its columns in FIELDS, which is also the
+# SELECT list its queries use, so callers read product.price instead of product[8]. __slots__
+# keeps them about as small as the tuples they replace. The *_row functions are sqlite3 row
+# factories: pass one to fetch_all() / fetch_one() with a query selecting FIELDS in order.
+
+class _Record:
+    __slots__ = ()
+    FIELDS = ()
+
+    def as_tuple(self):
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.as_tuple() == other.as_tuple()
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def __repr__(self):
+        values = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS)
+        return f"{type(self).__name__}({values})"
+
+    def __getstate__(self):
+        return self.as_tuple()
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    @classmethod
+    def select_list(cls, alias=None):
+        # "id, barcode, ..." or "p.id, p.barcode, ..." for a query that builds this record
+        prefix = f"{alias}." if alias else ""
+        return ', '.join(prefix + field for field in cls.FIELDS)
+
+class Product(_Record):
+    # price is in cents. Products are shared by every caller of the product cache, so they are
+    # read-only: each field is a property over a private slot, and assigning to one raises
+    # AttributeError.
+    FIELDS = ('id', 'barcode', 'sku_id', 'category', 'subcategory', 'product_name',
+              'description', 'tax_percentage', 'price', 'default_unit', 'image_path')
+    __slots__ = tuple('_' + field for field in FIELDS)
+
+    def __init__(self, id, barcode, sku_id, category, subcategory, product_name,
+                 description, tax_percentage, price, default_unit, image_path):
+        self._id = id
+        self._barcode = barcode
+        self._sku_id = sku_id
+        self._category = category
+        self._subcategory = subcategory
+        self._product_name = product_name
+        self._description = description
+        self._tax_percentage = tax_percentage
+        self._price = price
+        self._default_unit = default_unit
+        self._image_path = image_path
+
+for _field in Product.FIELDS:
+    setattr(Product, _field, property(getattr(Product, '_' + _field).__get__))
+del _field
+
+class Sale(_Record):
+    # Amounts are in cents; invoice_id is None for sales entered before invoices existed
+    FIELDS = ('id', 'sale_date', 'product_id', 'customer_id', 'quantity', 'unit_of_measurement',
+              'rate_per_unit', 'total_rate', 'tax_amount', 'operator_id', 'invoice_id')
+    __slots__ = FIELDS
+
+    def __init__(self, id, sale_date, product_id, customer_id, quantity, unit_of_measurement,
+                 rate_per_unit, total_rate, tax_amount, operator_id, invoice_id):
+        self.id = id
+        self.sale_date = sale_date
+        self.product_id = product_id
+        self.customer_id = customer_id
+        self.quantity = quantity
+        self.unit_of_measurement = unit_of_measurement
+        self.rate_per_unit = rate_per_unit
+        self.total_rate = total_rate
+        self.tax_amount = tax_amount
+        self.operator_id = operator_id
+        self.invoice_id = invoice_id
+
+class Receipt(_Record):
+    # A goods_receipts row; amounts are in cents
+    FIELDS = ('id', 'receipt_date', 'product_id', 'supplier_id', 'quantity', 'unit_of_measurement',
+              'rate_per_unit', 'total_rate', 'tax_amount', 'operator_id')
+    __slots__ = FIELDS
+
+    def __init__(self, id, receipt_date, product_id, supplier_id, quantity, unit_of_measurement,
+                 rate_per_unit, total_rate, tax_amount, operator_id):
+        self.id = id
+        self.receipt_date = receipt_date
+        self.product_id = product_id
+        self.supplier_id = supplier_id
+        self.quantity = quantity
+        self.unit_of_measurement = unit_of_measurement
+        self.rate_per_unit = rate_per_unit
+        self.total_rate = total_rate
+        self.tax_amount = tax_amount
+        self.operator_id = operator_id
+
+def product_row(cursor, row):
+    return Product(*row)
+
+def sale_row(cursor, row):
+    return Sale(*row)
+
+def receipt_row(cursor, row):
+    return Receipt(*row)
@@ -0,0 +1,80 @@
+import sys
+
+from database_manager import get_db_manager
+from money import format_money
+
+# Party table and its name column for each rollup kind
+PARTIES = {'sale': ('customers', 'customer_name'), 'receipt': ('suppliers', 'supplier_name')}
+
+# Period buckets over the ISO day kept in the daily rollups. Weeks are ISO 8601 weeks, labelled
+# with their ISO year: the Thursday of a day's Monday-to-Sunday week decides both.
+PERIODS = {
+    'day': "r.day",
+    'week': "printf('%s-W%02d', strftime('%Y', r.day, 'weekday 0', '-3 days'), "
+            "(strftime('%j', r.day, 'weekday 0', '-3 days') - 1) / 7 + 1)",
+    'month': "substr(r.day, 1, 7)",
+    'year': "substr(r.day, 1, 4)",
+}
+
+# group_by -> (rollup table, label expression, grouping key, join); 'party' is the customer for
+# sales and the supplier for receipts. Left joins keep history for products or parties deleted since.
+# Categories come from daily_category_rollups, where products without one (NULL or '') share a
+# single '(Uncategorized)' row.
+GROUPINGS = {
+    'product': ('daily_product_rollups', "IFNULL(p.product_name || ' (SKU: ' || p.sku_id || ')', 'Product #' || r.product_id)",
+                "r.product_id", "LEFT JOIN products p ON p.id = r.product_id"),
+    'category': ('daily_category_rollups', "r.category", "r.category", ""),
+    'party': ('daily_party_rollups', None, "r.party_id", None),
+    'total': ('daily_category_rollups', "'All'", None, ""), # Every product's totals are in exactly one category
+}
+
+REPORT_HEADERS = ["Period", "Group", "Lines", "Quantity", "Net Amount", "Tax Amount", "Total Amount"]
+
+def period_report(db_manager, kind='sale', period='month', group_by='product', start_date=None, end_date=None):
+    # Totals per period and group, read only from the daily rollups so the cost follows the number
+    # of days and products (or parties) rather than the number of transactions. Dates are inclusive
+    # 'yyyy-MM-dd'. Rows follow REPORT_HEADERS, with the three amounts in cents.
+    if kind not in PARTIES:
+        raise ValueError(f"Unknown report kind: {kind}")
+    if period not in PERIODS:
+        raise ValueError(f"Unknown report period: {period}")
+    if group_by not in GROUPINGS:
+        raise ValueError(f"Unknown report grouping: {group_by}")
+
+    table, label, key, join = GROUPINGS[group_by]
+    if join is None:
+        party_table, name_column = PARTIES[kind]
+        label = f"IFNULL(c.{name_column}, '#' || r.party_id)"
+        join = f"LEFT JOIN {party_table} c ON c.id = r.party_id"
+    conditions, params = ["r.kind = ?"], [kind]
+    if start_date:
+        conditions.append("r.day >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("r.day <= ?")
+        params.append(end_date)
+    group_keys = "period" + (f", {key}" if key else "")
+    query = f'''
+        SELECT {PERIODS[period]} AS period, {label} AS label, SUM(r.line_count), SUM(r.quantity),
+               SUM(r.net_amount), SUM(r.tax_amount), SUM(r.total_amount)
+        FROM {table} r {join}
+        WHERE {' AND '.join(conditions)}
+        GROUP BY {group_keys}
+        ORDER BY period, label
+    '''
+    return db_manager.fetch_all(query, tuple(params))
+
+if __name__ == '__main__':
+    # python reporting.py rebuild
+    # python reporting.py <sale|receipt> <day|week|month|year> <product|category|party|total> [start] [end]
+    db = get_db_manager()
+    if sys.argv[1:] == ['rebuild']:
+        print("Daily rollups rebuilt." if db.rebuild_daily_rollups() else "Rebuild failed.")
+        sys.exit(0)
+    if len(sys.argv) < 4:
+        print("Usage: python reporting.py rebuild | <sale|receipt> <period> <grouping> [start_date] [end_date]")
+        sys.exit(1)
+    rows = period_report(db, sys.argv[1], sys.argv[2], sys.argv[3], *sys.argv[4:6])
+    print("\t".join(REPORT_HEADERS))
+    for row in rows:
+        print("\t".join([str(value) for value in row[:4]] + [format_money(value) for value in row[4:]]))
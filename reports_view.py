@@ -0,0 +1,222 @@
+import sys
+import sqlite3
+import threading
+from PySide6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
+                               QLabel, QComboBox, QDateEdit, QTableWidget, QTableWidgetItem,
+                               QHeaderView, QMessageBox, QFileDialog, QProgressDialog)
+from PySide6.QtCore import Qt, QDate, QThread, Signal
+from db_worker import get_db_worker, set_busy
+from database_manager import get_db_manager
+from product_picker import ProductPicker
+from reporting import period_report, REPORT_HEADERS
+from money import format_money
+from transaction_export import export_transactions
+
+EXPORT_FILTERS = "CSV, gzip (*.csv.gz);;CSV (*.csv);;JSON lines, gzip (*.jsonl.gz);;JSON lines (*.jsonl)"
+_running_exports = set() # Keeps export threads alive if their view is closed, e.g. on logout
+
+class ExportThread(QThread):
+    # Runs an export on its own thread and its own read-only connection, so the database
+    # worker stays free for sales entry however long a full-year extract takes
+    progress = Signal(int, int) # rows written, rows expected
+    export_finished = Signal(object)
+    export_failed = Signal(str)
+
+    def __init__(self, path, kind, start_date, end_date, product_ids):
+        super().__init__()
+        self.path = path
+        self.kind = kind
+        self.start_date = start_date
+        self.end_date = end_date
+        self.product_ids = product_ids
+        self.db_path = get_db_manager().db_path
+        self._cancel = threading.Event()
+        _running_exports.add(self)
+        self.finished.connect(lambda: _running_exports.discard(self))
+        QApplication.instance().aboutToQuit.connect(self.stop) # Leaves only complete files behind
+
+    def run(self):
+        try:
+            result = export_transactions(self.path, self.kind, start_date=self.start_date, end_date=self.end_date,
+                                         product_ids=self.product_ids, db_path=self.db_path,
+                                         progress=self.progress.emit, cancelled=self._cancel.is_set)
+            self.export_finished.emit(result)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            self.export_failed.emit(str(e))
+
+    def cancel(self):
+        self._cancel.set()
+
+    def stop(self):
+        self.cancel()
+        self.wait()
+
+class ReportsView(QWidget):
+    def __init__(self, operator_id):
+        super().__init__()
+        self.operator_id = operator_id
+        self.db_worker = get_db_worker()
+        self.init_ui()
+
+    def init_ui(self):
+        self.setWindowTitle("Reports")
+        self.main_layout = QVBoxLayout()
+
+        # Report options
+        self.options_layout = QHBoxLayout()
+
+        self.kind_combo = QComboBox()
+        self.kind_combo.addItem("Sales", userData='sale')
+        self.kind_combo.addItem("Goods Receipts", userData='receipt')
+        self.kind_combo.currentIndexChanged.connect(self.update_party_label)
+        self.options_layout.addWidget(QLabel("Report:"))
+        self.options_layout.addWidget(self.kind_combo)
+
+        self.period_combo = QComboBox()
+        for label, period in (("Daily", 'day'), ("Weekly", 'week'), ("Monthly", 'month'), ("Yearly", 'year')):
+            self.period_combo.addItem(label, userData=period)
+        self.period_combo.setCurrentIndex(2)
+        self.options_layout.addWidget(QLabel("Period:"))
+        self.options_layout.addWidget(self.period_combo)
+
+        self.group_combo = QComboBox()
+        for label, group_by in (("Product", 'product'), ("Category", 'category'), ("Customer", 'party'), ("Total", 'total')):
+            self.group_combo.addItem(label, userData=group_by)
+        self.options_layout.addWidget(QLabel("Group By:"))
+        self.options_layout.addWidget(self.group_combo)
+
+        self.start_date_input = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.start_date_input.setCalendarPopup(True)
+        self.options_layout.addWidget(QLabel("From:"))
+        self.options_layout.addWidget(self.start_date_input)
+
+        self.end_date_input = QDateEdit(QDate.currentDate())
+        self.end_date_input.setCalendarPopup(True)
+        self.options_layout.addWidget(QLabel("To:"))
+        self.options_layout.addWidget(self.end_date_input)
+
+        self.run_button = QPushButton("Run Report")
+        self.run_button.clicked.connect(self.run_report)
+        self.options_layout.addWidget(self.run_button)
+
+        self.main_layout.addLayout(self.options_layout)
+
+        # Transaction export for the selected report kind and dates
+        self.export_layout = QHBoxLayout()
+        self.export_product_picker = ProductPicker()
+        self.export_product_picker.setPlaceholderText("All products (or type SKU or product name)")
+        self.export_layout.addWidget(QLabel("Export Product:"))
+        self.export_layout.addWidget(self.export_product_picker)
+        self.export_button = QPushButton("Export Transactions...")
+        self.export_button.clicked.connect(self.export_transactions)
+        self.export_layout.addWidget(self.export_button)
+        self.main_layout.addLayout(self.export_layout)
+        self.export_thread = None
+
+        # Results
+        self.results_table = QTableWidget(0, len(REPORT_HEADERS))
+        self.results_table.setHorizontalHeaderLabels(REPORT_HEADERS)
+        self.results_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.results_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.main_layout.addWidget(self.results_table)
+
+        self.summary_label = QLabel("")
+        self.main_layout.addWidget(self.summary_label)
+
+        self.setLayout(self.main_layout)
+
+    def update_party_label(self):
+        # The party grouping means customers for sales and suppliers for receipts
+        party_index = self.group_combo.findData('party')
+        self.group_combo.setItemText(party_index, "Customer" if self.kind_combo.currentData() == 'sale' else "Supplier")
+
+    def run_report(self):
+        start_date = self.start_date_input.date().toString(Qt.DateFormat.ISODate)
+        end_date = self.end_date_input.date().toString(Qt.DateFormat.ISODate)
+        if start_date > end_date:
+            QMessageBox.warning(self, "Input Error", "The start date must not be after the end date.")
+            return
+        set_busy(self, True, self.run_button)
+        # Runs in the background; running again cancels a report that has not started yet
+        self.db_worker.submit(period_report, self.kind_combo.currentData(), self.period_combo.currentData(),
+                              self.group_combo.currentData(), start_date, end_date,
+                              key='period_report', on_result=self.report_loaded, on_error=self.report_failed)
+
+    def report_loaded(self, rows):
+        set_busy(self, False, self.run_button)
+        self.results_table.setRowCount(len(rows))
+        totals = [0, 0.0, 0, 0, 0]
+        for row_index, row in enumerate(rows):
+            for column, value in enumerate(row):
+                if column >= 2:
+                    totals[column - 2] += value
+                if column == 3:
+                    value = f"{value:g}"
+                elif column >= 4: # Amounts are in cents
+                    value = format_money(value)
+                item = QTableWidgetItem(str(value))
+                if column >= 2:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.results_table.setItem(row_index, column, item)
+        line_count, quantity, net_amount, tax_amount, total_amount = totals
+        self.summary_label.setText(f"{line_count} lines, quantity {quantity:g}, net {format_money(net_amount)}, "
+                                   f"tax {format_money(tax_amount)}, total {format_money(total_amount)}")
+
+    def report_failed(self, error):
+        set_busy(self, False, self.run_button)
+        QMessageBox.critical(self, "Error", f"Failed to run report: {error}")
+
+    def export_transactions(self):
+        start_date = self.start_date_input.date().toString(Qt.DateFormat.ISODate)
+        end_date = self.end_date_input.date().toString(Qt.DateFormat.ISODate)
+        if start_date > end_date:
+            QMessageBox.warning(self, "Input Error", "The start date must not be after the end date.")
+            return
+        kind = self.kind_combo.currentData()
+        suggested = f"{'sales' if kind == 'sale' else 'goods_receipts'}_{start_date}_{end_date}.csv.gz"
+        file_name, selected_filter = QFileDialog.getSaveFileName(self, "Export Transactions", suggested, EXPORT_FILTERS)
+        if not file_name:
+            return
+        extension = selected_filter[selected_filter.index('*') + 1:-1] # e.g. ".csv.gz"
+        if not file_name.endswith(extension):
+            file_name += extension
+        product_id = self.export_product_picker.current_product_id()
+
+        self.export_progress = QProgressDialog("Exporting transactions...", "Cancel", 0, 0, self)
+        self.export_progress.setWindowTitle("Export Transactions")
+        self.export_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.export_button.setEnabled(False)
+        self.export_thread = ExportThread(file_name, kind, start_date, end_date,
+                                          [product_id] if product_id is not None else None)
+        self.export_thread.progress.connect(self.export_progressed)
+        self.export_thread.export_finished.connect(self.export_finished)
+        self.export_thread.export_failed.connect(self.export_failed)
+        self.export_progress.canceled.connect(self.export_thread.cancel)
+        self.export_thread.start()
+        self.export_progress.show()
+
+    def export_progressed(self, written, expected):
+        self.export_progress.setMaximum(expected)
+        self.export_progress.setValue(written)
+        self.export_progress.setLabelText(f"Exported {written} of {expected} rows")
+
+    def export_finished(self, result):
+        self.export_progress.close()
+        self.export_button.setEnabled(True)
+        if result['complete']:
+            QMessageBox.information(self, "Export Complete", f"Exported {result['rows']} rows.")
+        else:
+            QMessageBox.information(self, "Export Cancelled", "The export was cancelled; the file was not written.")
+
+    def export_failed(self, error):
+        self.export_progress.close()
+        self.export_button.setEnabled(True)
+        QMessageBox.critical(self, "Error", f"Failed to export transactions: {error}")
+
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    # Simulate an operator ID for testing
+    reports_view = ReportsView(operator_id=1)
+    reports_view.show()
+    sys.exit(app.exec())
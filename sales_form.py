@@ -1,15 +1,33 @@
 import sys
 from PySide6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
                                QLineEdit, QPushButton, QLabel, QDoubleSpinBox,
-                               QComboBox, QMessageBox, QDateEdit)
+                               QComboBox, QMessageBox, QDateEdit, QTableWidget,
+                               QTableWidgetItem, QHeaderView, QAbstractItemView)
 from PySide6.QtCore import Qt, QDate
-from database_manager import DatabaseManager
+from db_worker import get_db_worker, set_busy
+from barcode_index import get_barcode_index
+from scan_input import ScanLineEdit
+from product_picker import ProductPicker, product_label
+from money import to_cents, from_cents, format_money, line_totals
+
+def load_customers(db_manager):
+    # Runs on the database worker thread
+    customers = db_manager.get_all_customers()
+    # Add a dummy customer for testing if none exist
+    if not customers:
+        db_manager.add_customer("Walk-in Customer", "", "", "", "")
+        customers = db_manager.get_all_customers()
+    return customers
 
 class SalesForm(QWidget):
+    CART_HEADERS = ["Product", "Quantity", "Unit", "Rate", "Tax", "Total"]
+
     def __init__(self, operator_id):
         super().__init__()
         self.operator_id = operator_id
-        self.db_manager = DatabaseManager()
+        self.db_worker = get_db_worker()
+        self.barcode_index = get_barcode_index()
+        self.cart_lines = [] # (product_id, label, quantity, unit, rate_per_unit, tax_percentage, tax_amount, total_rate), cents
         self.init_ui()
         self.load_initial_data()
 
@@ -25,11 +43,18 @@ class SalesForm(QWidget):
         self.form_grid.addWidget(QLabel("Sale Date:"))
         self.form_grid.addWidget(self.date_input)
 
-        self.product_combo = QComboBox()
-        self.product_combo.setPlaceholderText("Select Product")
-        self.product_combo.currentIndexChanged.connect(self.update_product_details)
+        self.scan_input = ScanLineEdit()
+        self.scan_input.barcode_scanned.connect(self.handle_barcode_scan)
+        self.form_grid.addWidget(QLabel("Scan Barcode:"))
+        self.form_grid.addWidget(self.scan_input)
+
+        self.scan_status_label = QLabel("")
+        self.form_grid.addWidget(self.scan_status_label)
+
+        self.product_picker = ProductPicker() # Type-ahead search instead of listing every product
+        self.product_picker.product_selected.connect(self.update_product_details)
         self.form_grid.addWidget(QLabel("Product:"))
-        self.form_grid.addWidget(self.product_combo)
+        self.form_grid.addWidget(self.product_picker)
 
         self.customer_combo = QComboBox()
         self.customer_combo.setPlaceholderText("Select Customer")
@@ -58,6 +83,9 @@ class SalesForm(QWidget):
         self.tax_percentage_display = QLabel("Tax: 0.00%") # Display tax from product master
         self.form_grid.addWidget(self.tax_percentage_display)
 
+        self.stock_on_hand_display = QLabel("On Hand: -") # Live stock from the stock ledger
+        self.form_grid.addWidget(self.stock_on_hand_display)
+
         self.total_rate_label = QLabel("Total Rate: $0.00")
         self.form_grid.addWidget(self.total_rate_label)
 
@@ -66,11 +94,31 @@ class SalesForm(QWidget):
 
         self.main_layout.addLayout(self.form_grid)
 
+        # Cart: lines are collected here and saved together as one invoice
+        self.cart_table = QTableWidget(0, len(self.CART_HEADERS))
+        self.cart_table.setHorizontalHeaderLabels(self.CART_HEADERS)
+        self.cart_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.cart_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.cart_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.main_layout.addWidget(QLabel("Cart:"))
+        self.main_layout.addWidget(self.cart_table)
+
+        self.cart_total_label = QLabel()
+        self.main_layout.addWidget(self.cart_total_label)
+
         # Buttons
         self.buttons_layout = QHBoxLayout()
-        self.add_sale_button = QPushButton("Add Sale")
-        self.add_sale_button.clicked.connect(self.add_sale)
-        self.buttons_layout.addWidget(self.add_sale_button)
+        self.add_to_cart_button = QPushButton("Add to Cart")
+        self.add_to_cart_button.clicked.connect(self.add_to_cart)
+        self.buttons_layout.addWidget(self.add_to_cart_button)
+
+        self.remove_line_button = QPushButton("Remove Line")
+        self.remove_line_button.clicked.connect(self.remove_cart_line)
+        self.buttons_layout.addWidget(self.remove_line_button)
+
+        self.complete_sale_button = QPushButton("Complete Sale")
+        self.complete_sale_button.clicked.connect(self.complete_sale)
+        self.buttons_layout.addWidget(self.complete_sale_button)
 
         self.clear_button = QPushButton("Clear Form")
         self.clear_button.clicked.connect(self.clear_form)
@@ -78,92 +126,169 @@ class SalesForm(QWidget):
 
         self.main_layout.addLayout(self.buttons_layout)
         self.setLayout(self.main_layout)
+        self.update_cart_totals()
 
     def load_initial_data(self):
-        products = self.db_manager.get_all_products()
-        self.product_combo.clear()
-        self.product_combo.addItem("Select Product", userData=None)
-        for product in products:
-            self.product_combo.addItem(f"{product[5]} (SKU: {product[2]})", userData=product[0])
+        self.db_worker.submit(load_customers, on_result=self.customers_loaded)
+        self.db_worker.submit(lambda db: self.barcode_index.refresh()) # Build the scan index off the GUI thread
 
-        customers = self.db_manager.get_all_customers()
+    def customers_loaded(self, customers):
         self.customer_combo.clear()
         self.customer_combo.addItem("Select Customer", userData=None)
         for customer in customers:
             self.customer_combo.addItem(customer[1], userData=customer[0])
 
-        # Add a dummy customer for testing if none exist
-        if not customers:
-            self.db_manager.add_customer("Walk-in Customer", "", "", "", "")
-            customers = self.db_manager.get_all_customers()
-            for customer in customers:
-                self.customer_combo.addItem(customer[1], userData=customer[0])
-
-    def update_product_details(self):
-        selected_product_id = self.product_combo.currentData()
+    def update_product_details(self, selected_product_id):
         if selected_product_id:
-            product = self.db_manager.get_product_by_id(selected_product_id)
-            if product:
-                self.unit_of_measurement_input.setText(product[9])
-                self.rate_per_unit_input.setValue(product[8])
-                self.tax_percentage_display.setText(f"Tax: {product[7]:.2f}%")
-                self.current_product_tax_rate = product[7]
-                self.calculate_totals()
+            # Runs in the background; picking another product cancels a lookup still in flight
+            self.db_worker.submit(lambda db, product_id=selected_product_id: (db.get_product_by_id(product_id), db.get_stock_level(product_id)),
+                                  key='sales_product_details', on_result=self.product_details_loaded)
         else:
+            self.db_worker.submit(lambda db: None, key='sales_product_details') # Cancels any pending lookup
             self.unit_of_measurement_input.clear()
             self.rate_per_unit_input.setValue(0.00)
             self.tax_percentage_display.setText("Tax: 0.00%")
+            self.stock_on_hand_display.setText("On Hand: -")
             self.current_product_tax_rate = 0.00
             self.calculate_totals()
 
+    def product_details_loaded(self, result):
+        product, stock_level = result
+        if product:
+            self.show_product_details(product.default_unit, product.price, product.tax_percentage)
+            self.stock_on_hand_display.setText(f"On Hand: {stock_level:g}")
+
+    def show_product_details(self, default_unit, price, tax_percentage):
+        self.unit_of_measurement_input.setText(default_unit or "") # Default unit
+        self.rate_per_unit_input.setValue(from_cents(price)) # Default price (cents) as initial rate
+        self.tax_percentage_display.setText(f"Tax: {tax_percentage:.2f}%")
+        self.current_product_tax_rate = tax_percentage # Store for calculation
+        self.calculate_totals()
+
+    def handle_barcode_scan(self, barcode):
+        # Scanner fast path: resolved from the in-memory barcode index, no database round trip.
+        # Only the first scan after a product change waits for the index to be rebuilt.
+        if self.barcode_index.is_current():
+            self.apply_scanned_product(barcode, self.barcode_index.lookup_cached(barcode))
+        else:
+            self.db_worker.submit(lambda db: self.barcode_index.lookup(barcode),
+                                  on_result=lambda product: self.apply_scanned_product(barcode, product))
+
+    def apply_scanned_product(self, barcode, product):
+        if product is None:
+            self.scan_status_label.setText(f"Unknown barcode: {barcode}")
+            QApplication.beep()
+            return
+        product_id, sku_id, product_name, tax_percentage, price, default_unit = product
+        if self.product_picker.current_product_id() == product_id:
+            self.quantity_input.setValue(self.quantity_input.value() + 1) # Repeat scans add one more
+        else:
+            # Details come from the index, so the picker does not notify update_product_details
+            self.product_picker.set_product(product_id, product_label(product_name, sku_id), notify=False)
+            self.quantity_input.setValue(1)
+            self.show_product_details(default_unit, price, tax_percentage)
+            self.stock_on_hand_display.setText("On Hand: ...")
+            self.db_worker.call('get_stock_level', product_id, key='sales_stock_level',
+                                on_result=lambda stock_level: self.stock_on_hand_display.setText(f"On Hand: {stock_level:g}"))
+        self.scan_status_label.setText(f"Scanned: {product_name} (SKU: {sku_id})")
+
     def calculate_totals(self):
         quantity = self.quantity_input.value()
-        rate_per_unit = self.rate_per_unit_input.value()
+        rate_per_unit = to_cents(self.rate_per_unit_input.value())
         tax_percentage = getattr(self, 'current_product_tax_rate', 0.00)
 
-        sub_total = quantity * rate_per_unit
-        tax_amount = sub_total * (tax_percentage / 100)
-        total_rate = sub_total + tax_amount
+        sub_total, tax_amount, total_rate = line_totals(quantity, rate_per_unit, tax_percentage)
 
-        self.total_rate_label.setText(f"Total Rate: ${total_rate:.2f}")
-        self.tax_amount_label.setText(f"Tax Amount: ${tax_amount:.2f}")
+        self.total_rate_label.setText(f"Total Rate: {format_money(total_rate)}")
+        self.tax_amount_label.setText(f"Tax Amount: {format_money(tax_amount)}")
 
-    def add_sale(self):
-        sale_date = self.date_input.date().toString("yyyy-MM-dd")
-        product_id = self.product_combo.currentData()
-        customer_id = self.customer_combo.currentData()
+    def add_to_cart(self):
+        product_id = self.product_picker.current_product_id()
         quantity = self.quantity_input.value()
         unit_of_measurement = self.unit_of_measurement_input.text().strip()
-        rate_per_unit = self.rate_per_unit_input.value()
+        rate_per_unit = to_cents(self.rate_per_unit_input.value())
 
-        if not (product_id and customer_id and quantity > 0 and unit_of_measurement and rate_per_unit > 0):
-            QMessageBox.warning(self, "Input Error", "Please fill all required fields and ensure quantity/rate are positive.")
+        if not (product_id and quantity > 0 and unit_of_measurement and rate_per_unit > 0):
+            QMessageBox.warning(self, "Input Error", "Please pick a product and ensure quantity/unit/rate are filled in.")
             return
 
         tax_percentage = getattr(self, 'current_product_tax_rate', 0.00)
-        sub_total = quantity * rate_per_unit
-        tax_amount = sub_total * (tax_percentage / 100)
-        total_rate = sub_total + tax_amount
-
-        if self.db_manager.add_sale(sale_date, product_id, customer_id, quantity,
-                                      unit_of_measurement, rate_per_unit, total_rate,
-                                      tax_amount, self.operator_id):
-            QMessageBox.information(self, "Success", "Sale added successfully!")
+        sub_total, tax_amount, total_rate = line_totals(quantity, rate_per_unit, tax_percentage) # Cents, for display
+        line = (product_id, self.product_picker.text(), quantity, unit_of_measurement, rate_per_unit,
+                tax_percentage, tax_amount, total_rate)
+        self.cart_lines.append(line)
+
+        row = self.cart_table.rowCount()
+        self.cart_table.insertRow(row)
+        for column, value in enumerate((line[1], f"{quantity:g}", unit_of_measurement, format_money(rate_per_unit),
+                                        format_money(tax_amount), format_money(total_rate))):
+            self.cart_table.setItem(row, column, QTableWidgetItem(value))
+        self.update_cart_totals()
+        self.clear_line_inputs()
+
+    def remove_cart_line(self):
+        rows = sorted({index.row() for index in self.cart_table.selectedIndexes()}, reverse=True)
+        for row in rows:
+            del self.cart_lines[row]
+            self.cart_table.removeRow(row)
+        self.update_cart_totals()
+
+    def update_cart_totals(self):
+        tax_amount = sum(line[6] for line in self.cart_lines)
+        total_rate = sum(line[7] for line in self.cart_lines)
+        self.cart_total_label.setText(f"Cart: {len(self.cart_lines)} lines, Tax {format_money(tax_amount)}, "
+                                      f"Total {format_money(total_rate)}")
+        self.complete_sale_button.setEnabled(bool(self.cart_lines))
+
+    def complete_sale(self):
+        sale_date = self.date_input.date().toString("yyyy-MM-dd")
+        customer_id = self.customer_combo.currentData()
+        if not customer_id:
+            QMessageBox.warning(self, "Input Error", "Please select a customer.")
+            return
+        if not self.cart_lines:
+            QMessageBox.warning(self, "Input Error", "The cart is empty.")
+            return
+
+        # Totals are recomputed by add_invoice for the whole cart in one batch and saved atomically
+        lines = [(product_id, quantity, unit, rate_per_unit, tax_percentage)
+                 for product_id, _, quantity, unit, rate_per_unit, tax_percentage, _, _ in self.cart_lines]
+        set_busy(self, True, self.complete_sale_button, self.add_to_cart_button, self.remove_line_button)
+        self.db_worker.call('add_invoice', sale_date, customer_id, lines, self.operator_id,
+                            on_result=self.invoice_added, on_error=self.sale_failed)
+
+    def invoice_added(self, invoice_id):
+        set_busy(self, False, self.complete_sale_button, self.add_to_cart_button, self.remove_line_button)
+        if invoice_id:
+            QMessageBox.information(self, "Success", f"Invoice #{invoice_id} saved with {len(self.cart_lines)} lines.")
             self.clear_form()
         else:
-            QMessageBox.critical(self, "Error", "Failed to add sale.")
+            QMessageBox.critical(self, "Error", "Failed to save the invoice. Nothing was recorded.")
 
-    def clear_form(self):
-        self.date_input.setDate(QDate.currentDate())
-        self.product_combo.setCurrentIndex(0)
-        self.customer_combo.setCurrentIndex(0)
+    def sale_failed(self, error):
+        set_busy(self, False, self.complete_sale_button, self.add_to_cart_button, self.remove_line_button)
+        QMessageBox.critical(self, "Error", f"Failed to complete sale: {error}")
+
+    def clear_line_inputs(self):
+        self.product_picker.clear_selection()
         self.quantity_input.setValue(0.00)
         self.unit_of_measurement_input.clear()
         self.rate_per_unit_input.setValue(0.00)
         self.total_rate_label.setText("Total Rate: $0.00")
         self.tax_amount_label.setText("Tax Amount: $0.00")
         self.tax_percentage_display.setText("Tax: 0.00%")
+        self.stock_on_hand_display.setText("On Hand: -")
         self.current_product_tax_rate = 0.00
+        self.scan_status_label.setText("")
+        self.scan_input.setFocus()
+
+    def clear_form(self):
+        self.date_input.setDate(QDate.currentDate())
+        self.customer_combo.setCurrentIndex(0)
+        self.cart_lines = []
+        self.cart_table.setRowCount(0)
+        self.update_cart_totals()
+        self.clear_line_inputs()
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
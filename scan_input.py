@@ -0,0 +1,47 @@
+import time
+from PySide6.QtWidgets import QLineEdit
+from PySide6.QtCore import Qt, Signal, QTimer
+
+SCAN_MAX_KEY_INTERVAL = 0.05 # Seconds; keyboard-wedge scanners type much faster than people
+SCAN_MIN_LENGTH = 4          # Shorter bursts are treated as ordinary typing
+SCAN_IDLE_MS = 80            # Submit a fast burst after this pause if the scanner sends no Enter
+
+class ScanLineEdit(QLineEdit):
+    # Input for barcode scanners that act as keyboards. Emits barcode_scanned when a fast burst
+    # of keystrokes ends (with Enter or a short pause), or when the user types a code and presses Enter.
+    barcode_scanned = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setPlaceholderText("Scan or type barcode, then Enter")
+        self._last_key_time = None
+        self._burst = True # Stays True while every keystroke so far arrived at scanner speed
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(SCAN_IDLE_MS)
+        self._idle_timer.timeout.connect(self._burst_finished)
+
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+            self._submit()
+            return
+        now = time.perf_counter()
+        if self._last_key_time is not None and now - self._last_key_time > SCAN_MAX_KEY_INTERVAL:
+            self._burst = False
+        self._last_key_time = now
+        super().keyPressEvent(event)
+        if self._burst:
+            self._idle_timer.start()
+
+    def _burst_finished(self):
+        if self._burst and len(self.text().strip()) >= SCAN_MIN_LENGTH:
+            self._submit()
+
+    def _submit(self):
+        self._idle_timer.stop()
+        code = self.text().strip()
+        self.clear()
+        self._last_key_time = None
+        self._burst = True
+        if code:
+            self.barcode_scanned.emit(code)
@@ -0,0 +1,39 @@
+import time
+from contextlib import contextmanager
+
+# Wall-clock phases of application start-up, measured from the first import of this module,
+# which main.py does before anything else
+_started = time.perf_counter()
+_last_mark = _started
+_phases = [] # (phase, seconds taken, seconds since start)
+
+def mark(phase):
+    # Records the time since the previous mark as one phase
+    global _last_mark
+    now = time.perf_counter()
+    _phases.append((phase, now - _last_mark, now - _started))
+    _last_mark = now
+
+@contextmanager
+def timed(phase):
+    # Records the duration of the enclosed block, e.g. building a form on first use
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        _phases.append((phase, now - started, now - _started))
+
+def reset():
+    # Starts a new measurement, e.g. when the login window is shown again after a logout, so
+    # print_phases() covers only that login and not the earlier sessions as well
+    global _started, _last_mark
+    _started = _last_mark = time.perf_counter()
+    _phases.clear()
+
+def phases():
+    return list(_phases)
+
+def print_phases():
+    for phase, seconds, since_start in _phases:
+        print(f"{phase:<32} {seconds * 1000:8.1f} ms   (at {since_start * 1000:8.1f} ms)")
\ No newline at end of file
@@ -0,0 +1,112 @@
+import hashlib
+import os
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, QSize, Signal
+from PySide6.QtGui import QImage, QImageReader, QPixmap, QPixmapCache
+from database_manager import DATABASE_NAME
+
+THUMBNAIL_SIZE = 200          # Longest edge in pixels; matches the product master's image box
+THUMBNAIL_MEMORY_KB = 20480   # QPixmapCache budget for decoded thumbnails (~20 MB)
+THUMBNAIL_DIR = os.path.join(os.path.dirname(os.path.abspath(DATABASE_NAME)), 'thumbnails')
+PREFETCH_PRIORITY = -1        # Below the thumbnail the user is waiting for
+
+def thumbnail_key(path, size=THUMBNAIL_SIZE):
+    # Keyed by path and modification time, so an edited image gets a fresh thumbnail.
+    # Returns None for a missing file.
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    source = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{size}"
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+def _disk_path(key):
+    return os.path.join(THUMBNAIL_DIR, key[:2], f"{key}.png")
+
+def load_thumbnail_image(path, key, size=THUMBNAIL_SIZE):
+    # Runs on a pool thread; QImage (unlike QPixmap) is safe to use off the GUI thread
+    cached = _disk_path(key)
+    image = QImage(cached)
+    if not image.isNull():
+        return image
+    reader = QImageReader(path)
+    reader.setAutoTransform(True) # Honour EXIF rotation from phone and supplier photos
+    original = reader.size()
+    if original.isValid() and (original.width() > size or original.height() > size):
+        # Lets JPEG decode straight at reduced resolution instead of decoding full size first
+        reader.setScaledSize(original.scaled(QSize(size, size), Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return image
+    if image.width() > size or image.height() > size: # Formats that ignore setScaledSize
+        image = image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    temporary = f"{cached}.{os.getpid()}.tmp"
+    if image.save(temporary, "PNG"):
+        os.replace(temporary, cached) # Atomic, so a concurrent reader never sees half a file
+    return image
+
+class _ThumbnailJob(QRunnable):
+    def __init__(self, loader, path, key):
+        super().__init__()
+        self.loader = loader
+        self.path = path
+        self.key = key
+
+    def run(self):
+        try:
+            image = load_thumbnail_image(self.path, self.key)
+        except OSError:
+            image = QImage()
+        self.loader._image_loaded.emit(self.path, self.key, image) # Queued to the GUI thread
+
+class ThumbnailLoader(QObject):
+    # Three tiers: decoded pixmaps in QPixmapCache, PNG thumbnails on disk, and the original
+    # file, which is decoded and scaled on a worker pool. request() answers from memory at once
+    # or returns None and emits thumbnail_ready(path, pixmap) when the thumbnail is ready.
+    thumbnail_ready = Signal(str, QPixmap)
+    _image_loaded = Signal(str, str, QImage)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), THUMBNAIL_MEMORY_KB))
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(2, QThreadPool.globalInstance().maxThreadCount() // 2))
+        self._in_flight = set() # Keys queued or being decoded, so each is loaded once
+        self._image_loaded.connect(self._store, Qt.ConnectionType.QueuedConnection)
+
+    def request(self, path):
+        return self._load(path, priority=0)
+
+    def prefetch(self, paths):
+        # Warms the cache for rows the user is likely to open next
+        for path in paths:
+            if path:
+                self._load(path, priority=PREFETCH_PRIORITY)
+
+    def _load(self, path, priority):
+        key = thumbnail_key(path)
+        if key is None:
+            return None
+        pixmap = QPixmapCache.find(key)
+        if pixmap is not None and not pixmap.isNull():
+            return pixmap
+        if key not in self._in_flight:
+            self._in_flight.add(key)
+            self.pool.start(_ThumbnailJob(self, path, key), priority)
+        return None
+
+    def _store(self, path, key, image):
+        self._in_flight.discard(key)
+        if image.isNull():
+            return
+        pixmap = QPixmap.fromImage(image) # Only the GUI thread may create pixmaps
+        QPixmapCache.insert(key, pixmap)
+        self.thumbnail_ready.emit(path, pixmap)
+
+_shared_loader = None
+
+def get_thumbnail_loader():
+    global _shared_loader
+    if _shared_loader is None:
+        _shared_loader = ThumbnailLoader()
+    return _shared_loader
@@ -0,0 +1,250 @@
+import csv
+import datetime
+import gzip
+import json
+import os
+import sqlite3
+import sys
+from urllib.request import pathname2url
+
+from database_manager import DATABASE_NAME, MAX_ATTACHED_ARCHIVES, archive_path, archive_years
+from money import format_decimal
+
+EXPORT_FETCH_ROWS = 5000 # Rows per fetchmany(); memory use is bounded by this, not by the table size
+GZIP_LEVEL = 6 # Nearly the size of level 9 at about twice the speed
+MANIFEST_SUFFIX = '.manifest.json'
+FORMATS = ('csv', 'jsonl')
+
+# kind -> (table, date column, party id column, party table, party name column)
+SOURCES = {
+    'sale': ('sales', 'sale_date', 'customer_id', 'customers', 'customer_name'),
+    'receipt': ('goods_receipts', 'receipt_date', 'supplier_id', 'suppliers', 'supplier_name'),
+}
+AMOUNT_HEADERS = {'rate_per_unit', 'tax_amount', 'total_rate'} # Stored in cents, exported as e.g. "12.34"
+
+def export_headers(kind):
+    table, date_column, party_column, _, party_name = SOURCES[kind]
+    return ['id', date_column, 'product_id', 'sku_id', 'product_name', party_column, party_name,
+            'quantity', 'unit_of_measurement', 'rate_per_unit', 'tax_amount', 'total_rate', 'operator_id']
+
+def _query(kind, start_date, end_date, product_ids, after_key, schemas=('main',)):
+    # Rows in (date, id) order, which idx_sales_date / idx_receipts_date already provide, so the
+    # rows stream straight off the index; after_key resumes behind the last row written. With
+    # archives attached there is one such SELECT per database, and SQLite merges the sorted
+    # streams rather than sorting the result.
+    table, date_column, party_column, party_table, party_name = SOURCES[kind]
+    conditions, params = [], []
+    if start_date:
+        conditions.append(f"t.{date_column} >= ?")
+        params.append(start_date)
+    if end_date: # Inclusive day; dates may carry a time after the day
+        conditions.append(f"t.{date_column} < ?")
+        params.append((datetime.date.fromisoformat(end_date) + datetime.timedelta(days=1)).isoformat())
+    if product_ids:
+        conditions.append(f"t.product_id IN ({', '.join('?' * len(product_ids))})")
+        params.extend(product_ids)
+    if after_key:
+        conditions.append(f"(t.{date_column}, t.id) > (?, ?)")
+        params.extend(after_key)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    arms = [f'''
+        SELECT t.id, t.{date_column}, t.product_id, p.sku_id, p.product_name, t.{party_column}, c.{party_name},
+               t.quantity, t.unit_of_measurement, t.rate_per_unit, t.tax_amount, t.total_rate, t.operator_id
+        FROM {schema}.{table} t
+        LEFT JOIN main.products p ON p.id = t.product_id
+        LEFT JOIN main.{party_table} c ON c.id = t.{party_column}
+        {where}
+    ''' for schema in schemas]
+    query = f"{' UNION ALL '.join(arms)} ORDER BY 2, 1" # date, id
+    return query, params * len(schemas)
+
+def _expected_rows(conn, kind, start_date, end_date, product_ids):
+    # Line count from daily_product_rollups, so progress has a total without counting the table itself
+    conditions, params = ["kind = ?"], [kind]
+    if start_date:
+        conditions.append("day >= ?")
+        params.append(start_date[:10])
+    if end_date:
+        conditions.append("day <= ?")
+        params.append(end_date[:10])
+    if product_ids:
+        conditions.append(f"product_id IN ({', '.join('?' * len(product_ids))})")
+        params.extend(product_ids)
+    row = conn.execute(f"SELECT IFNULL(SUM(line_count), 0) FROM daily_product_rollups WHERE {' AND '.join(conditions)}", params).fetchone()
+    return row[0]
+
+def _open_read_connection(db_path):
+    # A connection of its own, read-only: under WAL it reads a consistent snapshot and never
+    # holds up the application's writes on the shared connection
+    uri = f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+def _attach_archives(conn, db_path, start_date, end_date):
+    # Attaches, read-only, the archives (see archive.py) of the years the export covers and
+    # returns the schemas to read, oldest archive first and the hot database last
+    years = [year for year in archive_years(db_path)
+             if (not start_date or year >= int(start_date[:4])) and (not end_date or year <= int(end_date[:4]))]
+    if len(years) > MAX_ATTACHED_ARCHIVES:
+        raise ValueError(f"The export spans {len(years)} archived years; export at most {MAX_ATTACHED_ARCHIVES} at a time.")
+    schemas = []
+    for year in years:
+        schema = f"archive_{year}"
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (f"file:{pathname2url(archive_path(db_path, year))}?mode=ro",))
+        schemas.append(schema)
+    return schemas + ['main']
+
+def _part_path(path, number, chunked):
+    # sales.csv.gz -> sales.part0001.csv.gz; the whole export goes to `path` when not chunked
+    if not chunked:
+        return path
+    directory, name = os.path.split(path)
+    stem, dot, extensions = name.partition('.')
+    return os.path.join(directory, f"{stem}.part{number:04d}{dot}{extensions}")
+
+def _open_output(path, compress):
+    if compress:
+        return gzip.open(path, 'wt', compresslevel=GZIP_LEVEL, encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+def _amounts(row, amount_columns):
+    row = list(row)
+    for column in amount_columns:
+        if row[column] is not None:
+            row[column] = format_decimal(row[column])
+    return row
+
+class _Writer:
+    # One output file; rows go to a .tmp file that is renamed into place once complete
+    def __init__(self, path, fmt, compress, headers):
+        self.path = path
+        self.temporary = f"{path}.tmp"
+        self.headers = headers
+        self.rows = 0
+        self.file = _open_output(self.temporary, compress)
+        if fmt == 'csv':
+            self._csv = csv.writer(self.file)
+            self._csv.writerow(headers)
+            self.write = self._write_csv
+        else:
+            self.write = self._write_jsonl
+
+    def _write_csv(self, rows):
+        self._csv.writerows(rows)
+        self.rows += len(rows)
+
+    def _write_jsonl(self, rows):
+        headers = self.headers
+        self.file.writelines(json.dumps(dict(zip(headers, row)), ensure_ascii=False) + '\n' for row in rows)
+        self.rows += len(rows)
+
+    def finish(self):
+        self.file.close()
+        os.replace(self.temporary, self.path)
+
+    def abandon(self):
+        self.file.close()
+        os.remove(self.temporary)
+
+def export_transactions(path, kind='sale', fmt=None, start_date=None, end_date=None, product_ids=None,
+                        rows_per_file=None, resume=False, db_path=DATABASE_NAME, progress=None, cancelled=None):
+    # Streams sales or goods receipts, with product and party names, to CSV or JSON lines.
+    # fmt defaults from the file name, and a name ending in .gz is gzip-compressed. Dates are
+    # inclusive 'yyyy-MM-dd'. With rows_per_file the output is split into numbered part files
+    # listed in <path>.manifest.json, and resume=True continues an interrupted export after its
+    # last complete part. progress(rows_written, rows_expected) is called after every fetch, and
+    # the export stops cleanly (resumable) once cancelled() returns True.
+    # Returns {'rows', 'files', 'complete'}.
+    if kind not in SOURCES:
+        raise ValueError(f"Unknown export kind: {kind}")
+    compress = path.endswith('.gz')
+    if fmt is None:
+        fmt = 'jsonl' if path[:-3 if compress else None].endswith(('.jsonl', '.json')) else 'csv'
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    product_ids = sorted(set(product_ids)) if product_ids else []
+    chunked = bool(rows_per_file)
+    settings = {'kind': kind, 'format': fmt, 'start_date': start_date, 'end_date': end_date,
+                'product_ids': product_ids, 'rows_per_file': rows_per_file}
+    manifest_path = path + MANIFEST_SUFFIX
+    manifest = {'settings': settings, 'parts': [], 'complete': False}
+    if resume and chunked and os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            previous = json.load(f)
+        if previous['settings'] != settings:
+            raise ValueError("The existing export was made with different settings; export to a new file instead.")
+        manifest = previous
+        if manifest['complete']:
+            return {'rows': sum(part['rows'] for part in manifest['parts']), 'files': len(manifest['parts']), 'complete': True}
+
+    headers = export_headers(kind)
+    amount_columns = [headers.index(header) for header in AMOUNT_HEADERS]
+    date_index = headers.index(SOURCES[kind][1])
+    after_key = manifest['parts'][-1]['last_key'] if manifest['parts'] else None
+    rows_written = sum(part['rows'] for part in manifest['parts'])
+
+    def save_manifest():
+        if chunked:
+            temporary = manifest_path + '.tmp'
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(temporary, manifest_path)
+
+    conn = _open_read_connection(db_path)
+    writer = None
+    try:
+        expected = _expected_rows(conn, kind, start_date, end_date, product_ids)
+        schemas = _attach_archives(conn, db_path, start_date, end_date)
+        cursor = conn.execute(*_query(kind, start_date, end_date, product_ids, after_key, schemas))
+        last_key = after_key
+        while True:
+            if cancelled is not None and cancelled():
+                if writer is not None:
+                    writer.abandon()
+                return {'rows': rows_written - (writer.rows if writer else 0), 'files': len(manifest['parts']), 'complete': False}
+            rows = cursor.fetchmany(EXPORT_FETCH_ROWS)
+            if not rows:
+                break
+            while rows:
+                if writer is None:
+                    writer = _Writer(_part_path(path, len(manifest['parts']) + 1, chunked), fmt, compress, headers)
+                room = rows_per_file - writer.rows if chunked else len(rows)
+                batch, rows = rows[:room], rows[room:]
+                writer.write([_amounts(row, amount_columns) for row in batch])
+                rows_written += len(batch)
+                last_key = [batch[-1][date_index], batch[-1][0]]
+                if chunked and writer.rows >= rows_per_file:
+                    writer.finish()
+                    manifest['parts'].append({'file': os.path.basename(writer.path), 'rows': writer.rows, 'last_key': last_key})
+                    save_manifest()
+                    writer = None
+            if progress:
+                progress(rows_written, max(expected, rows_written))
+        if writer is not None or not manifest['parts']:
+            if writer is None: # Nothing matched: still leave an (empty) file behind
+                writer = _Writer(_part_path(path, 1, chunked), fmt, compress, headers)
+            writer.finish()
+            manifest['parts'].append({'file': os.path.basename(writer.path), 'rows': writer.rows, 'last_key': last_key})
+            writer = None
+        manifest['complete'] = True
+        save_manifest()
+        return {'rows': rows_written, 'files': len(manifest['parts']), 'complete': True}
+    except BaseException:
+        if writer is not None:
+            writer.abandon()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    # python transaction_export.py <sale|receipt> <output[.csv|.jsonl][.gz]> [start_date] [end_date] [rows_per_file]
+    if len(sys.argv) < 3:
+        print("Usage: python transaction_export.py <sale|receipt> <output> [start_date] [end_date] [rows_per_file]")
+        sys.exit(1)
+    result = export_transactions(sys.argv[2], sys.argv[1],
+                                 start_date=sys.argv[3] if len(sys.argv) > 3 else None,
+                                 end_date=sys.argv[4] if len(sys.argv) > 4 else None,
+                                 rows_per_file=int(sys.argv[5]) if len(sys.argv) > 5 else None, resume=True,
+                                 progress=lambda written, expected: print(f"\r{written}/{expected} rows", end=''))
+    print(f"\nExported {result['rows']} rows to {result['files']} file(s).")
@@ -1,5 +1,6 @@
+from money import to_cents, from_cents, line_totals
+
 def calculate_total(quantity, rate_per_unit, tax_percentage):
-    sub_total = quantity * rate_per_unit
-    tax_amount = sub_total * (tax_percentage / 100)
-    total_rate = sub_total + tax_amount
-    return sub_total, tax_amount, total_rate
\ No newline at end of file
+    # Kept for callers working in major units; the arithmetic is done in cents by money.line_totals
+    sub_total, tax_amount, total_rate = line_totals(quantity, to_cents(rate_per_unit), tax_percentage)
+    return from_cents(sub_total), from_cents(tax_amount), from_cents(total_rate)
\ No newline at end of file